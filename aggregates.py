@@ -0,0 +1,265 @@
+"""Batched budget aggregations for the dashboard and the monthly data API."""
+
+import hashlib
+from decimal import Decimal
+
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from models import db, UserCategory, UserSubcategory, MonthlyBudget
+
+ZERO = Decimal('0.00')
+MONTH_DATA_FORMAT = 2  # bump when the /api/get-monthly-data payload changes shape
+
+
+def budget_rows_query(user_id, month, year):
+    """MonthlyBudget rows (budgeted + spent rollup) for a user's month, with the owning category of each subcategory."""
+    return db.session.query(MonthlyBudget.id,
+                            MonthlyBudget.user_subcategory_id,
+                            UserSubcategory.user_category_id,
+                            MonthlyBudget.budgeted_amount,
+                            MonthlyBudget.spent_amount).\
+        join(UserSubcategory, UserSubcategory.id == MonthlyBudget.user_subcategory_id).\
+        filter(MonthlyBudget.user_id == user_id,
+               MonthlyBudget.month == month,
+               MonthlyBudget.year == year)
+
+
+def month_rows_digest(user_id, month, year):
+    """md5 over (id, xmin) of the user's MonthlyBudget rows for the month.
+
+        Postgres gives every row version a new xmin, so any write to those rows (budget edits, spent rollups from
+        transactions, imports, rebuilds) changes the digest. It is one index scan of monthlybudgets and never reads
+        the transactions table."""
+
+    row_version = db.cast(MonthlyBudget.id, db.Text) + ':' + db.cast(db.literal_column('monthlybudgets.xmin'), db.Text)
+    return db.session.query(
+        db.func.coalesce(db.func.md5(db.func.string_agg(row_version, aggregate_order_by(db.literal_column("','"), MonthlyBudget.id))), '')).\
+        filter(MonthlyBudget.user_id == user_id,
+               MonthlyBudget.month == month,
+               MonthlyBudget.year == year).scalar()
+
+def month_etag(user_id, month, year, taxonomy):
+    """Strong ETag for a user's month: the budget rows' digest plus the (cached) taxonomy's fingerprint,
+        so renaming or deactivating a category changes it too."""
+
+    version = f'{MONTH_DATA_FORMAT}:{user_id}:{year}-{month}:{month_rows_digest(user_id, month, year)}:{taxonomy.fingerprint()}'
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+
+def get_month_summary(user_id, month, year, user_categories, user_subcategories):
+    """Builds the budgeted vs. actual tree for a user's month.
+
+        Totals for every category and subcategory come from one query over the month's MonthlyBudget rows,
+        whose spent_amount rollups are kept current as transactions are written, instead of one SUM per row.
+        Category totals include inactive subcategories, matching UserCategory.get_total_budgeted/get_total_actual."""
+
+    budgets_by_sub = {}
+    budgeted_by_sub = {}
+    budgeted_by_cat = {}
+    actual_by_sub = {}
+    actual_by_cat = {}
+    for budget_id, sub_id, cat_id, budgeted, spent in budget_rows_query(user_id, month, year):
+        budgets_by_sub[sub_id] = (budget_id, budgeted)
+        budgeted_by_sub[sub_id] = budgeted_by_sub.get(sub_id, ZERO) + budgeted
+        budgeted_by_cat[cat_id] = budgeted_by_cat.get(cat_id, ZERO) + budgeted
+        actual_by_sub[sub_id] = actual_by_sub.get(sub_id, ZERO) + spent
+        actual_by_cat[cat_id] = actual_by_cat.get(cat_id, ZERO) + spent
+
+    subcategories_by_cat = {}
+    for u_sub in user_subcategories:
+        if not u_sub.active:
+            continue
+        budget_id, budgeted_amount = budgets_by_sub.get(u_sub.id, (None, None))
+        subcategories_by_cat.setdefault(u_sub.user_category_id, []).append({
+            'id': u_sub.id,
+            'name': u_sub.name,
+            'user_category_id': u_sub.user_category_id,
+            'total_budgeted': budgeted_by_sub.get(u_sub.id, ZERO),
+            'total_actual': actual_by_sub.get(u_sub.id, ZERO),
+            'budget_id': budget_id,
+            'budgeted_amount': budgeted_amount
+        })
+
+    categories = []
+    for u_cat in user_categories:
+        if not u_cat.active:
+            continue
+        categories.append({
+            'id': u_cat.id,
+            'name': u_cat.name,
+            'total_budgeted': budgeted_by_cat.get(u_cat.id, ZERO),
+            'total_actual': actual_by_cat.get(u_cat.id, ZERO),
+            'subcategories': subcategories_by_cat.get(u_cat.id, [])
+        })
+
+    total_budgeted = sum((cat['total_budgeted'] for cat in categories), ZERO)
+    total_actual = sum((cat['total_actual'] for cat in categories), ZERO)
+
+    return {
+        'month': month,
+        'year': year,
+        'categories': categories,
+        'total_budgeted': total_budgeted,
+        'total_actual': total_actual,
+        'difference': total_budgeted - total_actual
+    }
+
+
+def get_changed_totals(user_id, changed):
+    """Recomputed totals after budget edits, for patching the dashboard in place. changed holds the
+        (user_category_id, user_subcategory_id, month, year, budgeted_amount) rows MonthlyBudget.set_budgeted_amounts
+        returned. One GROUPING SETS query totals the touched categories and whole months, with the same rules as
+        get_month_summary: categories include inactive subcategories, months count active categories only."""
+
+    if not changed:
+        return {'subcategories': [], 'categories': [], 'months': []}
+
+    months = sorted({(year, month) for _, _, month, year, _ in changed})
+    touched = {(cat_id, month, year) for cat_id, _, month, year, _ in changed}
+
+    grouped = db.session.query(db.func.grouping(UserSubcategory.user_category_id).label('level'),
+                               UserSubcategory.user_category_id,
+                               MonthlyBudget.month,
+                               MonthlyBudget.year,
+                               db.func.sum(MonthlyBudget.budgeted_amount),
+                               db.func.sum(MonthlyBudget.spent_amount)).\
+        join(UserSubcategory, UserSubcategory.id == MonthlyBudget.user_subcategory_id).\
+        join(UserCategory, UserCategory.id == UserSubcategory.user_category_id).\
+        filter(MonthlyBudget.user_id == user_id,
+               db.tuple_(MonthlyBudget.year, MonthlyBudget.month).in_(months),
+               UserCategory.active == db.true()).\
+        group_by(db.func.grouping_sets(db.tuple_(UserSubcategory.user_category_id, MonthlyBudget.month, MonthlyBudget.year),
+                                       db.tuple_(MonthlyBudget.month, MonthlyBudget.year)))
+
+    categories = []
+    month_totals = []
+    for level, cat_id, month, year, budgeted, actual in grouped:
+        if level == 0 and (cat_id, month, year) in touched:
+            categories.append({'id': cat_id, 'month': month, 'year': year, 'total_budgeted': budgeted})
+        elif level == 1:
+            month_totals.append({'month': month, 'year': year, 'total_budgeted': budgeted, 'total_actual': actual,
+                                 'difference': budgeted - actual})
+
+    return {
+        'subcategories': [{'id': sub_id, 'month': month, 'year': year, 'total_budgeted': budgeted}
+                          for _, sub_id, month, year, budgeted in changed],
+        'categories': sorted(categories, key=lambda cat: (cat['year'], cat['month'], cat['id'])),
+        'months': sorted(month_totals, key=lambda totals: (totals['year'], totals['month']))
+    }
+
+
+# ------------------- Trends -------------------
+
+MAX_TREND_MONTHS = 120
+TREND_SERIES = ('budgeted', 'actual', 'running_budgeted', 'running_actual', 'budgeted_delta', 'actual_delta')
+
+# One row per (subcategory, month), per (category, month) and per month for the whole range. Every subcategory is
+# crossed with every month first, so months without a budget row come back as zeros and each series is complete.
+# GROUPING SETS produce the category and overall totals in the same pass; the window functions then add running
+# totals and month-over-month deltas within each series. Actuals are the spent_amount rollups kept in step with
+# transactions, so the transactions table itself isn't scanned.
+TRENDS_SQL = db.text("""
+    WITH months AS (
+        SELECT CAST(month_start AS DATE) AS month_start
+        FROM generate_series(CAST(:start AS DATE), CAST(:end AS DATE), INTERVAL '1 month') AS month_start
+    ), budgets AS (
+        SELECT user_subcategory_id, make_date(year, month, 1) AS month_start, budgeted_amount, spent_amount
+        FROM monthlybudgets
+        WHERE user_id = :user_id
+          AND (year, month) >= (:start_year, :start_month)
+          AND (year, month) <= (:end_year, :end_month)
+    ), cells AS (
+        SELECT u_sub.user_category_id, u_sub.id AS user_subcategory_id, months.month_start,
+               COALESCE(budgets.budgeted_amount, 0) AS budgeted, COALESCE(budgets.spent_amount, 0) AS actual
+        FROM usersubcategories AS u_sub
+        CROSS JOIN months
+        LEFT JOIN budgets ON budgets.user_subcategory_id = u_sub.id AND budgets.month_start = months.month_start
+        WHERE u_sub.user_id = :user_id
+    ), grouped AS (
+        SELECT GROUPING(user_category_id, user_subcategory_id) AS level,
+               user_category_id, user_subcategory_id, month_start,
+               SUM(budgeted) AS budgeted, SUM(actual) AS actual
+        FROM cells
+        GROUP BY GROUPING SETS ((user_category_id, user_subcategory_id, month_start),
+                                (user_category_id, month_start),
+                                (month_start))
+    )
+    SELECT level, user_category_id, user_subcategory_id, month_start, budgeted, actual,
+           SUM(budgeted) OVER series AS running_budgeted,
+           SUM(actual) OVER series AS running_actual,
+           budgeted - LAG(budgeted) OVER series AS budgeted_delta,
+           actual - LAG(actual) OVER series AS actual_delta
+    FROM grouped
+    WINDOW series AS (PARTITION BY level, user_category_id, user_subcategory_id ORDER BY month_start)
+    ORDER BY level, user_category_id, user_subcategory_id, month_start
+""").columns(level=db.Integer, user_category_id=db.Integer, user_subcategory_id=db.Integer, month_start=db.Date,
+              budgeted=db.Numeric, actual=db.Numeric, running_budgeted=db.Numeric, running_actual=db.Numeric,
+              budgeted_delta=db.Numeric, actual_delta=db.Numeric)  # a declared SELECT, so it can run on the replica
+
+SUBCATEGORY_LEVEL, CATEGORY_LEVEL, TOTAL_LEVEL = 0, 1, 3
+
+
+def trend_months(end_month, end_year, months):
+    """The (month, year) pairs of the `months` months ending with end_month/end_year, oldest first."""
+
+    index = end_year * 12 + end_month - 1
+    return [((i % 12) + 1, i // 12) for i in range(index - months + 1, index + 1)]
+
+def empty_series(months):
+    return {name: [ZERO] * months if not name.endswith('_delta') else [None] + [ZERO] * (months - 1)
+            for name in TREND_SERIES}
+
+
+def get_trends(user_id, end_month, end_year, months, user_categories, user_subcategories):
+    """Budgeted vs. actual per category and subcategory for each of `months` months ending with end_month/end_year,
+        with running totals and month-over-month deltas, from a single query (TRENDS_SQL).
+
+        Like get_month_summary, category totals include inactive subcategories but only active categories and
+        subcategories are listed. Each series is a list aligned with the returned 'months' labels."""
+
+    month_list = trend_months(end_month, end_year, months)
+    (start_month, start_year), (last_month, last_year) = month_list[0], month_list[-1]
+    positions = {(year, month): i for i, (month, year) in enumerate(month_list)}
+
+    totals = empty_series(months)
+    category_series = {}
+    subcategory_series = {}
+
+    rows = db.session.execute(TRENDS_SQL, {
+        'user_id': user_id,
+        'start': f'{start_year:04d}-{start_month:02d}-01', 'end': f'{last_year:04d}-{last_month:02d}-01',
+        'start_month': start_month, 'start_year': start_year, 'end_month': last_month, 'end_year': last_year
+    })
+    for row in rows:
+        if row.level == SUBCATEGORY_LEVEL:
+            series = subcategory_series.setdefault(row.user_subcategory_id, empty_series(months))
+        elif row.level == CATEGORY_LEVEL:
+            series = category_series.setdefault(row.user_category_id, empty_series(months))
+        else:
+            series = totals
+
+        position = positions[(row.month_start.year, row.month_start.month)]
+        for name in TREND_SERIES:
+            series[name][position] = getattr(row, name)
+
+    subcategories_by_cat = {}
+    for u_sub in user_subcategories:
+        if u_sub.active:
+            subcategories_by_cat.setdefault(u_sub.user_category_id, []).append({
+                'id': u_sub.id,
+                'name': u_sub.name,
+                **subcategory_series.get(u_sub.id, empty_series(months))
+            })
+
+    categories = [{
+        'id': u_cat.id,
+        'name': u_cat.name,
+        **category_series.get(u_cat.id, empty_series(months)),
+        'subcategories': subcategories_by_cat.get(u_cat.id, [])
+    } for u_cat in user_categories if u_cat.active]
+
+    return {
+        'months': [f'{year:04d}-{month:02d}' for month, year in month_list],
+        'totals': totals,
+        'categories': categories
+    }
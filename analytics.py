@@ -0,0 +1,218 @@
+"""Spending forecasts, burn rates and budget-overrun probabilities, computed with NumPy.
+
+    A user's recent transactions are loaded once as parallel columns (integer cents, day ordinals, subcategory
+    codes) and everything else is array arithmetic over a (subcategory x day) matrix of daily spend, rather than
+    per-row ORM objects and Decimal sums. Money stays in integer cents until it is formatted for JSON."""
+
+import math
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from models import db, Transaction, MonthlyBudget
+
+HISTORY_DAYS = 180
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+UNCATEGORIZED = -1
+
+
+class SpendingHistory:
+    """A user's transactions between start and end (inclusive) as columnar arrays.
+
+        cents:    int64 amount of each transaction
+        days:     int64 offset of its tran_date from start (0 = start)
+        codes:    int64 index into subcategory_ids
+        subcategory_ids: the distinct user_subcategory_ids (UNCATEGORIZED for none), sorted"""
+
+    def __init__(self, start, end, cents, days, subcategory_ids_per_row):
+        self.start = start
+        self.end = end
+        self.cents = np.asarray(cents, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int64)
+        self.subcategory_ids, codes = np.unique(np.asarray(subcategory_ids_per_row, dtype=np.int64), return_inverse=True)
+        self.codes = codes.astype(np.int64)
+
+    @property
+    def num_days(self):
+        return (self.end - self.start).days + 1
+
+    @classmethod
+    def load(cls, user_id, start, end):
+        """Reads the columns straight from Postgres as integers (one range scan on the user/tran_date index)."""
+
+        rows = db.session.execute(
+            db.select(db.cast(db.func.round(Transaction.amount * 100), db.BigInteger),
+                      Transaction.tran_date - start,
+                      db.func.coalesce(Transaction.user_subcategory_id, UNCATEGORIZED)).
+            where(Transaction.user_id == user_id,
+                  Transaction.tran_date >= start,
+                  Transaction.tran_date <= end)).all()
+
+        columns = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        return cls(start, end, columns[:, 0], columns[:, 1], columns[:, 2])
+
+    def daily_matrix(self):
+        """Spend in cents per (subcategory, day): shape (len(subcategory_ids), num_days)."""
+
+        num_subs, num_days = len(self.subcategory_ids), self.num_days
+        flat = np.bincount(self.codes * num_days + self.days, weights=self.cents, minlength=num_subs * num_days)
+        return flat.reshape(num_subs, num_days)
+
+
+def moving_average(values, window):
+    """Trailing moving average along the last axis; the first window-1 points average what is available."""
+
+    values = np.asarray(values, dtype=np.float64)
+    totals = np.cumsum(values, axis=-1)
+    shifted = np.zeros_like(totals)
+    shifted[..., window:] = totals[..., :-window]
+    counts = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    return (totals - shifted) / counts
+
+
+def normal_cdf(z):
+    return 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+
+def overrun_probability(spent, budgeted, daily_mean, daily_std, days_remaining):
+    """P(spent + the rest of the month's spend > budgeted), treating each remaining day's spend as an independent
+        draw with the trailing mean/std, so their sum is approximately normal. All money arguments in cents,
+        as arrays (one entry per subcategory). None where nothing is budgeted."""
+
+    expected = spent + daily_mean * days_remaining
+    spread = daily_std * np.sqrt(days_remaining)
+
+    probabilities = []
+    for s, b, e, sd in zip(spent, budgeted, expected, spread):
+        if b <= 0:
+            probabilities.append(None)
+        elif s > b:
+            probabilities.append(1.0)
+        elif sd == 0:
+            probabilities.append(1.0 if e > b else 0.0)
+        else:
+            probabilities.append(round(1.0 - normal_cdf((b - e) / sd), 4))
+    return probabilities
+
+
+def forecast_month(history, month_start, as_of, budgeted_cents):
+    """Burn rates, month-end projections and overrun probabilities per subcategory.
+
+        history must cover at least [as_of - LONG_WINDOW days, as_of]. Projections blend this month's burn rate
+        with the trailing LONG_WINDOW-day daily average, trusting the current month more as it progresses.
+        budgeted_cents maps subcategory id -> budgeted cents for the month. Returns plain numbers in cents."""
+
+    days_in_month = monthrange(month_start.year, month_start.month)[1]
+    days_elapsed = (as_of - month_start).days + 1
+    days_remaining = days_in_month - days_elapsed
+
+    daily = history.daily_matrix()
+    month_offset = (month_start - history.start).days
+    as_of_offset = (as_of - history.start).days
+    this_month = daily[:, month_offset:as_of_offset + 1]
+    trailing = daily[:, max(0, as_of_offset - LONG_WINDOW + 1):as_of_offset + 1]
+
+    spent = this_month.sum(axis=1)
+    burn_rate = spent / days_elapsed
+    trailing_mean = trailing.mean(axis=1) if trailing.shape[1] else np.zeros(len(spent))
+    trailing_std = trailing.std(axis=1) if trailing.shape[1] else np.zeros(len(spent))
+
+    weight = days_elapsed / days_in_month
+    daily_rate = weight * burn_rate + (1 - weight) * trailing_mean
+    projected = spent + daily_rate * days_remaining
+
+    short_average = moving_average(daily, SHORT_WINDOW)[:, as_of_offset]
+    long_average = moving_average(daily, LONG_WINDOW)[:, as_of_offset]
+
+    budgeted = np.array([budgeted_cents.get(int(sub_id), 0) for sub_id in history.subcategory_ids], dtype=np.float64)
+    probabilities = overrun_probability(spent, budgeted, daily_rate, trailing_std, days_remaining)
+
+    subcategories = [{
+        'id': None if sub_id == UNCATEGORIZED else int(sub_id),
+        'spent': spent[i],
+        'budgeted': budgeted[i],
+        'burn_rate': burn_rate[i],
+        'moving_average_7': short_average[i],
+        'moving_average_30': long_average[i],
+        'projected': projected[i],
+        'overrun_probability': probabilities[i]
+    } for i, sub_id in enumerate(history.subcategory_ids)]
+
+    total_daily = daily.sum(axis=0)
+    window_start = max(0, as_of_offset - LONG_WINDOW + 1)
+    return {
+        'days_elapsed': days_elapsed,
+        'days_in_month': days_in_month,
+        'subcategories': subcategories,
+        'totals': {'spent': spent.sum(), 'budgeted': budgeted.sum(), 'projected': projected.sum(),
+                   'daily_rate': daily_rate.sum()},
+        'daily': {
+            'dates': [(history.start + timedelta(days=offset)).isoformat() for offset in range(window_start, as_of_offset + 1)],
+            'spent': total_daily[window_start:as_of_offset + 1],
+            'moving_average_7': moving_average(total_daily, SHORT_WINDOW)[window_start:as_of_offset + 1]
+        }
+    }
+
+
+def to_money(cents):
+    """Cents (int or float) -> Decimal dollars, rounded to the cent."""
+
+    return Decimal(int(round(float(cents)))).scaleb(-2)
+
+
+def get_forecast(user_id, as_of, user_subcategories):
+    """The /api/forecast payload for the month containing as_of: loads HISTORY_DAYS of transactions and the
+        month's budgets, runs forecast_month() and formats money as Decimals. Only active subcategories (and
+        uncategorized spend, if any) are listed; totals cover everything."""
+
+    month_start = as_of.replace(day=1)
+    history_start = min(month_start, as_of - timedelta(days=HISTORY_DAYS - 1))
+    history = SpendingHistory.load(user_id, history_start, as_of)
+
+    budgeted_cents = dict(db.session.query(
+        MonthlyBudget.user_subcategory_id,
+        db.cast(db.func.round(MonthlyBudget.budgeted_amount * 100), db.BigInteger)).
+        filter(MonthlyBudget.user_id == user_id,
+               MonthlyBudget.month == as_of.month,
+               MonthlyBudget.year == as_of.year).all())
+
+    # Subcategories with a budget but no spend in the window still need a row
+    missing = set(budgeted_cents) - set(int(sub_id) for sub_id in history.subcategory_ids)
+    if missing:
+        history = SpendingHistory(history.start, history.end,
+                                  np.concatenate([history.cents, np.zeros(len(missing), dtype=np.int64)]),
+                                  np.concatenate([history.days, np.zeros(len(missing), dtype=np.int64)]),
+                                  np.concatenate([history.subcategory_ids[history.codes], sorted(missing)]))
+
+    forecast = forecast_month(history, month_start, as_of, budgeted_cents)
+
+    names = {u_sub.id: u_sub for u_sub in user_subcategories}
+    subcategories = []
+    for row in forecast['subcategories']:
+        u_sub = names.get(row['id'])
+        if row['id'] is not None and (u_sub is None or not u_sub.active):
+            continue
+        subcategories.append({
+            'id': row['id'],
+            'name': u_sub.name if u_sub else 'Uncategorized',
+            'user_category_id': u_sub.user_category_id if u_sub else None,
+            **{key: to_money(value) for key, value in row.items() if key not in ('id', 'overrun_probability')},
+            'overrun_probability': row['overrun_probability']
+        })
+
+    return {
+        'as_of': as_of.isoformat(),
+        'month': as_of.month,
+        'year': as_of.year,
+        'days_elapsed': forecast['days_elapsed'],
+        'days_in_month': forecast['days_in_month'],
+        'totals': {key: to_money(value) for key, value in forecast['totals'].items()},
+        'subcategories': subcategories,
+        'daily': {
+            'dates': forecast['daily']['dates'],
+            'spent': [to_money(value) for value in forecast['daily']['spent']],
+            'moving_average_7': [to_money(value) for value in forecast['daily']['moving_average_7']]
+        }
+    }
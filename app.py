@@ -1,30 +1,58 @@
 import os
-from dotenv import load_dotenv
-from flask import Flask, render_template, redirect, request, session, flash, g, url_for, jsonify
+from flask import Flask, Response, render_template, redirect, request, session, flash, g, url_for, jsonify, stream_with_context
 from datetime import datetime, date, timedelta
-from flask_debugtoolbar import DebugToolbarExtension
-from sqlalchemy import func
+from decimal import Decimal
 from sqlalchemy.exc import IntegrityError
-from models import db, connect_db, User, Account, Transaction, Category, Subcategory, UserCategory, UserSubcategory, MonthlyBudget
-from forms import SignupLoginForm, AccountEntryForm, CategoryEntryForm, TransactionForm
+from models import db, connect_db, User, Account, AccountBalanceSnapshot, Transaction, Category, Subcategory, UserCategory, UserSubcategory, MonthlyBudget
+from forms import SignupLoginForm, AccountEntryForm, CategoryEntryForm, TransactionForm, TransactionImportForm
+from fragments import render_category_blocks
+from aggregates import MAX_TREND_MONTHS, get_changed_totals, get_month_summary, get_trends, month_etag
+from commands import register_commands
+from ledger import LEDGER_FILTER_ARGS, PAGE_SIZE, parse_ledger_filters, get_transactions_page, search_transactions, transaction_to_json
+from importer import import_statement
+from taxonomy import get_taxonomy
+from passwords import PasswordServiceBusy, configure_passwords
+from instrumentation import init_instrumentation, request_metrics
+from replicas import bookkeeping_writes, configure_replica, init_replica_routing, replica_reads
+from cache import configure_cache, get_cached_user, get_category_template, render_cache_metrics
+from exports import EXPORT_FORMATS, transaction_export_query, budget_export_query, export_chunks
 from dateutil.relativedelta import relativedelta
 
 
 CURR_USER_KEY = 'curr_user'
-load_dotenv()
 
-def create_app(db_name, testing=False):
+def create_app(db_name, testing=False, production=None):
+    """Builds the app. production (default: APP_ENV=production in the environment) leaves out dev-only
+        extensions; entry points load .env and bind the database (server.py, seed.py, migrate.py)."""
+
+    if production is None:
+        production = os.environ.get('APP_ENV') == 'production'
+
     app = Flask(__name__)
+    app.config['PRODUCTION'] = production
     app.config['SQLALCHEMY_DATABASE_URI'] = (os.environ.get('DATABASE_URI', f'postgresql:///{db_name}'))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = False
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'its_a_secret')
 
+    for key in ('BCRYPT_LOG_ROUNDS', 'BCRYPT_TARGET_MS', 'PASSWORD_HASH_WORKERS', 'PASSWORD_HASH_QUEUE', 'PASSWORD_HASH_TIMEOUT'):
+        if key in os.environ:
+            app.config[key] = os.environ[key]
+
     if testing:
         app.config['TESTING'] = True
         app.config['SQLALCHEMY_ECHO'] = True
 
-    toolbar = DebugToolbarExtension()
+    if not production:
+        from flask_debugtoolbar import DebugToolbarExtension
+        toolbar = DebugToolbarExtension()
+
+    register_commands(app)
+    configure_cache(app)
+    configure_passwords(app)
+    init_instrumentation(app)
+    configure_replica(app)
+    init_replica_routing(app, db)
    
     # IMPORTANT!
     # ------------------------------------------------------------------------------------
@@ -39,7 +67,7 @@ def create_app(db_name, testing=False):
         """Adds the user that logs in successfully to the global variable."""
 
         if CURR_USER_KEY in session:
-            g.user = User.query.get(session[CURR_USER_KEY])
+            g.user = get_cached_user(session[CURR_USER_KEY])
 
         else:
             g.user = None
@@ -57,16 +85,13 @@ def create_app(db_name, testing=False):
 
     
     # Homepage/Dashboard route
+    # Reads the primary: it may create the month's budget rows, and its budget forms need them straight away
     @app.route('/', methods=['GET', 'POST'])
     def homepage():
         if g.user:
+            taxonomy = get_taxonomy(g.user.id)
             form = TransactionForm()
-            form.account.choices = [(a.id, a.account_name) for a in Account.query.filter_by(user_id=g.user.id).all()]
-            form.category.choices = [(c.id, c.name) for c in UserCategory.query.filter_by(user_id=g.user.id, active=True).all()]
-            form.subcategory.choices = [(sc.id, sc.name) for sc in UserSubcategory.query.filter_by(user_id=g.user.id, active=True).all()]
-
-            user_categories = UserCategory.query.filter_by(user_id=g.user.id, active=True).all()
-            user_subcategories = UserSubcategory.query.filter_by(user_id=g.user.id, active=True).all()
+            taxonomy.set_transaction_choices(form)
 
             # Determine the current or selected month and year
             current_month = datetime.now().month
@@ -79,49 +104,18 @@ def create_app(db_name, testing=False):
             formatted_date = selected_date.strftime('%B %Y')
             short_formatted_date = selected_date.strftime('%b %Y')
 
-            # Ensure a MonthlyBudget exists for each UserSubcategory
-            for subcategory in user_subcategories:
-                monthly_budget = MonthlyBudget.query.filter_by(
-                    user_id=g.user.id,
-                    user_category_id=subcategory.user_category_id,
-                    user_subcategory_id=subcategory.id,
-                    month=selected_month,
-                    year=selected_year
-                ).first()
-
-                if not monthly_budget:
-                    monthly_budget = MonthlyBudget(
-                        user_id=g.user.id,
-                        user_category_id=subcategory.user_category_id,
-                        user_subcategory_id=subcategory.id,
-                        month=selected_month,
-                        year=selected_year,
-                        budgeted_amount=0.00,  # Default budget amount, can be modified later
-                        spent_amount=0.00
-                    )
-                    db.session.add(monthly_budget)
-                    db.session.commit()
-
-            # Fetch the created or existing MonthlyBudgets for display
-            monthly_budgets = MonthlyBudget.query.filter_by(
-                user_id=g.user.id,
-                month=selected_month,
-                year=selected_year
-            ).all()
-
-            # Sum of Budget + Actual for the month the user is viewing
-            total_budgeted = sum(u_cat.get_total_budgeted(selected_month, selected_year)
-                                 for u_cat in user_categories)
-            total_actual = sum(u_cat.get_total_actual(selected_month, selected_year)
-                                 for u_cat in user_categories)
-            difference = total_budgeted - total_actual
+            # Ensure a MonthlyBudget exists for each UserSubcategory (zero rows, so other views may keep using the replica)
+            with bookkeeping_writes(db):
+                MonthlyBudget.ensure_for_month(g.user.id, selected_month, selected_year)
+
+            # Category blocks with their budgeted/actual totals (cached until the month's data changes)
+            category_blocks, total_budgeted, total_actual = render_category_blocks(g.user.id, selected_month, selected_year, taxonomy)
 
             # Balance of Accounts (always "as of last updated date")
-            accounts = Account.query.filter_by(user_id=g.user.id).all()
+            accounts = taxonomy.accounts
             sum_of_accounts = sum(account.balance for account in accounts)
 
-            latest_account_date = db.session.query(func.greatest(func.max(Account.created_at), func.max(Account.updated_at)))\
-            .filter(Account.user_id == g.user.id).scalar()
+            latest_account_date = AccountBalanceSnapshot.latest_update(g.user.id)
 
             if latest_account_date:
                 latest_account_date_str = latest_account_date.strftime('%b %d, %Y')
@@ -130,12 +124,10 @@ def create_app(db_name, testing=False):
 
 
             return render_template('users/dashboard.html', form=form,
-                                user_categories=user_categories,
-                                user_subcategories=user_subcategories,
-                                monthly_budgets=monthly_budgets,
+                                category_blocks=category_blocks,
                                 total_budgeted=total_budgeted,
                                 total_actual=total_actual,
-                                difference=difference,
+                                difference=total_budgeted - total_actual,
                                 accounts=accounts,
                                 sum_of_accounts=sum_of_accounts,
                                 latest_account_date_str=latest_account_date_str,
@@ -167,7 +159,70 @@ def create_app(db_name, testing=False):
             return redirect(url_for('homepage'))
         else:
             return jsonify({'error': 'Budget entry not found'}), 404
-        
+
+    MAX_BUDGET_EDITS = 500
+    MAX_BUDGETED_AMOUNT = Decimal('100000000')  # Numeric(10, 2)
+
+    @app.route('/api/budgets', methods=['POST'])
+    def update_budgeted_amounts():
+        """Applies a batch of budgeted amount edits in one transaction.
+            Takes JSON {"edits": [{"user_subcategory_id", "month", "year", "budgeted_amount"}, ...]} (the last edit of
+            a cell wins) and returns only the totals that changed, for the dashboard to patch in place."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        body = request.get_json(silent=True)
+        edits = body.get('edits') if isinstance(body, dict) else None
+        if not isinstance(edits, list) or not 0 < len(edits) <= MAX_BUDGET_EDITS:
+            return jsonify({'error': f'Send between 1 and {MAX_BUDGET_EDITS} edits'}), 400
+
+        cells = {}
+        try:
+            for edit in edits:
+                key = (int(edit['user_subcategory_id']), int(edit['month']), int(edit['year']))
+                amount = Decimal(str(edit['budgeted_amount'])).quantize(Decimal('0.01'))
+                if not 1 <= key[1] <= 12 or abs(amount) >= MAX_BUDGETED_AMOUNT:
+                    raise ValueError
+                cells[key] = amount
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            return jsonify({'error': 'Each edit needs a user_subcategory_id, month, year and budgeted_amount'}), 400
+
+        changed = MonthlyBudget.set_budgeted_amounts(g.user.id, [key + (amount,) for key, amount in cells.items()])
+        return jsonify(get_changed_totals(g.user.id, changed))
+
+    MAX_ROLLOVER_MONTHS = 24
+    MAX_AVERAGE_MONTHS = 12
+
+    @app.route('/api/budgets/rollover', methods=['POST'])
+    def roll_over_budgets():
+        """Fills the unset budgets of month/year (through through_month/through_year) from source_month/source_year,
+            default the previous month, or from the average of the previous average_months. Takes JSON; safe to repeat."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Send a JSON body with month and year'}), 400
+
+        try:
+            target_start = date(int(body['year']), int(body['month']), 1)
+            target_end = date(int(body.get('through_year', target_start.year)), int(body.get('through_month', target_start.month)), 1)
+            source = date(int(body['source_year']), int(body['source_month']), 1) if 'source_month' in body else None
+            average_months = int(body['average_months']) if 'average_months' in body else None
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Invalid month, year, through or source'}), 400
+
+        months = (target_end.year - target_start.year) * 12 + target_end.month - target_start.month + 1
+        if not 1 <= months <= MAX_ROLLOVER_MONTHS:
+            return jsonify({'error': f'Roll over between 1 and {MAX_ROLLOVER_MONTHS} months at a time'}), 400
+        if average_months is not None and (source or not 1 <= average_months <= MAX_AVERAGE_MONTHS):
+            return jsonify({'error': f'Use either a source month or average_months between 1 and {MAX_AVERAGE_MONTHS}'}), 400
+
+        filled = MonthlyBudget.roll_over(target_start, target_end, source=source, average_months=average_months, user_id=g.user.id)
+        return jsonify({'filled': filled})
+
     @app.route('/user/<int:user_id>/profile')
     def show_profile(user_id):
         """Allow a user to view their profile.
@@ -189,10 +244,16 @@ def create_app(db_name, testing=False):
             try:
                 user = User.signup(
                     email = form.email.data,
-                    password = form.password.data
+                    password = form.password.data,
+                    template = get_category_template()
                 )
                 db.session.commit()
 
+            except PasswordServiceBusy:
+                db.session.rollback()
+                flash('We are signing up a lot of people right now. Please try again in a moment.', 'danger')
+                return render_template('/users/signup.html', form=form), 503
+
             except IntegrityError as e:
                 db.session.rollback()
                 if 'unique constraint' in str(e.orig):
@@ -214,7 +275,11 @@ def create_app(db_name, testing=False):
         form = SignupLoginForm()
 
         if form.validate_on_submit():
-            user = User.authenticate(form.email.data, form.password.data)
+            try:
+                user = User.authenticate(form.email.data, form.password.data)
+            except PasswordServiceBusy:
+                flash('We are handling a lot of logins right now. Please try again in a moment.', 'danger')
+                return render_template('/users/login.html', form=form), 503
 
             if user:
                 do_login(user)
@@ -243,7 +308,7 @@ def create_app(db_name, testing=False):
         
         form = AccountEntryForm()
 
-        accounts = Account.query.filter_by(user_id=user_id).all()
+        accounts = get_taxonomy(user_id).accounts
 
         if form.validate_on_submit():
             account_name = form.account_name.data
@@ -291,27 +356,51 @@ def create_app(db_name, testing=False):
         
         cat_form = CategoryEntryForm()
         
-        # Active user categories/subcategories
-        user_categories = UserCategory.query.filter_by(user_id=g.user.id, active=True).all()
-        user_subcategories = UserSubcategory.query.filter_by(user_id=g.user.id, active=True).all()
+        # Active user categories, with each one's subcategories
+        taxonomy = get_taxonomy(g.user.id)
 
-        return render_template('/setup/categories.html', cat_form=cat_form, user_categories=user_categories, user_subcategories=user_subcategories)
+        return render_template('/setup/categories.html', cat_form=cat_form, user_categories=taxonomy.active_categories,
+                               subcategories_by_category=taxonomy.subcategories_by_category)
 
     # Transactions
     @app.route('/user/<int:user_id>/transactions')
+    @replica_reads
     def show_transactions(user_id):
-        transactions = Transaction.query.filter_by(user_id=user_id).all()
+        """First page of the user's ledger (newest first), with filters. Later pages load from /api/transactions."""
 
-        return render_template('transactions/transactions.html', user_id=user_id, transactions=transactions)
+        if not g.user or g.user.id != user_id:
+            flash('Access unauthorized.', 'danger')
+            return redirect(url_for('homepage'))
+
+        filters = parse_ledger_filters(request.args)
+        try:
+            transactions, next_cursor = get_transactions_page(user_id, filters, cursor=request.args.get('cursor'))
+        except ValueError:
+            transactions, next_cursor = get_transactions_page(user_id, filters)
+
+        # Active filters, carried over to the "load more" links
+        filter_args = {key: request.args[key] for key in LEDGER_FILTER_ARGS if request.args.get(key)}
+
+        taxonomy = get_taxonomy(user_id)
+
+        return render_template('transactions/transactions.html', user_id=user_id, transactions=transactions,
+                               next_cursor=next_cursor, filter_args=filter_args, accounts=taxonomy.accounts,
+                               user_categories=taxonomy.categories, user_subcategories=taxonomy.subcategories)
     
     @app.route('/add-transaction', methods=['GET', 'POST'])
     def add_transaction():
+        if not g.user:
+            flash('Access unauthorized.', 'danger')
+            return redirect(url_for('homepage'))
+
+        taxonomy = get_taxonomy(g.user.id)
         form = TransactionForm()
-        form.account.choices = [(a.id, a.account_name) for a in Account.query.filter_by(user_id=g.user.id).all()]
-        form.category.choices = [(c.id, c.name) for c in UserCategory.query.filter_by(user_id=g.user.id, active=True).all()]
-        form.subcategory.choices = [(sc.id, sc.name) for sc in UserSubcategory.query.filter_by(user_id=g.user.id, active=True).all()]
+        taxonomy.set_transaction_choices(form)
 
         if form.validate_on_submit():
+            if not taxonomy.subcategory_in_category(form.subcategory.data, form.category.data):
+                flash('That subcategory is not in the selected category.', 'danger')
+                return redirect(url_for('homepage'))
             try:
                 transaction = Transaction(
                     user_id=g.user.id,
@@ -332,6 +421,68 @@ def create_app(db_name, testing=False):
 
         return redirect(url_for('homepage'))
     
+    @app.route('/user/<int:user_id>/transactions/import', methods=['GET', 'POST'])
+    def import_transactions(user_id):
+        """Bulk-imports a CSV/OFX bank statement. Answers with the import report (JSON if the client asks for it)."""
+
+        if not g.user or g.user.id != user_id:
+            flash('Access unauthorized.', 'danger')
+            return redirect(url_for('homepage'))
+
+        form = TransactionImportForm()
+        taxonomy = get_taxonomy(user_id)
+        form.account.choices = [(0, 'From file')] + taxonomy.account_choices()
+        form.subcategory.choices = [(0, 'From file')] + taxonomy.subcategory_choices()
+
+        if form.validate_on_submit():
+            report = import_statement(taxonomy, form.statement.data,
+                                      default_account_id=form.account.data or None,
+                                      default_subcategory_id=form.subcategory.data or None)
+
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(report)
+
+            flash(f"Imported {report['inserted']} transactions ({report['duplicates']} already imported, {report['error_count']} errors).",
+                  'success' if not report['error_count'] else 'warning')
+            return render_template('/transactions/import_transactions.html', user_id=user_id, form=form, report=report)
+
+        return render_template('/transactions/import_transactions.html', user_id=user_id, form=form, report=None)
+
+    # Exports
+    def export_response(user_id, query, name):
+        """Streams an export as ?format=csv (default) or ?format=ndjson."""
+
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+        filename = f'finwize-{name}-{date.today().isoformat()}.{export_format}'
+        return Response(stream_with_context(export_chunks(query, export_format)),
+                        mimetype=EXPORT_FORMATS[export_format],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+    @app.route('/user/<int:user_id>/transactions/export')
+    @replica_reads
+    def export_transactions(user_id):
+        """Downloads every transaction the user has entered."""
+
+        if not g.user or g.user.id != user_id:
+            flash('Access unauthorized.', 'danger')
+            return redirect(url_for('homepage'))
+
+        return export_response(user_id, transaction_export_query(user_id), 'transactions')
+
+    @app.route('/user/<int:user_id>/budgets/export')
+    @replica_reads
+    def export_budgets(user_id):
+        """Downloads the user's budgeted vs. spent amounts for every month."""
+
+        if not g.user or g.user.id != user_id:
+            flash('Access unauthorized.', 'danger')
+            return redirect(url_for('homepage'))
+
+        return export_response(user_id, budget_export_query(user_id), 'budgets')
+
     @app.route('/user/<int:user_id>/transactions/<int:tran_id>', methods=['GET', 'POST'])
     def update_transaction(user_id, tran_id):
         """Allow a user to update their transaction in the transactions view."""
@@ -343,11 +494,14 @@ def create_app(db_name, testing=False):
         
         form = TransactionForm(obj=transaction)
 
-        form.account.choices = [(a.id, a.account_name) for a in Account.query.filter_by(user_id=user_id).all()]
-        form.category.choices = [(c.id, c.name) for c in UserCategory.query.filter_by(user_id=user_id).all()]
-        form.subcategory.choices = [(u_sub.id, u_sub.name ) for u_sub in UserSubcategory.query.filter_by(user_id=user_id).all()]
+        taxonomy = get_taxonomy(user_id)
+        taxonomy.set_transaction_choices(form, active_only=False)
 
         if form.validate_on_submit():
+            if not taxonomy.subcategory_in_category(form.subcategory.data, form.category.data):
+                flash('That subcategory is not in the selected category.', 'danger')
+                return render_template('/transactions/update_transaction.html', user_id=user_id, form=form, transaction=transaction)
+
             transaction.account_id = form.account.data
             transaction.user_category_id = form.category.data
             transaction.user_subcategory_id = form.subcategory.data
@@ -364,40 +518,191 @@ def create_app(db_name, testing=False):
     
     # Monthly Budget Data - API
     @app.route('/api/get-monthly-data', methods=['GET'])
+    @replica_reads
     def get_monthly_data():
-        """Fetches the budget data for the given month/year."""
+        """Fetches the budget data for the given month/year.
+            Answers If-None-Match with 304 when the month's budget rows and categories are unchanged."""
         month = request.args.get('month', type=int)
         year = request.args.get('year', type=int)
 
         if not (month and year):
             return jsonify({'error': 'Invalid month or year'}), 400
 
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
         user_id = g.user.id
 
-        # Get all active User Categories
-        user_categories = UserCategory.query.filter_by(user_id=user_id, active=True).all()
-        response_data = []
-
-        for u_cat in user_categories:
-            category_data = {
-                'category_name': u_cat.name,
-                'total_budgeted': u_cat.get_total_budgeted(month, year),
-                'total_actual': u_cat.get_total_actual(month, year),
-                'subcategories': []
-            }
-            
-            # Get all active User Subcategories
-            user_subcategories = UserSubcategory.query.filter_by(user_category_id=u_cat.id, active=True).all()
-            for u_sub in user_subcategories:
-                subcategory_data = {
-                    'subcategory_name': u_sub.name,
-                    'total_actual': u_sub.get_total_actual(month, year)
-                }
-                category_data['subcategories'].append(subcategory_data)
-
-            response_data.append(category_data)
-
-        return jsonify(response_data)
+        taxonomy = get_taxonomy(user_id)
+        etag = month_etag(user_id, month, year, taxonomy)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            summary = get_month_summary(user_id, month, year, taxonomy.categories, taxonomy.subcategories)
+
+            response_data = []
+            for category in summary['categories']:
+                response_data.append({
+                    'category_name': category['name'],
+                    'total_budgeted': category['total_budgeted'],
+                    'total_actual': category['total_actual'],
+                    'subcategories': [{'subcategory_name': u_sub['name'],
+                                       'total_budgeted': u_sub['total_budgeted'],
+                                       'total_actual': u_sub['total_actual']}
+                                      for u_sub in category['subcategories']]
+                })
+            response = jsonify(response_data)
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    # Budget Trends - API
+    @app.route('/api/trends', methods=['GET'])
+    @replica_reads
+    def get_trends_data():
+        """Budgeted vs. actual per category/subcategory over a range of months, with running totals and
+            month-over-month deltas. Takes months (default 12) and end=YYYY-MM (default this month)."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        months = request.args.get('months', 12, type=int)
+        try:
+            end = datetime.strptime(request.args['end'], '%Y-%m') if 'end' in request.args else datetime.now()
+        except ValueError:
+            return jsonify({'error': 'Invalid end month'}), 400
+
+        if not 1 <= months <= MAX_TREND_MONTHS:
+            return jsonify({'error': f'months must be between 1 and {MAX_TREND_MONTHS}'}), 400
+
+        taxonomy = get_taxonomy(g.user.id)
+        return jsonify(get_trends(g.user.id, end.month, end.year, months, taxonomy.categories, taxonomy.subcategories))
+
+    # Spending Forecast - API
+    @app.route('/api/forecast', methods=['GET'])
+    @replica_reads
+    def get_forecast_data():
+        """Burn rate, moving averages, month-end projection and overrun probability per subcategory for the month
+            containing as_of=YYYY-MM-DD (default today)."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        try:
+            as_of = date.fromisoformat(request.args['as_of']) if 'as_of' in request.args else date.today()
+        except ValueError:
+            return jsonify({'error': 'Invalid as_of date'}), 400
+
+        # Imported here so NumPy only loads in workers that serve forecasts
+        from analytics import get_forecast
+
+        taxonomy = get_taxonomy(g.user.id)
+        return jsonify(get_forecast(g.user.id, as_of, taxonomy.subcategories))
+
+    # Net Worth - API
+    NET_WORTH_INTERVALS = {'day': '1 day', 'week': '1 week', 'month': '1 month'}
+
+    @app.route('/api/net-worth', methods=['GET'])
+    @replica_reads
+    def get_net_worth():
+        """Each account's balance and the total at the end of as_of=YYYY-MM-DD (default today)."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        try:
+            as_of = date.fromisoformat(request.args['as_of']) if 'as_of' in request.args else date.today()
+        except ValueError:
+            return jsonify({'error': 'Invalid as_of date'}), 400
+
+        balances = AccountBalanceSnapshot.balances_as_of(g.user.id, as_of)
+        return jsonify({
+            'as_of': as_of.isoformat(),
+            'net_worth': sum((balance for _, _, balance in balances if balance is not None), Decimal('0.00')),
+            'accounts': [{'id': account_id, 'account_name': name, 'balance': balance} for account_id, name, balance in balances]
+        })
+
+    @app.route('/api/net-worth/series', methods=['GET'])
+    @replica_reads
+    def get_net_worth_series():
+        """Net worth at each step from start to end (YYYY-MM-DD; default the last 12 months) by interval=day|week|month."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        interval = request.args.get('interval', 'month')
+        try:
+            end = date.fromisoformat(request.args['end']) if 'end' in request.args else date.today()
+            start = date.fromisoformat(request.args['start']) if 'start' in request.args else end - relativedelta(months=12)
+        except ValueError:
+            return jsonify({'error': 'Invalid start or end date'}), 400
+
+        if interval not in NET_WORTH_INTERVALS or start > end or (end - start).days > 366 * 10:
+            return jsonify({'error': 'Use interval day, week or month over at most 10 years'}), 400
+
+        points = AccountBalanceSnapshot.net_worth_series(g.user.id, start, end, NET_WORTH_INTERVALS[interval])
+        return jsonify({'interval': interval,
+                        'points': [{'date': day.isoformat(), 'net_worth': net_worth} for day, net_worth in points]})
+
+    # Transactions Ledger - API
+    @app.route('/api/transactions', methods=['GET'])
+    @replica_reads
+    def list_transactions_api():
+        """One page of the logged in user's ledger as JSON. Takes the same filters as the transactions page,
+            plus cursor (the previous page's next_cursor) and limit."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        filters = parse_ledger_filters(request.args)
+        try:
+            transactions, next_cursor = get_transactions_page(g.user.id, filters,
+                                                              cursor=request.args.get('cursor'),
+                                                              limit=request.args.get('limit', PAGE_SIZE, type=int))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        data = []
+        for tran in transactions:
+            tran_data = transaction_to_json(tran)
+            tran_data['edit_url'] = url_for('update_transaction', user_id=g.user.id, tran_id=tran.id)
+            data.append(tran_data)
+
+        return jsonify({'transactions': data, 'next_cursor': next_cursor})
+
+    @app.route('/api/transactions/search', methods=['GET'])
+    @replica_reads
+    def search_transactions_api():
+        """One page of the logged in user's transactions whose description matches q, best match first.
+            Takes the ledger filters, cursor and limit like /api/transactions."""
+
+        if not g.user:
+            return jsonify({'error': 'Access unauthorized'}), 401
+
+        filters = parse_ledger_filters(request.args)
+        try:
+            results, next_cursor = search_transactions(g.user.id, request.args.get('q', ''), filters,
+                                                       cursor=request.args.get('cursor'),
+                                                       limit=request.args.get('limit', PAGE_SIZE, type=int))
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+
+        data = []
+        for tran in results:
+            tran_data = transaction_to_json(tran)
+            tran_data['score'] = tran.score
+            tran_data['edit_url'] = url_for('update_transaction', user_id=g.user.id, tran_id=tran.id)
+            data.append(tran_data)
+
+        return jsonify({'transactions': data, 'next_cursor': next_cursor})
+
+    # Metrics
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """This worker's request/SQL and cache counters, for Prometheus to scrape."""
+
+        return Response(request_metrics.render() + render_cache_metrics(), mimetype='text/plain; version=0.0.4')
 
 
     return app
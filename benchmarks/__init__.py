@@ -0,0 +1,3 @@
+"""Benchmark harness: a deterministic synthetic data generator and timings of the app's hot paths.
+
+    python -m benchmarks.run_benchmarks --help"""
@@ -0,0 +1,270 @@
+"""Replays a weighted mix of real traffic against a running server over HTTP and reports throughput, latency
+    percentiles and error rates per route.
+
+    Point it at a local gunicorn and Postgres loaded with synthetic users:
+
+    python -m benchmarks.loadtest --generate finwize_db_load --users 50        # once: (re)creates bench0..bench49
+    DATABASE_URI=postgresql:///finwize_db_load gunicorn -w 4 server:app
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 --users 50 --rate 200 --duration 60
+
+    Every virtual user logs in through /login with its own cookie jar, then requests are started on a fixed
+    schedule of --rate per second (open loop) and run on --concurrency threads. Latency is measured from each
+    request's scheduled start, so time spent queued behind a saturated server counts against it; when the
+    achieved rate falls short of --rate, the server (or --concurrency) is the limit. Raise --rate or change the
+    worker count and pool size between runs to find where p95 and errors climb.
+
+    The mix is route=weight pairs, from: homepage (a random month in the last year), monthly_data,
+    add_transaction and update_budget. Only the standard library is needed to drive load; --generate needs the app."""
+
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from benchmarks.run_benchmarks import DEFAULT_TODAY, percentile
+from benchmarks.synthetic import BENCH_PASSWORD
+
+DEFAULT_MIX = 'homepage=50,monthly_data=30,add_transaction=10,update_budget=10'
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+CATEGORY_PAIR = re.compile(r'data-category-id="(\d+)" data-subcategory-id="(\d+)"')
+ACCOUNT_SELECT = re.compile(r'<select[^>]*name="account"[^>]*>(.*?)</select>', re.S)
+OPTION_VALUE = re.compile(r'<option[^>]*value="(\d+)"')
+BUDGET_ACTION = re.compile(r'action="(/user/\d+/budgeted_amount)"')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Leaves redirects unfollowed, so a POST is timed on its own (urllib raises HTTPError for the 3xx)."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class VirtualUser:
+    """One logged-in synthetic user: its own cookie jar plus the ids and CSRF token scraped from the dashboard."""
+
+    def __init__(self, base_url, email, password, timeout):
+        self.base_url = base_url
+        self.email = email
+        self.password = password
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+        self.csrf_token = None
+        self.category_pairs = []
+        self.account_ids = []
+        self.budget_action = None
+
+    def request(self, path, data=None):
+        """Returns (status, body). Redirects come back as their 3xx status; connection errors raise."""
+
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=self.timeout) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as error:
+            return error.code, ''
+
+    def log_in(self):
+        status, page = self.request('/login')
+        token = CSRF_TOKEN.search(page)
+        status, _ = self.request('/login', {'email': self.email, 'password': self.password,
+                                            'csrf_token': token.group(1) if token else ''})
+        if status != 302:
+            raise RuntimeError(f'Login failed for {self.email} ({status})')
+
+        status, page = self.request('/')
+        self.scrape_dashboard(page)
+        if not (self.csrf_token and self.category_pairs and self.account_ids and self.budget_action):
+            raise RuntimeError(f'{self.email} has no accounts or budgets to use on the dashboard')
+
+    def scrape_dashboard(self, page):
+        token = CSRF_TOKEN.search(page)
+        accounts = ACCOUNT_SELECT.search(page)
+        action = BUDGET_ACTION.search(page)
+
+        self.csrf_token = token.group(1) if token else ''
+        self.category_pairs = [(int(cat_id), int(sub_id)) for cat_id, sub_id in CATEGORY_PAIR.findall(page)]
+        self.account_ids = [int(value) for value in OPTION_VALUE.findall(accounts.group(1))] if accounts else []
+        self.budget_action = action.group(1) if action else None
+
+
+def month_back(today, months):
+    index = today.year * 12 + today.month - 1 - months
+    return index % 12 + 1, index // 12
+
+
+def make_routes(today):
+    """Each route takes (user, rng) and returns the HTTP status."""
+
+    def homepage(user, rng):
+        month, year = month_back(today, rng.randrange(12))
+        return user.request(f'/?month={month}&year={year}')[0]
+
+    def monthly_data(user, rng):
+        month, year = month_back(today, rng.randrange(12))
+        return user.request(f'/api/get-monthly-data?month={month}&year={year}')[0]
+
+    def add_transaction(user, rng):
+        cat_id, sub_id = rng.choice(user.category_pairs)
+        return user.request('/add-transaction', {
+            'csrf_token': user.csrf_token, 'description': 'Load test', 'tran_date': today.isoformat(),
+            'amount': f'{rng.uniform(1, 200):.2f}', 'account': rng.choice(user.account_ids),
+            'category': cat_id, 'subcategory': sub_id})[0]
+
+    def update_budget(user, rng):
+        _, sub_id = rng.choice(user.category_pairs)
+        return user.request(user.budget_action, {
+            'user_subcategory_id': sub_id, 'month': today.month, 'year': today.year,
+            'budgeted_amount': f'{rng.randrange(50, 1500)}'})[0]
+
+    return {'homepage': homepage, 'monthly_data': monthly_data, 'add_transaction': add_transaction,
+            'update_budget': update_budget}
+
+
+def parse_mix(mix, routes):
+    """'homepage=50,monthly_data=30' -> {'homepage': 50, 'monthly_data': 30}."""
+
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in routes:
+            raise ValueError(f'Unknown route {name!r}; choose from {", ".join(routes)}')
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class RouteStats:
+    """Thread-safe latencies and outcomes per route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route, milliseconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(milliseconds)
+            self.errors[route] = self.errors.get(route, 0) + (0 if ok else 1)
+
+    def summary(self, seconds):
+        with self._lock:
+            routes = {route: list(latencies) for route, latencies in self.latencies.items()}
+            errors = dict(self.errors)
+        routes['all'] = [ms for latencies in routes.values() for ms in latencies]
+        errors['all'] = sum(errors.values())
+
+        return {route: {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / seconds, 2),
+            'error_rate': round(errors[route] / len(latencies), 4),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'max_ms': round(max(latencies), 1)
+        } for route, latencies in sorted(routes.items()) if latencies}
+
+
+def run_load(users, routes, weights, rate, duration, concurrency, seed=0):
+    """Starts rate requests per second for duration seconds, each a weighted random route as a random user.
+        Returns (RouteStats, elapsed seconds)."""
+
+    rng = random.Random(seed)
+    names = list(weights)
+    stats = RouteStats()
+    local = threading.local()
+
+    def send(route, user, scheduled):
+        if not hasattr(local, 'rng'):
+            local.rng = random.Random(rng.random())
+        try:
+            ok = routes[route](user, local.rng) < 400
+        except (OSError, urllib.error.URLError):
+            ok = False
+        stats.record(route, (time.perf_counter() - scheduled) * 1000, ok)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(int(rate * duration)):
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route = rng.choices(names, weights=[weights[name] for name in names])[0]
+            pool.submit(send, route, rng.choice(users), scheduled)
+    return stats, time.perf_counter() - started
+
+
+def generate_users(db_name, users, transactions, today):
+    """Drops and regenerates db_name with the synthetic users (bench0@example.com ...)."""
+
+    from app import create_app
+    from models import db, connect_db
+    from benchmarks.synthetic import generate
+
+    app = create_app(db_name)
+    connect_db(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate(users, transactions, today=today)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=20, help='Synthetic users to log in (bench0 .. benchN-1).')
+    parser.add_argument('--rate', type=float, default=50, help='Target requests per second.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load.')
+    parser.add_argument('--concurrency', type=int, default=64, help='Client threads; keep above rate x p99 seconds.')
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--today', type=date.fromisoformat, default=DEFAULT_TODAY,
+                        help='Month the generated data ends in; navigation and new rows stay within the last year of it.')
+    parser.add_argument('--generate', metavar='DB', help='Regenerate this database with --users users, then exit.')
+    parser.add_argument('--transactions', type=int, default=2000, help='Transactions per user for --generate.')
+    parser.add_argument('--output', help='Also write the results as JSON.')
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_users(args.generate, args.users, args.transactions, args.today)
+        print(f'Generated {args.users} users in {args.generate}.')
+        return
+
+    routes = make_routes(args.today)
+    weights = parse_mix(args.mix, routes)
+
+    users = [VirtualUser(args.base_url.rstrip('/'), f'bench{i}@example.com', BENCH_PASSWORD, args.timeout)
+             for i in range(args.users)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(args.concurrency, len(users))) as pool:
+        list(pool.map(VirtualUser.log_in, users))
+    login_seconds = time.perf_counter() - started
+
+    stats, seconds = run_load(users, routes, weights, args.rate, args.duration, args.concurrency, args.seed)
+    results = {
+        'meta': {'base_url': args.base_url, 'users': args.users, 'target_rps': args.rate, 'duration': args.duration,
+                 'concurrency': args.concurrency, 'mix': weights, 'login_seconds': round(login_seconds, 2),
+                 'elapsed_seconds': round(seconds, 2)},
+        'routes': stats.summary(seconds)
+    }
+
+    print(f"{'route':<18}{'requests':>9}{'rps':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, route in results['routes'].items():
+        print(f"{name:<18}{route['requests']:>9}{route['throughput_rps']:>9.1f}{route['error_rate']:>9.2%}"
+              f"{route['p50_ms']:>10.1f}{route['p95_ms']:>10.1f}{route['p99_ms']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
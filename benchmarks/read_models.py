@@ -0,0 +1,100 @@
+"""Compares loading ledger listings as ORM instances against the slim LedgerRow read model.
+
+    python -m benchmarks.read_models --db finwize_db_bench --rows 10000
+
+    Each strategy loads the same newest --rows transactions of one synthetic user (with account/category/subcategory
+    names) and reads every field a ledger line shows. Reports the best time of --iterations runs and the memory the
+    loaded rows hold (tracemalloc), both scaled per 10k rows. --reuse keeps an existing benchmark database."""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app import create_app
+from models import db, connect_db, Transaction
+from ledger import ledger_select, load_ledger_rows
+from benchmarks.synthetic import generate
+from benchmarks.run_benchmarks import DEFAULT_TODAY
+
+PER_ROWS = 10000
+
+
+def load_orm(user_id, rows):
+    """Tracked Transaction instances with their categories eager-loaded (the ledger's previous read path)."""
+
+    transactions = Transaction.query.\
+        options(db.joinedload(Transaction.user_category), db.joinedload(Transaction.user_subcategory)).\
+        filter(Transaction.user_id == user_id).\
+        order_by(Transaction.tran_date.desc(), Transaction.id.desc()).\
+        limit(rows).all()
+    for tran in transactions:
+        (tran.id, tran.tran_date, tran.description, tran.amount, tran.user_category.name, tran.user_subcategory.name)
+    return transactions
+
+def load_rows(user_id, rows):
+    """LedgerRows from one column SELECT."""
+
+    transactions = load_ledger_rows(ledger_select().
+                                    where(Transaction.user_id == user_id).
+                                    order_by(Transaction.tran_date.desc(), Transaction.id.desc()).
+                                    limit(rows))
+    for tran in transactions:
+        (tran.id, tran.tran_date, tran.description, tran.amount, tran.category_name, tran.subcategory_name)
+    return transactions
+
+STRATEGIES = {'orm': load_orm, 'ledger_rows': load_rows}
+
+
+def measure(load, user_id, rows, iterations):
+    """(best seconds, bytes held by the loaded rows, rows loaded) for one strategy, from a clean session each run."""
+
+    best = None
+    for _ in range(iterations):
+        db.session.expunge_all()
+        gc.collect()
+        started = time.perf_counter()
+        loaded = load(user_id, rows)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        del loaded
+
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    loaded = load(user_id, rows)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, held, len(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='finwize_db_bench', help='Scratch database name (DATABASE_URI overrides).')
+    parser.add_argument('--rows', type=int, default=PER_ROWS)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--reuse', action='store_true', help='Use the existing database instead of regenerating it.')
+    args = parser.parse_args()
+
+    app = create_app(args.db)
+    connect_db(app)
+
+    with app.app_context():
+        if args.reuse:
+            user_id = db.session.execute(db.text(
+                'SELECT user_id FROM transactions GROUP BY user_id ORDER BY count(*) DESC LIMIT 1')).scalar()
+        else:
+            db.drop_all()
+            db.create_all()
+            user_id = generate(users=1, transactions=args.rows, today=DEFAULT_TODAY)[0]
+
+        results = {name: measure(load, user_id, args.rows, args.iterations) for name, load in STRATEGIES.items()}
+
+    print(f"{'strategy':<14}{'rows':>8}{'ms / 10k':>12}{'KiB / 10k':>12}")
+    for name, (seconds, held, loaded) in results.items():
+        scale = PER_ROWS / max(loaded, 1)
+        print(f'{name:<14}{loaded:>8}{seconds * 1000 * scale:>12.1f}{held / 1024 * scale:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
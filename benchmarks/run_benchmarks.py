@@ -0,0 +1,187 @@
+"""Times the app's key paths against a synthetic database and writes p50/p95 latency and query counts as JSON.
+
+    python -m benchmarks.run_benchmarks --db finwize_db_bench --users 20 --transactions 5000 --output results.json
+    python -m benchmarks.run_benchmarks --compare before.json after.json
+
+    The database is dropped and regenerated on every run (--reuse skips that), so point --db at a scratch database.
+    Requests go through Flask's test client, so timings cover routing, templates and SQL but not the network."""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date
+from itertools import count
+
+from app import create_app, CURR_USER_KEY
+from models import db, connect_db, UserSubcategory, Account
+from passwords import configure_passwords
+from instrumentation import count_queries
+from benchmarks.synthetic import generate, BENCH_PASSWORD
+
+DEFAULT_TODAY = date(2024, 7, 15)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile (pct in 0-100) of a list of numbers."""
+
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def time_requests(make_request, iterations, warmup=3):
+    """Runs make_request(i) warmup + iterations times and returns latency/query stats for the timed runs."""
+
+    latencies, queries, db_ms = [], [], []
+    for i in range(warmup + iterations):
+        with count_queries() as stats:
+            started = time.perf_counter()
+            response = make_request(i)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.request.path} returned {response.status_code}')
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(stats.queries)
+            db_ms.append(stats.seconds * 1000)
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries_p50': percentile(queries, 50),
+        'queries_max': max(queries),
+        'db_ms_p50': round(percentile(db_ms, 50), 3)
+    }
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as sess:
+        sess[CURR_USER_KEY] = user_id
+
+
+def run(app, user_ids, iterations, today):
+    """Benchmarks each route as the first synthetic user (except signup, which creates new users)."""
+
+    client = app.test_client()
+    user_id = user_ids[0]
+    log_in(client, user_id)
+
+    u_sub = UserSubcategory.query.filter_by(user_id=user_id).first()
+    account = Account.query.filter_by(user_id=user_id).first()
+    month, year = today.month, today.year
+    emails = count()
+
+    def signup(i):
+        signup_client = app.test_client()
+        return signup_client.post('/signup', data={'email': f'signup{next(emails)}@example.com', 'password': BENCH_PASSWORD})
+
+    def add_transaction(i):
+        return client.post('/add-transaction', data={
+            'description': f'Benchmark {i}', 'tran_date': today.isoformat(), 'amount': '12.34',
+            'account': account.id, 'category': u_sub.user_category_id, 'subcategory': u_sub.id})
+
+    routes = {
+        'homepage': lambda i: client.get(f'/?month={month}&year={year}'),
+        'get_monthly_data': lambda i: client.get(f'/api/get-monthly-data?month={month}&year={year}'),
+        'show_transactions': lambda i: client.get(f'/user/{user_id}/transactions'),
+        'search_transactions': lambda i: client.get('/api/transactions/search?q=coffe'),
+        'signup': signup,
+        'add_transaction': add_transaction
+    }
+
+    return {name: time_requests(make_request, iterations) for name, make_request in routes.items()}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """Prints each route's p50/p95 and query count change between two results files."""
+
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file)['routes'], json.load(after_file)['routes']
+
+    print(f"{'route':<20}{'p50 ms':>22}{'p95 ms':>22}{'queries':>14}")
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name), after.get(name)
+        if not old or not new:
+            print(f'{name:<20} only in {"after" if new else "before"}')
+            continue
+        p50 = f"{old['p50_ms']:.1f} -> {new['p50_ms']:.1f}"
+        p95 = f"{old['p95_ms']:.1f} -> {new['p95_ms']:.1f}"
+        queries = f"{old['queries_p50']} -> {new['queries_p50']}"
+        print(f'{name:<20}{p50:>22}{p95:>22}{queries:>14}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='finwize_db_bench', help='Scratch database name (DATABASE_URI overrides).')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--transactions', type=int, default=2000, help='Transactions per user.')
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--today', type=date.fromisoformat, default=DEFAULT_TODAY,
+                        help='Anchor date for generated data and the benchmarked month (fixed so runs are comparable).')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--reuse', action='store_true', help='Keep the existing database instead of regenerating it.')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Diff two results files and exit.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    app = create_app(args.db)
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['BCRYPT_LOG_ROUNDS'] = args.bcrypt_rounds
+    configure_passwords(app)
+    connect_db(app)
+
+    with app.app_context():
+        started = time.perf_counter()
+        if args.reuse:
+            user_ids = [user_id for (user_id,) in db.session.execute(db.text("SELECT id FROM users WHERE email LIKE 'bench%' ORDER BY id"))]
+        else:
+            db.drop_all()
+            db.create_all()
+            user_ids = generate(args.users, args.transactions, args.years, args.seed, args.today)
+        generate_seconds = time.perf_counter() - started
+
+        results = {
+            'meta': {
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'users': args.users,
+                'transactions_per_user': args.transactions,
+                'years': args.years,
+                'seed': args.seed,
+                'today': args.today.isoformat(),
+                'iterations': args.iterations,
+                'bcrypt_rounds': args.bcrypt_rounds,
+                'generate_seconds': round(generate_seconds, 2)
+            },
+            'routes': run(app, user_ids, args.iterations, args.today)
+        }
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+    for name, stats in results['routes'].items():
+        print(f"{name:<20} p50 {stats['p50_ms']:>8.1f} ms  p95 {stats['p95_ms']:>8.1f} ms  queries {stats['queries_p50']}")
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measures worker boot: import time, app construction and the first request, each in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --profile production --top 15 --output startup.json
+
+    Every run starts a new Python process that imports the app, builds it with create_app() and binds the database
+    without creating tables (as a production worker does), then serves one anonymous GET / through the test client.
+    No database connection is needed. Reports the median of --runs per phase and profile, plus the modules with the
+    highest cumulative import time from `python -X importtime`."""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks.run_benchmarks import git_revision
+
+PROFILES = ('dev', 'production')
+
+# Runs in the child process; prints one JSON line of phase timings in ms
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+from models import connect_db
+imported = time.perf_counter()
+app = create_app('finwize_db', production=sys.argv[1] == 'production')
+connect_db(app, create_tables=False)
+created = time.perf_counter()
+status = app.test_client().get('/').status_code
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000, 'total_ms': (served - started) * 1000,
+                  'status': status, 'modules': len(sys.modules)}))
+"""
+
+
+def cold_start(profile):
+    """Phase timings from one fresh interpreter."""
+
+    result = subprocess.run([sys.executable, '-c', COLD_START, profile], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_importtime(stderr):
+    """{module: cumulative microseconds} from `python -X importtime` output (top-level entries keep their name)."""
+
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = max(modules.get(name.strip(), 0), int(cumulative))
+    return modules
+
+def slowest_imports(top):
+    """The top modules by cumulative import time (ms) when importing the app."""
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], capture_output=True, text=True, check=True)
+    modules = parse_importtime(result.stderr)
+    return [(name, round(us / 1000, 1)) for name, us in sorted(modules.items(), key=lambda item: -item[1])[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--profile', choices=PROFILES, action='append', help='Profile(s) to measure; default both.')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list.')
+    parser.add_argument('--output', help='Also write the results as JSON.')
+    args = parser.parse_args()
+
+    results = {'meta': {'revision': git_revision(), 'python': sys.version.split()[0], 'runs': args.runs}, 'profiles': {}}
+    for profile in args.profile or PROFILES:
+        runs = [cold_start(profile) for _ in range(args.runs)]
+        results['profiles'][profile] = {phase: round(statistics.median(run[phase] for run in runs), 1)
+                                        for phase in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms', 'modules')}
+    results['slowest_imports'] = slowest_imports(args.top)
+
+    print(f"{'profile':<12}{'import ms':>11}{'create ms':>11}{'1st req ms':>12}{'total ms':>10}{'modules':>9}")
+    for profile, phases in results['profiles'].items():
+        print(f"{profile:<12}{phases['import_ms']:>11.1f}{phases['create_app_ms']:>11.1f}"
+              f"{phases['first_request_ms']:>12.1f}{phases['total_ms']:>10.1f}{phases['modules']:>9.0f}")
+    print('\nSlowest imports (cumulative ms):')
+    for name, ms in results['slowest_imports']:
+        print(f'  {name:<40}{ms:>8.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Deterministic synthetic data for benchmarks.
+
+    generate() creates N users, each provisioned from the preset categories like a real signup, with a few
+    accounts, a budget for every subcategory and month, and M transactions spread over the last `years` years.
+    The same seed always produces the same rows, so timings from different versions are comparable."""
+
+import random
+from csv import DictReader
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from models import db, User, Account, Category, Subcategory, Transaction, UserSubcategory, MonthlyBudget
+
+GENERATOR_DIR = 'generator'
+ACCOUNT_NAMES = ('Checking', 'Savings', 'Credit Card', 'Brokerage')
+DESCRIPTIONS = ('Market', 'Online order', 'Coffee', 'Gas station', 'Pharmacy', 'Restaurant', 'Transfer', 'Utility bill')
+BENCH_PASSWORD = 'benchmark-password'
+
+
+def load_preset_categories(directory=GENERATOR_DIR):
+    """Loads generator/categories.csv and subcategories.csv (as seed.py does) if the tables are empty."""
+
+    if Category.query.first():
+        return
+
+    for model, filename in ((Category, 'categories.csv'), (Subcategory, 'subcategories.csv')):
+        with open(f'{directory}/{filename}') as csv_file:
+            rows = [{**row, 'active': row['active'].lower() == 'true'} for row in DictReader(csv_file)]
+        db.session.bulk_insert_mappings(model, rows)
+    db.session.commit()
+
+
+def month_starts(start, end):
+    """First day of every month from start's month through end's month."""
+
+    current = start.replace(day=1)
+    while current <= end:
+        yield current
+        current = (current + timedelta(days=32)).replace(day=1)
+
+
+def generate_user(rng, index, transactions, years, today):
+    """Creates one synthetic user and returns its id. Transactions are bulk inserted, then the spend rollups
+        are rebuilt in one statement (bulk inserts don't fire the per-row rollup events)."""
+
+    user = User.signup(email=f'bench{index}@example.com', password=BENCH_PASSWORD)
+
+    accounts = [Account(user_id=user.id, account_name=name, balance=Decimal(rng.randint(-5000_00, 50000_00)) / 100)
+                for name in ACCOUNT_NAMES[:rng.randint(2, len(ACCOUNT_NAMES))]]
+    db.session.add_all(accounts)
+    db.session.commit()
+    account_ids = [account.id for account in accounts]
+
+    subcategories = UserSubcategory.query.filter_by(user_id=user.id).order_by(UserSubcategory.id).all()
+    if not subcategories:
+        return user.id
+
+    # Each subcategory gets a typical monthly spend; budgets hover around it
+    typical = {u_sub.id: rng.choice((50, 120, 300, 800, 1500)) for u_sub in subcategories}
+    start = today - timedelta(days=365 * years)
+
+    budgets = [{'user_id': user.id, 'user_category_id': u_sub.user_category_id, 'user_subcategory_id': u_sub.id,
+                'month': month.month, 'year': month.year, 'spent_amount': 0,
+                'budgeted_amount': Decimal(round(typical[u_sub.id] * rng.uniform(0.8, 1.2))),
+                'created_at': month}
+               for month in month_starts(start, today) for u_sub in subcategories]
+    db.session.execute(insert(MonthlyBudget), budgets)
+
+    span = (today - start).days
+    weights = [typical[u_sub.id] for u_sub in subcategories]
+    rows = []
+    for u_sub in rng.choices(subcategories, weights=weights, k=transactions):
+        amount = Decimal(round(rng.lognormvariate(0, 1) * typical[u_sub.id] / 8 * 100)) / 100 or Decimal('0.01')
+        rows.append({'user_id': user.id, 'account_id': rng.choice(account_ids),
+                     'user_category_id': u_sub.user_category_id, 'user_subcategory_id': u_sub.id,
+                     'amount': amount, 'description': rng.choice(DESCRIPTIONS),
+                     'tran_date': start + timedelta(days=rng.randrange(span + 1))})
+    for batch in range(0, len(rows), 5000):
+        db.session.execute(insert(Transaction), rows[batch:batch + 5000])
+    db.session.commit()
+
+    MonthlyBudget.rebuild_spent(user.id)
+    return user.id
+
+
+def generate(users=10, transactions=1000, years=2, seed=0, today=None):
+    """Populates an empty database and returns the new user ids. Deterministic for a given seed and today."""
+
+    rng = random.Random(seed)
+    today = today or date.today()
+
+    load_preset_categories()
+    return [generate_user(rng, index, transactions, years, today) for index in range(users)]
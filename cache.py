@@ -0,0 +1,304 @@
+"""Cross-request caches for data that rarely changes (the user row, a user's accounts/categories/subcategories,
+    and the preset category template new users are provisioned from).
+
+    Entries live in a bounded, process-local LRU with a TTL, optionally backed by a shared Redis store
+    (CACHE_REDIS_URL) so gunicorn workers can share them. Keys carry a per-user data version that is bumped whenever
+    one of the user's User/Account/UserCategory/UserSubcategory rows is committed, so writes invalidate by moving to a
+    new key rather than deleting old ones (stale keys simply age out).
+
+    Without a shared store each worker has its own version counters; the writer's session also carries a version
+    marker, so a user always sees their own writes whichever worker serves the next request. Other readers of the
+    same user (there are none today) could see stale data for up to CACHE_TTL seconds."""
+
+import pickle
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import has_request_context, session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import User, Account, Category, UserCategory, UserSubcategory
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+DATA_VERSION_KEY = 'data_version'
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL = 300
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count, with a per-entry TTL and hit/miss/eviction counters."""
+
+    def __init__(self, name, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        """Returns the cached value, or MISSING."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'expirations': self.expirations, 'size': len(self._entries), 'max_entries': self.max_entries}
+
+
+class SharedStore:
+    """Thin wrapper over Redis for cache values and version counters. Every call degrades to a no-op/miss
+        if Redis is unreachable, so the shared store can never take the app down."""
+
+    def __init__(self, url, prefix='finwize'):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def get(self, cache_name, key):
+        try:
+            raw = self.client.get(self._key(cache_name, *key))
+        except redis.RedisError:
+            return MISSING
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, cache_name, key, value, ttl):
+        try:
+            self.client.setex(self._key(cache_name, *key), ttl, pickle.dumps(value))
+        except redis.RedisError:
+            pass
+
+    def get_version(self, key):
+        try:
+            return int(self.client.get(self._key('version', key)) or 0)
+        except redis.RedisError:
+            return None
+
+    def incr_version(self, key):
+        try:
+            return self.client.incr(self._key('version', key))
+        except redis.RedisError:
+            return None
+
+
+class DataVersions:
+    """Version counters keyed by user id: shared through the store when there is one,
+        process-local otherwise."""
+
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+        self.store = None
+
+    def get(self, key):
+        if self.store is not None:
+            version = self.store.get_version(key)
+            if version is not None:
+                return version
+        with self._lock:
+            return self._local.get(key, 0)
+
+    def bump(self, key):
+        with self._lock:
+            self._local[key] = self._local.get(key, 0) + 1
+        if self.store is not None:
+            self.store.incr_version(key)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+versions = DataVersions()
+user_cache = LRUCache('user')
+taxonomy_cache = LRUCache('taxonomy')
+template_cache = LRUCache('template')
+fragment_cache = LRUCache('fragment')
+CACHES = (user_cache, taxonomy_cache, template_cache, fragment_cache)
+
+
+def data_version(user_id):
+    """Cache key version for a user's rows: the version counter plus the marker carried in the user's session."""
+
+    marker = session.get(DATA_VERSION_KEY, '') if has_request_context() else ''
+    return f'{versions.get(user_id)}.{marker}'
+
+def bump_data_version(user_id):
+    """Moves the user's cached rows to a new version. Called after every commit that wrote them."""
+
+    versions.bump(user_id)
+    if has_request_context():
+        session[DATA_VERSION_KEY] = secrets.token_hex(4)
+
+
+def cache_get(cache, key):
+    """Looks a key up locally, then in the shared store (filling the local cache on a shared hit)."""
+
+    value = cache.get(key)
+    if value is MISSING and versions.store is not None:
+        value = versions.store.get(cache.name, key)
+        if value is not MISSING:
+            cache.set(key, value)
+    return value
+
+def cache_set(cache, key, value, ttl=None):
+    ttl = cache.ttl if ttl is None else ttl
+    cache.set(key, value, ttl)
+    if versions.store is not None:
+        versions.store.set(cache.name, key, value, ttl)
+
+
+def configure_cache(app):
+    """Sizes the caches from app config (CACHE_MAX_ENTRIES, CACHE_TTL, FRAGMENT_CACHE_MAX_ENTRIES,
+        CACHE_REDIS_URL) and empties them."""
+
+    for cache in CACHES:
+        cache.max_entries = app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        cache.ttl = app.config.get('CACHE_TTL', DEFAULT_TTL)
+        cache.clear()
+    fragment_cache.max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 4 * DEFAULT_MAX_ENTRIES)
+    versions.clear()
+
+    url = app.config.get('CACHE_REDIS_URL')
+    if url and redis is None:
+        app.logger.warning('CACHE_REDIS_URL is set but the redis package is not installed; using process-local caches.')
+    versions.store = SharedStore(url) if url and redis is not None else None
+
+
+def render_cache_metrics():
+    """Cache counters in the Prometheus text exposition format."""
+
+    lines = []
+    for metric, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                         ('expirations', 'counter'), ('size', 'gauge')):
+        name = f'finwize_cache_{metric}' + ('_total' if kind == 'counter' else '')
+        lines.append(f'# TYPE {name} {kind}')
+        for cache in CACHES:
+            lines.append(f'{name}{{cache="{cache.name}"}} {cache.stats()[metric]}')
+
+    lines.append('# TYPE finwize_cache_hit_ratio gauge')
+    for cache in CACHES:
+        stats = cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        lines.append(f'finwize_cache_hit_ratio{{cache="{cache.name}"}} {stats["hits"] / lookups if lookups else 0:.4f}')
+    return '\n'.join(lines) + '\n'
+
+
+# ------------------- Snapshots -------------------
+# Cached values are plain column dicts, never ORM instances: every request rehydrates its own detached copies,
+# so nothing is shared between threads or bound to a finished session, and values pickle cleanly for the shared store.
+
+def snapshot(instances, exclude=()):
+    """Column values of each instance, as a list of dicts."""
+
+    rows = []
+    for instance in instances:
+        keys = [attr.key for attr in inspect(type(instance)).column_attrs if attr.key not in exclude]
+        rows.append({key: getattr(instance, key) for key in keys})
+    return rows
+
+def rehydrate(model, rows):
+    """Detached instances of the model built from snapshot() rows, without touching the database."""
+
+    manager = inspect(model).class_manager
+    instances = []
+    for values in rows:
+        instance = manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+        instances.append(instance)
+    return instances
+
+
+def get_cached_user(user_id):
+    """The User row for user_id (without the password hash), or None. Served from the cache when possible."""
+
+    key = (user_id, data_version(user_id))
+    rows = cache_get(user_cache, key)
+    if rows is MISSING:
+        user = User.query.get(user_id)
+        rows = snapshot([user], exclude=('password',)) if user else []
+        cache_set(user_cache, key, rows)
+    return rehydrate(User, rows)[0] if rows else None
+
+
+def get_category_template():
+    """The preset category/subcategory template used by User.signup(). Keyed on the preset rows' version stamp
+        (Category.template_version), so every process sees a reload by seed.py on its next signup, shared store or not."""
+
+    key = (Category.template_version(),)
+    template = cache_get(template_cache, key)
+    if template is MISSING:
+        template = Category.load_template()
+        cache_set(template_cache, key, template)
+    return template
+
+
+# ------------------- Invalidation -------------------
+# Any flush touching a cached model records its user; the version moves once the transaction commits.
+# Core-level writes (bulk inserts, UPDATE statements) bypass this: they must add an ORM write for the same user to
+# the transaction (as User.signup does) or call bump_data_version() themselves.
+
+CACHED_MODELS = (User, Account, UserCategory, UserSubcategory)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_written_users(db_session, flush_context):
+    for instance in (*db_session.new, *db_session.dirty, *db_session.deleted):
+        if isinstance(instance, CACHED_MODELS):
+            user_id = instance.id if isinstance(instance, User) else instance.user_id
+            if user_id is not None:
+                db_session.info.setdefault('written_users', set()).add(user_id)
+
+@event.listens_for(Session, 'after_commit')
+def _bump_written_users(db_session):
+    for user_id in db_session.info.pop('written_users', ()):
+        bump_data_version(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_written_users(db_session):
+    db_session.info.pop('written_users', None)
@@ -0,0 +1,76 @@
+"""Flask CLI commands for maintenance jobs. Run with: flask --app server <group> <command>"""
+
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from models import MonthlyBudget
+
+rollups_cli = AppGroup('rollups', help='Maintain the MonthlyBudget.spent_amount rollups.')
+
+
+@rollups_cli.command('verify')
+@click.option('--user-id', type=int, default=None, help='Only check this user.')
+def verify_rollups(user_id):
+    """Reports every (user, subcategory, month) whose spent_amount disagrees with its transactions."""
+
+    drift = MonthlyBudget.find_spent_drift(user_id)
+
+    for row in drift:
+        click.echo(f"user {row['user_id']} subcategory {row['user_subcategory_id']} {row['year']}-{row['month']:02d}: "
+                   f"recorded {row['recorded']} actual {row['actual']}")
+
+    click.echo(f'{len(drift)} rollup(s) out of sync.')
+    if drift:
+        raise SystemExit(1)
+
+
+@rollups_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_rollups(user_id):
+    """Recomputes spent_amount from transactions and reports how many rollups it corrected."""
+
+    drift = MonthlyBudget.find_spent_drift(user_id)
+    MonthlyBudget.rebuild_spent(user_id)
+    click.echo(f'Rebuilt rollups; corrected {len(drift)} out of sync.')
+
+
+budgets_cli = AppGroup('budgets', help='Bulk budget jobs.')
+
+
+def parse_month(ctx, param, value):
+    """Click callback: YYYY-MM to the first day of that month."""
+
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise click.BadParameter('use YYYY-MM')
+
+
+@budgets_cli.command('rollover')
+@click.option('--month', 'target_start', required=True, callback=parse_month, help='First month to fill (YYYY-MM).')
+@click.option('--through', 'target_end', default=None, callback=parse_month, help='Last month to fill (YYYY-MM).')
+@click.option('--source', default=None, callback=parse_month, help='Copy from this month (YYYY-MM); default the month before --month.')
+@click.option('--average', 'average_months', type=click.IntRange(min=1), default=None, help='Use the average of the N months before --month.')
+@click.option('--user-id', type=int, default=None, help='Only fill this user.')
+def roll_over_budgets(target_start, target_end, source, average_months, user_id):
+    """Fills unset budgets for a month or range of months from a source month or a trailing average, for every user
+        in one statement. Budgets that already have an amount are left alone, so it is safe to re-run."""
+
+    if source and average_months:
+        raise click.UsageError('Use either --source or --average.')
+    if target_end and target_end < target_start:
+        raise click.UsageError('--through must not be before --month.')
+
+    filled = MonthlyBudget.roll_over(target_start, target_end, source=source, average_months=average_months, user_id=user_id)
+    click.echo(f'Filled {filled} budget(s).')
+
+
+def register_commands(app):
+    """Attaches the CLI command groups to the app."""
+
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(budgets_cli)
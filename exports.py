@@ -0,0 +1,94 @@
+"""Streaming CSV/NDJSON exports of a user's transactions and monthly budgets.
+
+    Rows come off a server-side cursor in batches of EXPORT_BATCH_SIZE and are encoded as they arrive, so an export
+    never holds more than one batch in memory and the first bytes go out as soon as the first batch is read."""
+
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+from models import db, Account, Transaction, UserCategory, UserSubcategory, MonthlyBudget
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def transaction_export_query(user_id):
+    """Columns of every transaction for a user, oldest first, with account/category/subcategory names joined in."""
+
+    return db.select(Transaction.id,
+                     Transaction.tran_date,
+                     Transaction.description,
+                     Transaction.amount,
+                     Account.account_name.label('account'),
+                     UserCategory.name.label('category'),
+                     UserSubcategory.name.label('subcategory')).\
+        outerjoin(Account, Account.id == Transaction.account_id).\
+        join(UserCategory, UserCategory.id == Transaction.user_category_id).\
+        join(UserSubcategory, UserSubcategory.id == Transaction.user_subcategory_id).\
+        where(Transaction.user_id == user_id).\
+        order_by(Transaction.tran_date, Transaction.id)
+
+
+def budget_export_query(user_id):
+    """Every MonthlyBudget row for a user, by month, with category/subcategory names joined in."""
+
+    return db.select(MonthlyBudget.year,
+                     MonthlyBudget.month,
+                     UserCategory.name.label('category'),
+                     UserSubcategory.name.label('subcategory'),
+                     MonthlyBudget.budgeted_amount,
+                     MonthlyBudget.spent_amount).\
+        join(UserCategory, UserCategory.id == MonthlyBudget.user_category_id).\
+        join(UserSubcategory, UserSubcategory.id == MonthlyBudget.user_subcategory_id).\
+        where(MonthlyBudget.user_id == user_id).\
+        order_by(MonthlyBudget.year, MonthlyBudget.month, MonthlyBudget.user_category_id, MonthlyBudget.user_subcategory_id)
+
+
+def stream_rows(query):
+    """Yields lists of rows from a server-side cursor, EXPORT_BATCH_SIZE at a time."""
+
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield partition
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def encode_csv(columns, batches):
+    """CSV text chunks: a header line, then one chunk per batch of rows."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+def encode_ndjson(columns, batches):
+    """Newline-delimited JSON chunks: one object per row, one chunk per batch of rows."""
+
+    for rows in batches:
+        yield ''.join(json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + '\n'
+                      for row in rows)
+
+
+def export_chunks(query, export_format):
+    """Encoded chunks of the query's rows, for a streamed response body."""
+
+    columns = list(query.selected_columns.keys())
+    batches = stream_rows(query)
+    if export_format == 'ndjson':
+        return encode_ndjson(columns, batches)
+    return encode_csv(columns, batches)
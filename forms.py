@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, TextAreaField, DecimalField, DateTimeField, DateField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Email, Length, NumberRange
 
@@ -27,3 +28,12 @@ class TransactionForm(FlaskForm):
     category = SelectField('Category', coerce=int, validators=[DataRequired()])
     subcategory = SelectField('Subcategory', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Submit')
+
+class TransactionImportForm(FlaskForm):
+    """Upload a bank statement (CSV or OFX/QFX) to import its transactions in bulk.
+        Account/subcategory are used for rows that don't name their own."""
+
+    statement = FileField('Statement', validators=[FileRequired(), FileAllowed(['csv', 'ofx', 'qfx'], 'CSV or OFX files only.')])
+    account = SelectField('Default Account', coerce=int)
+    subcategory = SelectField('Default Subcategory', coerce=int)
+    submit = SubmitField('Import')
@@ -0,0 +1,47 @@
+"""Fragment cache for the dashboard's rendered category blocks.
+
+    Each block is cached with its category totals under (user, category, month, year, version), where version is the
+    month's ETag (aggregates.month_etag): any write to the month's budget rows or to the user's categories moves it,
+    so stale blocks are never served. When every block hits, the month summary query is skipped as well.
+    Closed months rarely change, so their blocks keep a long TTL; open months get a short one."""
+
+from datetime import date
+
+from flask import render_template
+from markupsafe import Markup
+
+from aggregates import ZERO, get_month_summary, month_etag
+from cache import MISSING, fragment_cache, cache_get, cache_set
+
+CLOSED_MONTH_TTL = 24 * 60 * 60
+OPEN_MONTH_TTL = 5 * 60
+
+
+def is_closed_month(month, year, today=None):
+    """True once the month is entirely in the past."""
+
+    today = today or date.today()
+    return (year, month) < (today.year, today.month)
+
+
+def render_category_blocks(user_id, month, year, taxonomy):
+    """Rendered blocks for the user's active categories in the month, in order, with the month's totals.
+        Returns (blocks, total_budgeted, total_actual)."""
+
+    version = month_etag(user_id, month, year, taxonomy)
+    keys = {u_cat.id: (user_id, u_cat.id, month, year, version) for u_cat in taxonomy.active_categories}
+    blocks = {cat_id: cache_get(fragment_cache, key) for cat_id, key in keys.items()}
+
+    if any(block is MISSING for block in blocks.values()):
+        ttl = CLOSED_MONTH_TTL if is_closed_month(month, year) else OPEN_MONTH_TTL
+        summary = get_month_summary(user_id, month, year, taxonomy.categories, taxonomy.subcategories)
+        for u_cat in summary['categories']:
+            if blocks[u_cat['id']] is MISSING:
+                html = Markup(render_template('users/_category_block.html', u_cat=u_cat, month=month, year=year))
+                blocks[u_cat['id']] = (html, u_cat['total_budgeted'], u_cat['total_actual'])
+                cache_set(fragment_cache, keys[u_cat['id']], blocks[u_cat['id']], ttl)
+
+    ordered = [blocks[cat_id] for cat_id in keys]
+    total_budgeted = sum((budgeted for _, budgeted, _ in ordered), ZERO)
+    total_actual = sum((actual for _, _, actual in ordered), ZERO)
+    return [html for html, _, _ in ordered], total_budgeted, total_actual
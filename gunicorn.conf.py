@@ -0,0 +1,41 @@
+"""Gunicorn settings: gunicorn -c gunicorn.conf.py server:app
+
+    Set APP_ENV=production so workers skip the debug toolbar and db.create_all(). With PRELOAD_APP=1 the app is
+    imported once in the master and forked, which shortens worker boot; post_fork then makes sure no worker reuses
+    the master's pooled database connections or password hashing pool.
+
+    Workers are threaded (gthread) so a login waiting on the password hashing pool doesn't hold up the process's
+    other requests. BCRYPT_TARGET_MS is calibrated here, once, and handed to every worker as BCRYPT_LOG_ROUNDS;
+    workers calibrating on their own would each pick a cost and keep rehashing each other's passwords."""
+
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = os.environ.get('PRELOAD_APP', '0') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+if os.environ.get('BCRYPT_TARGET_MS') and not os.environ.get('BCRYPT_LOG_ROUNDS'):
+    from passwords import calibrate_rounds
+
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(calibrate_rounds(float(os.environ['BCRYPT_TARGET_MS'])))
+
+
+def post_fork(server, worker):
+    # Without preloading, each worker imports the app itself and has nothing inherited to reset
+    if not server.cfg.preload_app:
+        return
+
+    from models import dispose_engines
+    from passwords import hasher
+
+    dispose_engines(worker.app.wsgi())
+    hasher.after_fork()
+
+
+def worker_exit(server, worker):
+    from passwords import hasher
+
+    hasher.shutdown()
@@ -0,0 +1,392 @@
+"""Streaming bulk import of bank statements (CSV or OFX/QFX) into Transactions.
+
+    Rows are parsed one at a time from the uploaded file, resolved against the user's accounts/categories/
+    subcategories, and written in batches: each batch is COPY'd into a temp staging table and moved into
+    transactions with a single INSERT ... SELECT ... ON CONFLICT DO NOTHING that also updates the
+    MonthlyBudget.spent_amount rollups (COPY bypasses the ORM events that normally keep them current).
+    Fingerprints are finished in that statement too: the staging table holds the whole upload, so Postgres numbers
+    repeated rows across batches and the app only ever holds one batch in memory.
+    A bad row is reported and skipped; it never fails the rest of the upload."""
+
+import csv
+import hashlib
+import io
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import text
+
+from models import db
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+OFX_CHUNK_SIZE = 64 * 1024
+MAX_AMOUNT = Decimal('99999999.99') # Transaction.amount is NUMERIC(10, 2)
+
+# Accepted CSV header names (lowercased) for each field
+CSV_COLUMNS = {
+    'tran_date': ('date', 'transaction date', 'posted date', 'posting date', 'tran_date'),
+    'description': ('description', 'memo', 'payee', 'name', 'details'),
+    'amount': ('amount',),
+    'debit': ('debit', 'withdrawal'),
+    'credit': ('credit', 'deposit'),
+    'account': ('account', 'account name'),
+    'category': ('category',),
+    'subcategory': ('subcategory', 'sub category'),
+    'reference': ('reference', 'id', 'transaction id', 'fitid')
+}
+CSV_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%d.%m.%Y')
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+class ImportRowError(ValueError):
+    """A single statement row that can't be imported."""
+
+
+# ------------------- Parsing -------------------
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ImportRowError(f'Unrecognized date: {value!r}')
+
+def _parse_amount(value):
+    cleaned = value.strip().replace(',', '').replace('$', '')
+    if cleaned.startswith('(') and cleaned.endswith(')'):
+        cleaned = '-' + cleaned[1:-1]
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ImportRowError(f'Unrecognized amount: {value!r}')
+    if not amount.is_finite():
+        raise ImportRowError(f'Unrecognized amount: {value!r}')
+    return amount
+
+
+def iter_csv_rows(text_stream):
+    """Yields (row_number, record) for each CSV data row. Amounts are spend-positive:
+        an amount column is taken as is, debit/credit columns become debit - credit."""
+
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    names = [column.strip().lower() for column in header]
+    positions = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                positions[field] = names.index(alias)
+                break
+
+    if 'tran_date' not in positions or not ('amount' in positions or 'debit' in positions or 'credit' in positions):
+        raise ImportRowError('CSV needs a date column and an amount (or debit/credit) column.')
+
+    for row_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        record = {field: row[position] if position < len(row) else '' for field, position in positions.items()}
+        yield row_number, record
+
+
+def _ofx_chunks(text_stream):
+    """Splits an OFX stream into pieces that never cut a tag in half."""
+
+    pending = ''
+    while True:
+        chunk = text_stream.read(OFX_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        cut = pending.rfind('<')
+        if cut <= 0:
+            continue
+        yield pending[:cut]
+        pending = pending[cut:]
+    if pending:
+        yield pending
+
+def iter_ofx_rows(text_stream):
+    """Yields (transaction_number, record) for each <STMTTRN> in an OFX 1.x (SGML) or 2.x (XML) statement.
+        OFX amounts are negative for debits, so they are flipped to spend-positive."""
+
+    record = None
+    number = 0
+    for chunk in _ofx_chunks(text_stream):
+        for closing, tag, value in OFX_TAG.findall(chunk):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and record is not None:
+                    number += 1
+                    yield number, record
+                    record = None
+                elif not closing:
+                    record = {}
+            elif record is not None and not closing:
+                record[tag] = value.strip()
+
+def _ofx_record(record):
+    posted = record.get('DTPOSTED', '')[:8]
+    try:
+        tran_date = datetime.strptime(posted, '%Y%m%d').date()
+    except ValueError:
+        raise ImportRowError(f'Unrecognized DTPOSTED: {posted!r}')
+
+    description = record.get('NAME') or record.get('MEMO') or ''
+    return {
+        'tran_date': tran_date,
+        'description': description,
+        'amount': -_parse_amount(record.get('TRNAMT', '')),
+        'reference': record.get('FITID', '')
+    }
+
+def _csv_record(record):
+    if record.get('amount', '').strip():
+        amount = _parse_amount(record['amount'])
+    else:
+        debit = _parse_amount(record['debit']) if record.get('debit', '').strip() else Decimal(0)
+        credit = _parse_amount(record['credit']) if record.get('credit', '').strip() else Decimal(0)
+        amount = debit - credit
+
+    return {
+        'tran_date': _parse_date(record['tran_date']),
+        'description': record.get('description', '').strip(),
+        'amount': amount,
+        'account': record.get('account', '').strip(),
+        'category': record.get('category', '').strip(),
+        'subcategory': record.get('subcategory', '').strip(),
+        'reference': record.get('reference', '').strip()
+    }
+
+
+# ------------------- Resolving -------------------
+
+class StatementMapper:
+    """Resolves statement rows to the user's Account/UserCategory/UserSubcategory ids by (case-insensitive) name,
+        falling back to the account/subcategory picked on the upload form."""
+
+    def __init__(self, taxonomy, default_account_id=None, default_subcategory_id=None):
+        self.accounts = {account.account_name.lower(): account.id for account in taxonomy.accounts}
+        self.categories = {u_cat.name.lower(): u_cat.id for u_cat in taxonomy.categories}
+
+        self.subcategory_category = {}
+        self.subcategories = {}
+        self.subcategories_by_category = {}
+        for u_sub in taxonomy.subcategories:
+            self.subcategory_category[u_sub.id] = u_sub.user_category_id
+            self.subcategories.setdefault(u_sub.name.lower(), u_sub.id)
+            self.subcategories_by_category[(u_sub.user_category_id, u_sub.name.lower())] = u_sub.id
+
+        self.default_account_id = default_account_id if default_account_id in taxonomy.accounts_by_id else None
+        self.default_subcategory_id = default_subcategory_id if default_subcategory_id in self.subcategory_category else None
+
+    def resolve(self, record):
+        """Returns (account_id, user_category_id, user_subcategory_id) for a parsed record."""
+
+        account_name = record.get('account', '').lower()
+        if account_name:
+            if account_name not in self.accounts:
+                raise ImportRowError(f"Unknown account: {record['account']!r}")
+            account_id = self.accounts[account_name]
+        else:
+            account_id = self.default_account_id
+
+        category_name = record.get('category', '').lower()
+        subcategory_name = record.get('subcategory', '').lower()
+        if subcategory_name:
+            if category_name:
+                if category_name not in self.categories:
+                    raise ImportRowError(f"Unknown category: {record['category']!r}")
+                subcategory_id = self.subcategories_by_category.get((self.categories[category_name], subcategory_name))
+            else:
+                subcategory_id = self.subcategories.get(subcategory_name)
+            if subcategory_id is None:
+                raise ImportRowError(f"Unknown subcategory: {record['subcategory']!r}")
+        elif self.default_subcategory_id:
+            subcategory_id = self.default_subcategory_id
+        else:
+            raise ImportRowError('No subcategory in the row and no default subcategory chosen.')
+
+        return account_id, self.subcategory_category[subcategory_id], subcategory_id
+
+
+def _description_key(description):
+    """The description as fingerprints compare it: lowercased, with runs of whitespace collapsed."""
+    return ' '.join(description.lower().split())
+
+def fingerprint_key(user_id, account_id, record):
+    """(key, by_reference) a statement row's fingerprint is the sha256 of. Rows without a bank reference get
+        '|<occurrence>' appended in MERGE_STAGING, so genuinely repeated rows in one statement (two identical
+        coffees on the same day) stay distinct while the same statement imported twice matches."""
+
+    if record.get('reference'):
+        return f"{user_id}|{account_id}|ref|{record['reference']}", True
+    return f"{user_id}|{account_id}|{record['tran_date'].isoformat()}|{record['amount']}|{_description_key(record['description'])}", False
+
+def fingerprint(user_id, account_id, record, occurrence):
+    """The fingerprint MERGE_STAGING stores for a row that is the occurrence-th with its key in the statement."""
+
+    key, by_reference = fingerprint_key(user_id, account_id, record)
+    if not by_reference:
+        key = f'{key}|{occurrence}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+# ------------------- Writing -------------------
+
+STAGING_COLUMNS = ('line_no', 'account_id', 'user_category_id', 'user_subcategory_id', 'amount', 'description', 'tran_date',
+                   'fingerprint_key', 'by_reference')
+
+CREATE_STAGING = (text("DROP TABLE IF EXISTS import_staging"),
+                  text("""
+    CREATE TEMP TABLE import_staging (
+        line_no INTEGER NOT NULL,
+        account_id INTEGER,
+        user_category_id INTEGER NOT NULL,
+        user_subcategory_id INTEGER NOT NULL,
+        amount NUMERIC(10, 2) NOT NULL,
+        description VARCHAR(255),
+        tran_date DATE NOT NULL,
+        fingerprint_key TEXT NOT NULL,
+        by_reference BOOLEAN NOT NULL
+    )"""),
+                  text("CREATE INDEX ON import_staging (fingerprint_key, line_no)"))
+
+DROP_STAGING = text("DROP TABLE IF EXISTS import_staging")
+
+# Merges the staged rows after :after_line. Each is numbered among all the upload's rows with its fingerprint key
+# (earlier batches included), which completes the fingerprint exactly as fingerprint() would.
+MERGE_STAGING = text("""
+    WITH numbered AS (
+        SELECT staged.*, row_number() OVER (PARTITION BY fingerprint_key ORDER BY line_no) AS occurrence
+        FROM import_staging AS staged
+        WHERE fingerprint_key IN (SELECT fingerprint_key FROM import_staging WHERE line_no > :after_line)
+    ), inserted AS (
+        INSERT INTO transactions (user_id, account_id, user_category_id, user_subcategory_id, amount, description, tran_date, fingerprint, created_at)
+        SELECT :user_id, account_id, user_category_id, user_subcategory_id, amount, description, tran_date,
+               encode(sha256(convert_to(CASE WHEN by_reference THEN fingerprint_key
+                                             ELSE fingerprint_key || '|' || occurrence END, 'UTF8')), 'hex'),
+               CURRENT_DATE
+        FROM numbered
+        WHERE line_no > :after_line
+        ON CONFLICT (user_id, fingerprint) DO NOTHING
+        RETURNING user_category_id, user_subcategory_id, tran_date, amount
+    ), rollups AS (
+        INSERT INTO monthlybudgets (user_id, user_category_id, user_subcategory_id, month, year, budgeted_amount, spent_amount, created_at)
+        SELECT :user_id, min(user_category_id), user_subcategory_id,
+               CAST(EXTRACT(month FROM tran_date) AS INTEGER), CAST(EXTRACT(year FROM tran_date) AS INTEGER),
+               0, sum(amount), CURRENT_DATE
+        FROM inserted
+        GROUP BY user_subcategory_id, CAST(EXTRACT(month FROM tran_date) AS INTEGER), CAST(EXTRACT(year FROM tran_date) AS INTEGER)
+        ON CONFLICT ON CONSTRAINT uq_monthlybudget_user_subcategory_month
+        DO UPDATE SET spent_amount = monthlybudgets.spent_amount + excluded.spent_amount, updated_at = CURRENT_DATE
+    )
+    SELECT count(*) FROM inserted
+""")
+
+
+@contextmanager
+def staging_connection():
+    """One connection for a whole upload, holding an empty import_staging table that outlives each batch's
+        commit. The table is dropped afterwards, since the connection goes back to the pool."""
+
+    with db.engine.connect() as connection:
+        for statement in CREATE_STAGING:
+            connection.execute(statement)
+        connection.commit()
+        try:
+            yield connection
+        finally:
+            connection.rollback()
+            connection.execute(DROP_STAGING)
+            connection.commit()
+
+def write_batch(connection, user_id, rows):
+    """COPYs a batch of resolved rows (STAGING_COLUMNS, in line order) into staging, merges them into transactions
+        and commits. Returns how many were new (the rest were already imported)."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    inserted = connection.execute(MERGE_STAGING, {'user_id': user_id, 'after_line': rows[0][0] - 1}).scalar()
+    connection.commit()
+    return inserted
+
+
+def import_statement(taxonomy, file_storage, default_account_id=None, default_subcategory_id=None):
+    """Imports an uploaded CSV/OFX statement for the taxonomy's user. Returns a report dict:
+        rows read, rows inserted, duplicates skipped, and the per-row errors (first MAX_REPORTED_ERRORS)."""
+
+    user_id = taxonomy.user_id
+
+    report = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+
+    def add_error(row_number, message):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row_number, 'error': message})
+
+    mapper = StatementMapper(taxonomy, default_account_id, default_subcategory_id)
+    text_stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', errors='replace', newline='')
+
+    filename = (file_storage.filename or '').lower()
+    if filename.endswith(('.ofx', '.qfx')):
+        rows, to_record = iter_ofx_rows(text_stream), _ofx_record
+    else:
+        rows, to_record = iter_csv_rows(text_stream), _csv_record
+
+    batch = []
+
+    def flush():
+        inserted = write_batch(connection, user_id, batch)
+        report['inserted'] += inserted
+        report['duplicates'] += len(batch) - inserted
+        batch.clear()
+
+    with staging_connection() as connection:
+        try:
+            for row_number, raw in rows:
+                report['rows'] += 1
+                try:
+                    record = to_record(raw)
+                    if record['amount'] == 0:
+                        raise ImportRowError('Amount is zero.')
+                    if abs(record['amount']) > MAX_AMOUNT:
+                        raise ImportRowError(f"Amount out of range: {record['amount']}")
+                    account_id, user_category_id, user_subcategory_id = mapper.resolve(record)
+                except ImportRowError as e:
+                    add_error(row_number, str(e))
+                    continue
+
+                key, by_reference = fingerprint_key(user_id, account_id, record)
+                batch.append((report['rows'],
+                              account_id if account_id is not None else '',
+                              user_category_id,
+                              user_subcategory_id,
+                              record['amount'],
+                              record['description'][:255],
+                              record['tran_date'].isoformat(),
+                              key,
+                              by_reference))
+
+                if len(batch) >= BATCH_SIZE:
+                    flush()
+        except (ImportRowError, csv.Error) as e:
+            add_error(0, f'Stopped reading the file: {e}')
+
+        if batch:
+            flush()
+
+    return report
@@ -0,0 +1,143 @@
+"""Per-request SQL instrumentation: query counts, DB time and rows, reported as Server-Timing headers and
+    Prometheus metrics, plus count_queries()/assert_max_queries() for tests and benchmarks.
+
+    The cursor hooks listen on every Engine, so they also see queries from CLI/test code outside a request.
+    Streamed responses (exports) are measured up to the point the stream starts."""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class QueryStats:
+    """Queries, DB seconds and rows seen while active."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+    def record(self, seconds, rows):
+        self.queries += 1
+        self.seconds += seconds
+        self.rows += max(rows, 0)
+
+
+# Counters opened with count_queries(); checked on every query regardless of request context
+_active_counters = []
+
+# The start time lives on the execution context, which is discarded with the statement, so a statement that
+# fails (and never reaches after_cursor_execute) leaves nothing behind on the pooled connection
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    rows = cursor.rowcount if cursor.rowcount is not None else 0
+
+    if has_app_context() and 'db_stats' in g:
+        g.db_stats.record(elapsed, rows)
+    for counter in _active_counters:
+        counter.record(elapsed, rows)
+
+
+@contextmanager
+def count_queries():
+    """Counts every query run inside the block (on any thread)."""
+
+    stats = QueryStats()
+    _active_counters.append(stats)
+    try:
+        yield stats
+    finally:
+        _active_counters.remove(stats)
+
+@contextmanager
+def assert_max_queries(testcase, max_queries):
+    """Fails the test if the block runs more than max_queries SQL statements, listing the count. Use it around
+        test client requests to catch N+1 regressions:
+
+            with assert_max_queries(self, 3):
+                self.client.get('/')"""
+
+    with count_queries() as stats:
+        yield stats
+    testcase.assertLessEqual(stats.queries, max_queries,
+                             f'{stats.queries} queries run, expected at most {max_queries}')
+
+
+class RequestMetrics:
+    """Process-wide per-endpoint totals for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, endpoint, seconds, stats):
+        with self._lock:
+            totals = self.endpoints.setdefault(endpoint, {
+                'requests': 0, 'seconds': 0.0, 'queries': 0, 'db_seconds': 0.0, 'rows': 0,
+                'query_buckets': [0] * len(QUERY_BUCKETS)})
+            totals['requests'] += 1
+            totals['seconds'] += seconds
+            totals['queries'] += stats.queries
+            totals['db_seconds'] += stats.seconds
+            totals['rows'] += stats.rows
+            for i, bound in enumerate(QUERY_BUCKETS):
+                if stats.queries <= bound:
+                    totals['query_buckets'][i] += 1
+
+    def render(self):
+        """Prometheus text format: counters per endpoint and a histogram of queries per request."""
+
+        with self._lock:
+            endpoints = {endpoint: dict(totals, query_buckets=list(totals['query_buckets']))
+                         for endpoint, totals in sorted(self.endpoints.items())}
+
+        lines = []
+        for name, key in (('finwize_http_requests_total', 'requests'), ('finwize_http_request_seconds_total', 'seconds'),
+                          ('finwize_db_queries_total', 'queries'), ('finwize_db_seconds_total', 'db_seconds'),
+                          ('finwize_db_rows_total', 'rows')):
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{{endpoint="{endpoint}"}} {totals[key]}' for endpoint, totals in endpoints.items())
+
+        lines.append('# TYPE finwize_db_queries_per_request histogram')
+        for endpoint, totals in endpoints.items():
+            for bound, bucket in zip(QUERY_BUCKETS, totals['query_buckets']):
+                lines.append(f'finwize_db_queries_per_request_bucket{{endpoint="{endpoint}",le="{bound}"}} {bucket}')
+            lines.append(f'finwize_db_queries_per_request_bucket{{endpoint="{endpoint}",le="+Inf"}} {totals["requests"]}')
+            lines.append(f'finwize_db_queries_per_request_sum{{endpoint="{endpoint}"}} {totals["queries"]}')
+            lines.append(f'finwize_db_queries_per_request_count{{endpoint="{endpoint}"}} {totals["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+def init_instrumentation(app):
+    """Starts per-request stats before each request; adds the Server-Timing header and records metrics after it."""
+
+    @app.before_request
+    def start_request_stats():
+        g.request_started = time.perf_counter()
+        g.db_stats = QueryStats()
+
+    @app.after_request
+    def report_request_stats(response):
+        if 'db_stats' not in g:
+            return response
+
+        seconds = time.perf_counter() - g.request_started
+        stats = g.db_stats
+        response.headers.add('Server-Timing', f'db;dur={stats.seconds * 1000:.2f};desc="{stats.queries} queries, {stats.rows} rows"')
+        response.headers.add('Server-Timing', f'app;dur={seconds * 1000:.2f}')
+        request_metrics.observe(request.endpoint or 'unmatched', seconds, stats)
+        return response
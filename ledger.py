@@ -0,0 +1,224 @@
+"""Keyset-paginated, filterable transaction ledger for the transactions page and its JSON API.
+
+    Listings read through a slim read model: one SELECT of just the columns a ledger line shows, with the account,
+    category and subcategory names joined in, returned as LedgerRow records. Nothing is added to the session's
+    identity map or tracked for changes, and the templates never touch a lazy relationship."""
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from models import db, SEARCH_CONFIG, Account, Transaction, UserCategory, UserSubcategory
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class LedgerRow:
+    """One ledger line. A plain read-only record (score is only set by search)."""
+
+    __slots__ = ('id', 'tran_date', 'description', 'amount', 'account_id', 'account_name',
+                 'category_id', 'category_name', 'subcategory_id', 'subcategory_name', 'score')
+
+    def __init__(self, id, tran_date, description, amount, account_id, account_name,
+                 category_id, category_name, subcategory_id, subcategory_name, score=None):
+        self.id = id
+        self.tran_date = tran_date
+        self.description = description
+        self.amount = amount
+        self.account_id = account_id
+        self.account_name = account_name
+        self.category_id = category_id
+        self.category_name = category_name
+        self.subcategory_id = subcategory_id
+        self.subcategory_name = subcategory_name
+        self.score = score
+
+    def __repr__(self):
+        return f'<LedgerRow {self.id} {self.tran_date} {self.amount}>'
+
+
+def ledger_select(*extra_columns):
+    """SELECT of the LedgerRow columns (in order, then extra_columns) with the names joined in."""
+
+    return db.select(Transaction.id,
+                     Transaction.tran_date,
+                     Transaction.description,
+                     Transaction.amount,
+                     Transaction.account_id,
+                     Account.account_name,
+                     Transaction.user_category_id,
+                     UserCategory.name,
+                     Transaction.user_subcategory_id,
+                     UserSubcategory.name,
+                     *extra_columns).\
+        outerjoin(Account, Account.id == Transaction.account_id).\
+        join(UserCategory, UserCategory.id == Transaction.user_category_id).\
+        join(UserSubcategory, UserSubcategory.id == Transaction.user_subcategory_id)
+
+def load_ledger_rows(query):
+    """Runs a ledger_select() and wraps each row as a LedgerRow."""
+    return [LedgerRow(*row) for row in db.session.execute(query)]
+
+
+def _parse_date(value):
+    return date.fromisoformat(value)
+
+def _parse_amount(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Not an amount: {value}')
+
+
+# Query args the ledger filters on (see parse_ledger_filters); the only ones carried into its links
+LEDGER_FILTER_ARGS = ('start', 'end', 'account_id', 'category_id', 'subcategory_id', 'min_amount', 'max_amount')
+
+
+def parse_ledger_filters(args):
+    """Reads the ledger filters from request args. Missing or malformed values are ignored."""
+
+    return {
+        'start': args.get('start', type=_parse_date),
+        'end': args.get('end', type=_parse_date),
+        'account_id': args.get('account_id', type=int),
+        'category_id': args.get('category_id', type=int),
+        'subcategory_id': args.get('subcategory_id', type=int),
+        'min_amount': args.get('min_amount', type=_parse_amount),
+        'max_amount': args.get('max_amount', type=_parse_amount)
+    }
+
+
+def encode_cursor(transaction):
+    """Opaque position of a transaction in the (tran_date, id) ordering."""
+    return f'{transaction.tran_date.isoformat()}.{transaction.id}'
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for anything it didn't produce."""
+    tran_date, _, tran_id = cursor.partition('.')
+    return date.fromisoformat(tran_date), int(tran_id)
+
+
+def filter_ledger(query, user_id, filters):
+    """Restricts a Transaction query or select to the user's rows matching the ledger filters."""
+
+    query = query.filter(Transaction.user_id == user_id)
+    if filters['start']:
+        query = query.filter(Transaction.tran_date >= filters['start'])
+    if filters['end']:
+        query = query.filter(Transaction.tran_date <= filters['end'])
+    if filters['account_id']:
+        query = query.filter(Transaction.account_id == filters['account_id'])
+    if filters['category_id']:
+        query = query.filter(Transaction.user_category_id == filters['category_id'])
+    if filters['subcategory_id']:
+        query = query.filter(Transaction.user_subcategory_id == filters['subcategory_id'])
+    if filters['min_amount'] is not None:
+        query = query.filter(Transaction.amount >= filters['min_amount'])
+    if filters['max_amount'] is not None:
+        query = query.filter(Transaction.amount <= filters['max_amount'])
+    return query
+
+
+def get_transactions_page(user_id, filters, cursor=None, limit=PAGE_SIZE):
+    """Returns (rows, next_cursor) for one page of a user's ledger as LedgerRows, newest first.
+
+        Pages seek past the last (tran_date, id) seen instead of using OFFSET, so every page costs the same
+        whatever its depth. next_cursor is None on the last page."""
+
+    query = filter_ledger(ledger_select(), user_id, filters)
+
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(Transaction.tran_date, Transaction.id) < db.tuple_(after_date, after_id))
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    transactions = load_ledger_rows(query.order_by(Transaction.tran_date.desc(), Transaction.id.desc()).limit(limit + 1))
+
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        return transactions, encode_cursor(transactions[-1])
+    return transactions, None
+
+
+# ------------------- Search -------------------
+
+MIN_SEARCH_LENGTH = 2
+MAX_SEARCH_LENGTH = 100
+
+
+def search_conditions(text):
+    """(match, score) SQL expressions for a description search.
+
+        A row matches on full text (stemmed words, websearch syntax: "quoted phrases", -excluded), on a fuzzy
+        word match (pg_trgm's <%, which tolerates typos and partial words) or on a plain substring. Each branch is
+        served by one of the user-leading GIN indexes. The score adds the full-text rank to the trigram word
+        similarity, rounded to a NUMERIC so it round-trips exactly through a cursor."""
+
+    # Cast to text, so Postgres resolves pg_trgm's text <% text operator (and its index) for the term
+    term = db.cast(text, db.Text)
+    tsquery = db.func.websearch_to_tsquery(SEARCH_CONFIG, term)
+    pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    match = db.or_(Transaction.search_vector.op('@@')(tsquery),
+                   term.op('<%')(Transaction.description),
+                   Transaction.description.ilike(pattern, escape='\\'))
+    score = db.func.round(db.cast(db.func.ts_rank_cd(Transaction.search_vector, tsquery)
+                                  + db.func.word_similarity(term, Transaction.description), db.Numeric), 6)
+    return match, score
+
+
+def encode_search_cursor(row):
+    """Opaque position of a result in the (score, id) ordering."""
+    return f'{row.score}:{row.id}'
+
+def decode_search_cursor(cursor):
+    """Inverse of encode_search_cursor. Raises ValueError for anything it didn't produce."""
+    score, _, tran_id = cursor.partition(':')
+    try:
+        return Decimal(score), int(tran_id)
+    except InvalidOperation:
+        raise ValueError(f'Not a search cursor: {cursor}')
+
+
+def search_transactions(user_id, text, filters, cursor=None, limit=PAGE_SIZE):
+    """Returns (rows, next_cursor) for one page of the user's transactions whose description matches text, as
+        LedgerRows with their score, best match first, then newest id. Takes the ledger filters too.
+
+        Pages seek past the last (score, id) seen like the ledger does. Every match still has to be scored to be
+        ordered, but the GIN indexes keep that to the user's matching rows rather than all their transactions."""
+
+    text = text.strip()
+    if not MIN_SEARCH_LENGTH <= len(text) <= MAX_SEARCH_LENGTH:
+        raise ValueError(f'Search between {MIN_SEARCH_LENGTH} and {MAX_SEARCH_LENGTH} characters')
+
+    match, score = search_conditions(text)
+    query = filter_ledger(ledger_select(score.label('score')).filter(match), user_id, filters)
+
+    if cursor:
+        after_score, after_id = decode_search_cursor(cursor)
+        query = query.filter(db.tuple_(score, Transaction.id) < db.tuple_(after_score, after_id))
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    results = load_ledger_rows(query.order_by(score.desc(), Transaction.id.desc()).limit(limit + 1))
+
+    if len(results) > limit:
+        results = results[:limit]
+        return results, encode_search_cursor(results[-1])
+    return results, None
+
+
+def transaction_to_json(row):
+    """Serializes a LedgerRow for the JSON API."""
+
+    return {
+        'id': row.id,
+        'tran_date': row.tran_date.isoformat(),
+        'description': row.description,
+        'account_id': row.account_id,
+        'account_name': row.account_name,
+        'category_id': row.category_id,
+        'category_name': row.category_name,
+        'subcategory_id': row.subcategory_id,
+        'subcategory_name': row.subcategory_name,
+        'amount': row.amount
+    }
@@ -0,0 +1,34 @@
+"""Apply the SQL files in migrations/ to an existing database.
+    New databases get the full schema from db.create_all() (seed.py); this brings older ones up to date.
+    Each file runs once, in filename order, inside its own transaction; files are written to be safe on
+    databases that already have the change from create_all(). It never runs create_all() itself, so a missing
+    or broken migration shows up here rather than being papered over by the current schema."""
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from app import create_app
+from models import db, connect_db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+load_dotenv()
+app = create_app('finwize_db')
+connect_db(app, create_tables=False)
+
+with app.app_context():
+    with db.engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS schema_migrations (filename VARCHAR(255) PRIMARY KEY, applied_at TIMESTAMP NOT NULL DEFAULT now())'))
+        applied = {row.filename for row in conn.execute(text('SELECT filename FROM schema_migrations'))}
+
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql') or filename in applied:
+            continue
+
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as migration_file:
+            sql = migration_file.read()
+
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+            conn.execute(text('INSERT INTO schema_migrations (filename) VALUES (:filename)'), {'filename': filename})
+        print(f'Applied {filename}')
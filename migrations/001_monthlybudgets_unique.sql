@@ -0,0 +1,17 @@
+-- One MonthlyBudget row per (user, subcategory, month, year).
+-- Older databases can hold duplicates created by the per-subcategory check in homepage(); keep the oldest row.
+DELETE FROM monthlybudgets mb
+USING monthlybudgets dup
+WHERE mb.user_id = dup.user_id
+  AND mb.user_subcategory_id = dup.user_subcategory_id
+  AND mb.month = dup.month
+  AND mb.year = dup.year
+  AND mb.id > dup.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_monthlybudget_user_subcategory_month') THEN
+        ALTER TABLE monthlybudgets
+            ADD CONSTRAINT uq_monthlybudget_user_subcategory_month UNIQUE (user_id, user_subcategory_id, month, year);
+    END IF;
+END $$;
@@ -0,0 +1,5 @@
+-- Composite indexes for the month-range lookups in models.py/aggregates.py.
+-- On large production tables, run these by hand with CREATE INDEX CONCURRENTLY first; the IF NOT EXISTS makes this a no-op afterwards.
+CREATE INDEX IF NOT EXISTS ix_transactions_user_tran_date ON transactions (user_id, tran_date);
+CREATE INDEX IF NOT EXISTS ix_transactions_user_subcategory_tran_date ON transactions (user_subcategory_id, tran_date);
+CREATE INDEX IF NOT EXISTS ix_monthlybudgets_user_year_month ON monthlybudgets (user_id, year, month);
@@ -0,0 +1,15 @@
+-- MonthlyBudget.spent_amount used to be written as 0 and never updated; it is now a maintained rollup.
+-- Backfill it from transactions. `flask --app server rollups verify` should report 0 afterwards.
+INSERT INTO monthlybudgets (user_id, user_category_id, user_subcategory_id, month, year, budgeted_amount, spent_amount, created_at)
+SELECT user_id,
+       min(user_category_id),
+       user_subcategory_id,
+       CAST(EXTRACT(month FROM tran_date) AS INTEGER),
+       CAST(EXTRACT(year FROM tran_date) AS INTEGER),
+       0,
+       sum(amount),
+       CURRENT_DATE
+FROM transactions
+GROUP BY user_id, user_subcategory_id, CAST(EXTRACT(month FROM tran_date) AS INTEGER), CAST(EXTRACT(year FROM tran_date) AS INTEGER)
+ON CONFLICT ON CONSTRAINT uq_monthlybudget_user_subcategory_month
+DO UPDATE SET spent_amount = excluded.spent_amount;
@@ -0,0 +1,5 @@
+-- Ledger pages are ordered by (tran_date, id) per user; extend the user/date index with id so the
+-- keyset seek and ORDER BY come straight off the index. Account filters get their own index.
+CREATE INDEX IF NOT EXISTS ix_transactions_user_tran_date_id ON transactions (user_id, tran_date, id);
+DROP INDEX IF EXISTS ix_transactions_user_tran_date;
+CREATE INDEX IF NOT EXISTS ix_transactions_account_tran_date ON transactions (account_id, tran_date);
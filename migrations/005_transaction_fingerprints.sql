@@ -0,0 +1,3 @@
+-- Imported transactions carry a fingerprint so re-importing an overlapping statement skips rows already loaded.
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_user_fingerprint ON transactions (user_id, fingerprint);
@@ -0,0 +1,17 @@
+-- Append-only balance history for accounts, seeded with each existing account's current balance as of its
+-- last update so net-worth queries have a starting point.
+CREATE TABLE IF NOT EXISTS accountbalancesnapshots (
+    id SERIAL PRIMARY KEY,
+    account_id INTEGER NOT NULL REFERENCES accounts (id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    balance NUMERIC(10, 2) NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_balancesnapshots_account_recorded ON accountbalancesnapshots (account_id, recorded_at);
+CREATE INDEX IF NOT EXISTS ix_balancesnapshots_user_recorded ON accountbalancesnapshots (user_id, recorded_at);
+
+INSERT INTO accountbalancesnapshots (account_id, user_id, balance, recorded_at)
+SELECT accounts.id, accounts.user_id, accounts.balance, COALESCE(accounts.updated_at, accounts.created_at)
+FROM accounts
+WHERE NOT EXISTS (SELECT 1 FROM accountbalancesnapshots WHERE accountbalancesnapshots.account_id = accounts.id);
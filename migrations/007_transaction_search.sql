@@ -0,0 +1,8 @@
+-- Transaction search: a generated full-text document for each description, indexed with GIN, plus a trigram index
+-- for fuzzy and substring matches. btree_gin lets both GIN indexes lead with user_id.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED;
+CREATE INDEX IF NOT EXISTS ix_transactions_user_search ON transactions USING gin (user_id, search_vector);
+CREATE INDEX IF NOT EXISTS ix_transactions_user_description_trgm ON transactions USING gin (user_id, description gin_trgm_ops);
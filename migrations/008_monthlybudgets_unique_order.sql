@@ -0,0 +1,6 @@
+-- Lead the unique constraint with (user_id, year, month) so its index serves the per-user month lookups,
+-- and drop ix_monthlybudgets_user_year_month, which only duplicated it. ON CONFLICT targets the constraint by name.
+DROP INDEX IF EXISTS ix_monthlybudgets_user_year_month;
+ALTER TABLE monthlybudgets DROP CONSTRAINT IF EXISTS uq_monthlybudget_user_subcategory_month;
+ALTER TABLE monthlybudgets
+    ADD CONSTRAINT uq_monthlybudget_user_subcategory_month UNIQUE (user_id, year, month, user_subcategory_id);
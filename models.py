@@ -1,18 +1,32 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 
+from dateutil.relativedelta import relativedelta
 from flask import g
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.dialects.postgresql import TSVECTOR, aggregate_order_by, insert as pg_insert
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+from passwords import hasher
+from replicas import RoutingSession
 
-def connect_db(app):
-    """Connect the app to our database."""
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def connect_db(app, create_tables=True):
+    """Connect the app to our database. Production boots skip create_tables; the schema comes from migrate.py."""
     with app.app_context():
         db.app = app
         db.init_app(app)
-        db.create_all()
+        if create_tables:
+            db.create_all()
+
+def dispose_engines(app):
+    """Drops the pooled connections a forked worker inherited, without closing them (they still belong to the
+        parent). Each worker then opens its own on first use."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+SEARCH_CONFIG = 'english'  # text search configuration for Transaction.search_vector
 
 # ------------------- Helper Functions -------------------
 
@@ -22,6 +36,12 @@ def current_month():
 def current_year():
     return datetime.now().year
 
+def month_bounds(month, year):
+    """Half-open [first day of month, first day of next month) range, so tran_date filters can use an index."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
 # ------------------- Models/Tables -------------------
 
 class User(db.Model):
@@ -36,33 +56,32 @@ class User(db.Model):
     updated_at = db.Column(db.Date, onupdate=datetime.now(timezone.utc))
 
     @classmethod
-    def signup(cls, email, password):
+    def signup(cls, email, password, template=None):
         """Class method to call in app.py to signup a user to access the budgeting app.
-            Hashes the password and stores to database."""
+            Hashes the password (off-thread; may raise PasswordServiceBusy), then provisions the user's categories/subcategories from the preset template
+            (Category.load_template(), or the cached copy passed in) in a single transaction."""
         
-        hashed_pwd = bcrypt.generate_password_hash(password).decode('UTF-8')
+        hashed_pwd = hasher.hash(password)
+        categories, subcategories = template or Category.load_template()
 
         user = User(email=email,password=hashed_pwd)
 
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
 
-        # Create a mapping of categories to user categories
+        # One multi-row INSERT; RETURNING maps each preset category to the new user category's id
         category_to_user_category = {}
-        categories = Category.query.all()
-        for cat in categories:
-            user_category = UserCategory(user_id=user.id, category_id=cat.id, name=cat.name, active=True)
-            db.session.add(user_category)
-            db.session.commit() # commit each user_category to get its id
-
-            category_to_user_category[cat.id] = user_category.id
-
-        # Create user subcategories    
-        subcategories = Subcategory.query.all()
-        for subcat in subcategories:
-            user_category_id = category_to_user_category[subcat.category_id]
-            user_subcategory = UserSubcategory(user_id=user.id, subcategory_id=subcat.id, user_category_id=user_category_id, name=subcat.name, active=True)
-            db.session.add(user_subcategory)
+        if categories:
+            returned = db.session.execute(
+                insert(UserCategory).returning(UserCategory.category_id, UserCategory.id),
+                [{'user_id': user.id, 'category_id': cat_id, 'name': name, 'active': True} for cat_id, name in categories])
+            category_to_user_category = dict(returned.all())
+
+        if subcategories:
+            db.session.execute(
+                insert(UserSubcategory),
+                [{'user_id': user.id, 'subcategory_id': subcat_id, 'user_category_id': category_to_user_category[cat_id],
+                  'name': name, 'active': True} for subcat_id, cat_id, name in subcategories])
 
         db.session.commit()
         return user
@@ -71,11 +90,15 @@ class User(db.Model):
     def authenticate(cls, email, password):
         """Find user with email and password.
             Searches for the user whose password hash matches the password. Returns that user object.
-            If it does not find matching user or password is false, returns False. """
+            If it does not find matching user or password is false, returns False.
+            Hashes made at an outdated cost are replaced on a successful login. May raise PasswordServiceBusy. """
         
         user = cls.query.filter_by(email=email).first()
 
-        if user and bcrypt.check_password_hash(user.password, password):
+        if user and hasher.check(user.password, password):
+            if hasher.needs_rehash(user.password):
+                user.password = hasher.hash(password)
+                db.session.commit()
             return user
         else:
             return False
@@ -94,6 +117,70 @@ class Account(db.Model):
 
     __table_args__ = (db.UniqueConstraint('user_id', 'account_name', name='uq_user_account_name'),)
 
+class AccountBalanceSnapshot(db.Model):
+    """Append-only history of account balances: one row each time an account is created or its balance changes
+        (written by the Balance History events below). Net worth at any date is the sum of each account's latest
+        snapshot up to that date."""
+
+    __tablename__ = 'accountbalancesnapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id', ondelete='cascade'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='cascade'), nullable=False)
+    balance = db.Column(db.Numeric(10, 2), nullable=False)
+    recorded_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+
+    __table_args__ = (
+        # As-of lookups: latest snapshot per account up to a date (backward scan, LIMIT 1)
+        db.Index('ix_balancesnapshots_account_recorded', 'account_id', 'recorded_at'),
+        # The user's most recent balance change
+        db.Index('ix_balancesnapshots_user_recorded', 'user_id', 'recorded_at'),
+    )
+
+    @classmethod
+    def latest_update(cls, user_id):
+        """When the user's balances last changed (None without accounts). One index-only lookup."""
+        return db.session.query(db.func.max(cls.recorded_at)).filter(cls.user_id == user_id).scalar()
+
+    @classmethod
+    def balances_as_of(cls, user_id, as_of):
+        """(account_id, account_name, balance) for each of the user's accounts at the end of the as_of date.
+            Accounts without a snapshot by then have a balance of None."""
+
+        latest = db.select(cls.balance).\
+            where(cls.account_id == Account.id,
+                  cls.recorded_at < as_of + timedelta(days=1)).\
+            order_by(cls.recorded_at.desc()).\
+            limit(1).\
+            correlate(Account).\
+            scalar_subquery()
+
+        return db.session.query(Account.id, Account.account_name, latest).\
+            filter(Account.user_id == user_id).\
+            order_by(Account.id).all()
+
+    @classmethod
+    def net_worth_series(cls, user_id, start, end, interval='1 month'):
+        """[(date, net worth)] at the end of every interval step from start to end, in one query: each date is joined
+            laterally to each account's latest snapshot on or before it."""
+
+        return db.session.execute(NET_WORTH_SERIES, {'user_id': user_id, 'start': start, 'end': end, 'interval': interval}).all()
+
+NET_WORTH_SERIES = db.text("""
+    SELECT CAST(day AS DATE) AS day, COALESCE(SUM(latest.balance), 0) AS net_worth
+    FROM generate_series(CAST(:start AS DATE), CAST(:end AS DATE), CAST(:interval AS INTERVAL)) AS day
+    CROSS JOIN accounts
+    LEFT JOIN LATERAL (
+        SELECT balance FROM accountbalancesnapshots
+        WHERE account_id = accounts.id AND recorded_at < day + INTERVAL '1 day'
+        ORDER BY recorded_at DESC
+        LIMIT 1
+    ) AS latest ON true
+    WHERE accounts.user_id = :user_id
+    GROUP BY day
+    ORDER BY day
+""").columns(day=db.Date, net_worth=db.Numeric)  # a declared SELECT, so it can run on the replica
+
 class Category(db.Model):
     """Preset Categories from the generator/categories.csv file. Mainly for new accounts to have access to Categories out of the box."""
 
@@ -105,6 +192,27 @@ class Category(db.Model):
     created_at = db.Column(db.Date, nullable=False, default=datetime.now(timezone.utc))
     updated_at = db.Column(db.Date, onupdate=datetime.now(timezone.utc))
 
+    @classmethod
+    def template_version(cls):
+        """md5 over (id, xmin) of every preset category and subcategory row. Postgres gives each row version a new
+            xmin, so reloading the presets (seed.py) or editing one changes it, in every process."""
+
+        def rows_digest(model):
+            row_version = db.cast(model.id, db.Text) + ':' + db.cast(db.literal_column(f'{model.__tablename__}.xmin'), db.Text)
+            return db.select(db.func.coalesce(db.func.md5(db.func.string_agg(row_version, aggregate_order_by(db.literal_column("','"), model.id))), '')).\
+                scalar_subquery()
+
+        return ':'.join(db.session.query(rows_digest(cls), rows_digest(Subcategory)).one())
+
+    @classmethod
+    def load_template(cls):
+        """The preset taxonomy new users are provisioned from, as plain tuples:
+            ([(category_id, name)], [(subcategory_id, category_id, name)]), both ordered by id."""
+
+        categories = db.session.query(cls.id, cls.name).order_by(cls.id).all()
+        subcategories = db.session.query(Subcategory.id, Subcategory.category_id, Subcategory.name).order_by(Subcategory.id).all()
+        return [tuple(row) for row in categories], [tuple(row) for row in subcategories]
+
 class Subcategory(db.Model):
     """Preset Subcategories from the generator/subcategories.csv file. Mainly for new accounts to have access to Subcategories out of the box."""
 
@@ -141,11 +249,12 @@ class UserCategory(db.Model):
                    MonthlyBudget.year == year).scalar() or 0
 
     def get_total_actual(self, month, year):
+        start, end = month_bounds(month, year)
         return db.session.query(db.func.sum(Transaction.amount)).\
         join(UserSubcategory, UserSubcategory.id == Transaction.user_subcategory_id).\
         filter(UserSubcategory.user_category_id == self.id,
-            db.extract('month', Transaction.tran_date) == month,
-            db.extract('year', Transaction.tran_date) == year,
+            Transaction.tran_date >= start,
+            Transaction.tran_date < end,
             Transaction.user_id == self.user_id).scalar() or 0
 
 class UserSubcategory(db.Model):
@@ -170,11 +279,11 @@ class UserSubcategory(db.Model):
                    MonthlyBudget.year == year).scalar() or 0
 
     def get_total_actual(self, month, year):
+        start, end = month_bounds(month, year)
         return db.session.query(db.func.sum(Transaction.amount)).\
-        join(UserSubcategory, UserSubcategory.id == Transaction.user_subcategory_id).\
         filter(Transaction.user_subcategory_id == self.id,
-            db.extract('month', Transaction.tran_date) == month,
-            db.extract('year', Transaction.tran_date) == year,
+            Transaction.tran_date >= start,
+            Transaction.tran_date < end,
             Transaction.user_id == self.user_id).scalar() or 0
     
 class Transaction(db.Model):
@@ -183,14 +292,19 @@ class Transaction(db.Model):
 
     __tablename__ = 'transactions'
 
+    # The spend rollup keys load their old value before a change (active_history), even when the row was expired,
+    # so move_transaction_in_rollup can take the amount out of the bucket it was in
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='cascade'), nullable=False)
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('users.id', ondelete='cascade'), nullable=False), active_history=True)
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id', ondelete='cascade'), nullable=True)
-    user_category_id = db.Column(db.Integer, db.ForeignKey('usercategories.id', ondelete='cascade'), nullable=False)
-    user_subcategory_id = db.Column(db.Integer, db.ForeignKey('usersubcategories.id', ondelete='cascade'), nullable=False)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    user_category_id = db.column_property(db.Column(db.Integer, db.ForeignKey('usercategories.id', ondelete='cascade'), nullable=False), active_history=True)
+    user_subcategory_id = db.column_property(db.Column(db.Integer, db.ForeignKey('usersubcategories.id', ondelete='cascade'), nullable=False), active_history=True)
+    amount = db.column_property(db.Column(db.Numeric(10, 2), nullable=False), active_history=True)
     description = db.Column(db.String(255))
-    tran_date = db.Column(db.Date, nullable=False)
+    tran_date = db.column_property(db.Column(db.Date, nullable=False), active_history=True)
+    fingerprint = db.Column(db.String(64), nullable=True) # set on imported rows, to skip them when a statement is imported again
+    # Full-text search document for the description, maintained by Postgres; deferred so ledger loads don't carry it
+    search_vector = db.deferred(db.Column(TSVECTOR, db.Computed(f"to_tsvector('{SEARCH_CONFIG}', coalesce(description, ''))", persisted=True)))
     created_at = db.Column(db.Date, nullable=False, default=datetime.now(timezone.utc))
     updated_at = db.Column(db.Date, onupdate=datetime.now(timezone.utc))
 
@@ -198,6 +312,20 @@ class Transaction(db.Model):
     user_category = db.relationship('UserCategory', backref='transactions')
     user_subcategory = db.relationship('UserSubcategory', backref='transactions')
 
+    __table_args__ = (db.Index('ix_transactions_user_tran_date_id', 'user_id', 'tran_date', 'id'),
+                      db.Index('ix_transactions_user_subcategory_tran_date', 'user_subcategory_id', 'tran_date'),
+                      db.Index('ix_transactions_account_tran_date', 'account_id', 'tran_date'),
+                      db.Index('uq_transactions_user_fingerprint', 'user_id', 'fingerprint', unique=True),
+                      # Search (ledger.search_transactions): user_id leads both GIN indexes (btree_gin) so a search
+                      # only touches the user's own postings; the trigram index serves fuzzy and substring matches
+                      db.Index('ix_transactions_user_search', 'user_id', 'search_vector', postgresql_using='gin'),
+                      db.Index('ix_transactions_user_description_trgm', 'user_id', 'description', postgresql_using='gin',
+                               postgresql_ops={'description': 'gin_trgm_ops'}))
+
+# The search indexes need these extensions; create_all() adds them first (both are trusted, so the DB owner can)
+event.listen(Transaction.__table__, 'before_create',
+             db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm; CREATE EXTENSION IF NOT EXISTS btree_gin'))
+
 class MonthlyBudget(db.Model):
     """The Monthly Budget will have its own id for each subcategory in categories for a user.
         This will allow us to set a budgeted amount and spent amount for each subcategory, then transaction in that sub."""
@@ -215,6 +343,184 @@ class MonthlyBudget(db.Model):
     created_at = db.Column(db.Date, nullable=False, default=datetime.now(timezone.utc))
     updated_at = db.Column(db.Date, onupdate=datetime.now(timezone.utc))
 
+    # (user_id, year, month) leads so the unique index also serves every per-user month lookup
+    __table_args__ = (db.UniqueConstraint('user_id', 'year', 'month', 'user_subcategory_id', name='uq_monthlybudget_user_subcategory_month'),)
+
+    @classmethod
+    def ensure_for_month(cls, user_id, month, year):
+        """Creates the missing MonthlyBudget rows (budgeted/spent of 0) for every active UserSubcategory in the month/year.
+            Skips the write entirely when the month is already complete. Returns the number of rows created."""
+
+        missing = db.select(UserSubcategory.user_id,
+                            UserSubcategory.user_category_id,
+                            UserSubcategory.id,
+                            db.literal(month),
+                            db.literal(year),
+                            db.literal(0),
+                            db.literal(0),
+                            db.literal(datetime.now(timezone.utc).date())).\
+            where(UserSubcategory.user_id == user_id,
+                  UserSubcategory.active == db.true(),
+                  ~db.exists().where(cls.user_id == user_id,
+                                     cls.user_subcategory_id == UserSubcategory.id,
+                                     cls.month == month,
+                                     cls.year == year))
+
+        if not db.session.query(missing.exists()).scalar():
+            return 0
+
+        stmt = pg_insert(cls).from_select(['user_id', 'user_category_id', 'user_subcategory_id', 'month', 'year',
+                                           'budgeted_amount', 'spent_amount', 'created_at'], missing).\
+            on_conflict_do_nothing(constraint='uq_monthlybudget_user_subcategory_month')
+
+        result = db.session.execute(stmt)
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def add_spent(cls, connection, user_id, user_category_id, user_subcategory_id, tran_date, amount):
+        """Adds amount (negative to remove) to the spent_amount rollup for the transaction's subcategory and month.
+            Creates the month's MonthlyBudget row if it doesn't exist yet."""
+
+        today = datetime.now(timezone.utc).date()
+        stmt = pg_insert(cls).values(user_id=user_id,
+                                     user_category_id=user_category_id,
+                                     user_subcategory_id=user_subcategory_id,
+                                     month=tran_date.month,
+                                     year=tran_date.year,
+                                     budgeted_amount=0,
+                                     spent_amount=amount,
+                                     created_at=today)
+        stmt = stmt.on_conflict_do_update(constraint='uq_monthlybudget_user_subcategory_month',
+                                          set_={'spent_amount': cls.spent_amount + stmt.excluded.spent_amount,
+                                                'updated_at': today})
+        connection.execute(stmt)
+
+    @classmethod
+    def _actual_spent(cls, user_id=None):
+        """Transaction totals per (user, subcategory, month, year), straight from the transactions table."""
+
+        month = db.cast(db.extract('month', Transaction.tran_date), db.Integer)
+        year = db.cast(db.extract('year', Transaction.tran_date), db.Integer)
+        query = db.select(Transaction.user_id,
+                          db.func.min(Transaction.user_category_id).label('user_category_id'),
+                          Transaction.user_subcategory_id,
+                          month.label('month'),
+                          year.label('year'),
+                          db.func.sum(Transaction.amount).label('spent_amount')).\
+            group_by(Transaction.user_id, Transaction.user_subcategory_id, month, year)
+
+        if user_id is not None:
+            query = query.where(Transaction.user_id == user_id)
+        return query
+
+    @classmethod
+    def find_spent_drift(cls, user_id=None):
+        """Compares every spent_amount rollup against its transactions.
+            Returns a list of dicts for the (user, subcategory, month, year) buckets that disagree."""
+
+        actual = cls._actual_spent(user_id).subquery()
+        recorded = db.select(cls.user_id, cls.user_subcategory_id, cls.month, cls.year, cls.spent_amount)
+        if user_id is not None:
+            recorded = recorded.where(cls.user_id == user_id)
+        recorded = recorded.subquery()
+
+        recorded_amount = db.func.coalesce(recorded.c.spent_amount, 0)
+        actual_amount = db.func.coalesce(actual.c.spent_amount, 0)
+        query = db.select(db.func.coalesce(recorded.c.user_id, actual.c.user_id).label('user_id'),
+                          db.func.coalesce(recorded.c.user_subcategory_id, actual.c.user_subcategory_id).label('user_subcategory_id'),
+                          db.func.coalesce(recorded.c.month, actual.c.month).label('month'),
+                          db.func.coalesce(recorded.c.year, actual.c.year).label('year'),
+                          recorded_amount.label('recorded'),
+                          actual_amount.label('actual')).\
+            select_from(recorded.join(actual, db.and_(recorded.c.user_id == actual.c.user_id,
+                                                      recorded.c.user_subcategory_id == actual.c.user_subcategory_id,
+                                                      recorded.c.month == actual.c.month,
+                                                      recorded.c.year == actual.c.year), full=True)).\
+            where(recorded_amount != actual_amount).\
+            order_by('user_id', 'year', 'month', 'user_subcategory_id')
+
+        return [dict(row._mapping) for row in db.session.execute(query)]
+
+    @classmethod
+    def rebuild_spent(cls, user_id=None):
+        """Recomputes every spent_amount rollup from scratch (optionally for one user) and commits."""
+
+        today = datetime.now(timezone.utc).date()
+        actual = cls._actual_spent(user_id).subquery()
+
+        stmt = pg_insert(cls).from_select(['user_id', 'user_category_id', 'user_subcategory_id', 'month', 'year',
+                                           'budgeted_amount', 'spent_amount', 'created_at'],
+                                          db.select(actual.c.user_id, actual.c.user_category_id, actual.c.user_subcategory_id,
+                                                    actual.c.month, actual.c.year, db.literal(0), actual.c.spent_amount,
+                                                    db.literal(today)))
+        stmt = stmt.on_conflict_do_update(constraint='uq_monthlybudget_user_subcategory_month',
+                                          set_={'spent_amount': stmt.excluded.spent_amount, 'updated_at': today},
+                                          where=cls.spent_amount != stmt.excluded.spent_amount)
+        db.session.execute(stmt)
+
+        month_start = db.func.make_date(cls.year, cls.month, 1)
+        no_transactions = ~db.exists().where(Transaction.user_id == cls.user_id,
+                                             Transaction.user_subcategory_id == cls.user_subcategory_id,
+                                             Transaction.tran_date >= month_start,
+                                             Transaction.tran_date < month_start + db.func.make_interval(0, 1))
+        clear = db.update(cls).where(cls.spent_amount != 0, no_transactions).values(spent_amount=0, updated_at=today)
+        if user_id is not None:
+            clear = clear.where(cls.user_id == user_id)
+        db.session.execute(clear)
+
+        db.session.commit()
+
+    @classmethod
+    def set_budgeted_amounts(cls, user_id, edits):
+        """Applies many budgeted amount edits, [(user_subcategory_id, month, year, amount)], in one
+            UPDATE ... FROM (VALUES ...) and commits. Rows already at their amount aren't rewritten.
+            Returns (user_category_id, user_subcategory_id, month, year, budgeted_amount) for each row that changed."""
+
+        if not edits:
+            return []
+
+        values = db.values(db.column('user_subcategory_id', db.Integer),
+                           db.column('month', db.Integer),
+                           db.column('year', db.Integer),
+                           db.column('amount', db.Numeric(10, 2)),
+                           name='edits').data(edits)
+
+        stmt = db.update(cls).\
+            where(cls.user_id == user_id,
+                  cls.user_subcategory_id == values.c.user_subcategory_id,
+                  cls.month == values.c.month,
+                  cls.year == values.c.year,
+                  cls.budgeted_amount != values.c.amount).\
+            values(budgeted_amount=values.c.amount, updated_at=datetime.now(timezone.utc).date()).\
+            returning(cls.user_category_id, cls.user_subcategory_id, cls.month, cls.year, cls.budgeted_amount)
+
+        changed = db.session.execute(stmt, execution_options={'synchronize_session': False}).all()
+        db.session.commit()
+        return changed
+
+    @classmethod
+    def roll_over(cls, target_start, target_end=None, source=None, average_months=None, user_id=None):
+        """Fills budgeted amounts for the months target_start..target_end (first-of-month dates) in one
+            INSERT ... SELECT and commits. Amounts come from the source month (default: the month before target_start)
+            or, with average_months, the average of each subcategory's budgeted months among the N before target_start.
+            Only unset (zero) budgets are filled, so re-running is a no-op and edited amounts are kept.
+            Covers every user unless user_id is given. Returns the number of budgets filled."""
+
+        target_end = target_end or target_start
+        if average_months:
+            source_start, source_end = target_start - relativedelta(months=average_months), target_start - relativedelta(months=1)
+        else:
+            source_start = source_end = source or target_start - relativedelta(months=1)
+
+        result = db.session.execute(ROLLOVER_SQL, {'user_id': user_id,
+                                                   'source_start_year': source_start.year, 'source_start_month': source_start.month,
+                                                   'source_end_year': source_end.year, 'source_end_month': source_end.month,
+                                                   'target_start': target_start, 'target_end': target_end,
+                                                   'today': datetime.now(timezone.utc).date()})
+        db.session.commit()
+        return result.rowcount
+
     @classmethod
     def get_monthly_budget(cls, user_id, month, year):
         """Retrieve the monthly budget for a user for a specific month/year."""
@@ -232,10 +538,86 @@ class MonthlyBudget(db.Model):
     @classmethod
     def get_total_actual(cls, user_id, month, year):
         """Calc total actual amount spent by a user for a specific month/year."""
-        total = db.session.query(db.func.sum(cls.Transaction.amount)).\
+        start, end = month_bounds(month, year)
+        total = db.session.query(db.func.sum(Transaction.amount)).\
         join(UserSubcategory, UserSubcategory.id == Transaction.user_subcategory_id).\
         join(UserCategory, UserCategory.id == UserSubcategory.user_category_id).\
         filter(UserCategory.user_id == user_id,
-               db.extract('month', Transaction.tran_date) == month,
-               db.extract('year', Transaction.tran_date) == year).scalar()
-        return total or 0
\ No newline at end of file
+               Transaction.user_id == user_id,
+               Transaction.tran_date >= start,
+               Transaction.tran_date < end).scalar()
+        return total or 0
+
+# Source amounts per subcategory (the average of its non-zero budgets across the source months; one month when
+# copying), crossed with every target month. Conflicting rows are only overwritten while still unset.
+ROLLOVER_SQL = db.text("""
+    INSERT INTO monthlybudgets (user_id, user_category_id, user_subcategory_id, month, year,
+                                budgeted_amount, spent_amount, created_at)
+    SELECT u_sub.user_id, u_sub.user_category_id, u_sub.id,
+           CAST(EXTRACT(MONTH FROM targets.month_start) AS INTEGER), CAST(EXTRACT(YEAR FROM targets.month_start) AS INTEGER),
+           source.budgeted_amount, 0, :today
+    FROM (
+        SELECT user_subcategory_id, ROUND(AVG(budgeted_amount), 2) AS budgeted_amount
+        FROM monthlybudgets
+        WHERE (CAST(:user_id AS INTEGER) IS NULL OR user_id = :user_id)
+          AND (year, month) >= (:source_start_year, :source_start_month)
+          AND (year, month) <= (:source_end_year, :source_end_month)
+          AND budgeted_amount <> 0
+        GROUP BY user_subcategory_id
+    ) AS source
+    JOIN usersubcategories AS u_sub ON u_sub.id = source.user_subcategory_id AND u_sub.active
+    CROSS JOIN generate_series(CAST(:target_start AS DATE), CAST(:target_end AS DATE), INTERVAL '1 month') AS targets (month_start)
+    ON CONFLICT ON CONSTRAINT uq_monthlybudget_user_subcategory_month
+    DO UPDATE SET budgeted_amount = EXCLUDED.budgeted_amount, updated_at = EXCLUDED.created_at
+    WHERE monthlybudgets.budgeted_amount = 0
+""")
+
+# ------------------- Spend Rollups -------------------
+# MonthlyBudget.spent_amount is kept in step with every Transaction written through the ORM,
+# so reads never have to re-sum raw transactions. Paths that bypass the ORM must update it themselves.
+
+ROLLUP_KEYS = ('user_id', 'user_category_id', 'user_subcategory_id', 'tran_date', 'amount')
+
+@event.listens_for(Transaction, 'after_insert')
+def add_transaction_to_rollup(mapper, connection, target):
+    MonthlyBudget.add_spent(connection, target.user_id, target.user_category_id, target.user_subcategory_id,
+                            target.tran_date, target.amount)
+
+@event.listens_for(Transaction, 'after_update')
+def move_transaction_in_rollup(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[key].history.has_changes() for key in ROLLUP_KEYS):
+        return
+
+    # Changed keys always carry their old value (see active_history on Transaction); unchanged ones are still current
+    previous = {}
+    for key in ROLLUP_KEYS:
+        history = state.attrs[key].history
+        previous[key] = history.deleted[0] if history.has_changes() else getattr(target, key)
+
+    MonthlyBudget.add_spent(connection, previous['user_id'], previous['user_category_id'], previous['user_subcategory_id'],
+                            previous['tran_date'], -previous['amount'])
+    MonthlyBudget.add_spent(connection, target.user_id, target.user_category_id, target.user_subcategory_id,
+                            target.tran_date, target.amount)
+
+@event.listens_for(Transaction, 'after_delete')
+def remove_transaction_from_rollup(mapper, connection, target):
+    MonthlyBudget.add_spent(connection, target.user_id, target.user_category_id, target.user_subcategory_id,
+                            target.tran_date, -target.amount)
+
+
+# ------------------- Balance History -------------------
+# Every balance an account has held is appended to AccountBalanceSnapshot as it is written through the ORM.
+
+def record_balance(connection, account):
+    connection.execute(db.insert(AccountBalanceSnapshot).values(account_id=account.id, user_id=account.user_id,
+                                                                balance=account.balance))
+
+@event.listens_for(Account, 'after_insert')
+def record_opening_balance(mapper, connection, target):
+    record_balance(connection, target)
+
+@event.listens_for(Account, 'after_update')
+def record_balance_change(mapper, connection, target):
+    if inspect(target).attrs.balance.history.has_changes():
+        record_balance(connection, target)
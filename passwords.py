@@ -0,0 +1,152 @@
+"""Password hashing off the request thread.
+
+    bcrypt is deliberately slow (hundreds of ms at the default cost), so hashing inline ties up the CPU a worker's
+    other requests need. PasswordHasher runs it in a small process pool instead, with a cap on queued + running jobs
+    and a timeout: when the pool is saturated, callers get PasswordServiceBusy straight away rather than piling up
+    behind each other. The request still waits for its own hash, so this pays off with threaded workers (gthread,
+    see gunicorn.conf.py): the other threads keep serving while logins hash, and the cap only bites when a process
+    has more threads than PASSWORD_HASH_QUEUE. A sync worker runs one request at a time and never reaches the cap.
+
+    Hashes are standard $2b$ bcrypt strings (the format Flask-Bcrypt wrote), so existing passwords keep working;
+    the cost factor is read back from each hash so logins can upgrade weaker ones."""
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class PasswordServiceBusy(Exception):
+    """The hashing pool is at its queue limit, or a hash did not finish within the timeout."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(pw_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+def hash_rounds(pw_hash):
+    """The cost factor stored in a bcrypt hash ('$2b$12$...' -> 12), or None if it isn't one."""
+
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def calibrate_rounds(target_ms, minimum=MIN_ROUNDS, maximum=MAX_ROUNDS):
+    """The highest cost whose hash should take no longer than target_ms on this machine (but at least minimum).
+        Each extra round doubles the work, so one timing at the minimum cost is enough to extrapolate."""
+
+    started = time.perf_counter()
+    _hash('calibration', minimum)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    rounds = minimum
+    while rounds < maximum and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+class PasswordHasher:
+    """Hashes and checks passwords in a bounded process pool. workers=0 runs bcrypt inline (tests, CLI scripts)."""
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=2, max_queue=4, timeout=5.0):
+        self.configure(rounds, workers, max_queue, timeout)
+
+    def configure(self, rounds=DEFAULT_ROUNDS, workers=2, max_queue=4, timeout=5.0):
+        self.shutdown()
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Created on first use, so each gunicorn worker starts its own pool after forking
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise PasswordServiceBusy('Too many password hashes queued.')
+
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        # The slot is held until the job really finishes, even if we stop waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordServiceBusy('Password hashing timed out.')
+
+    def hash(self, password):
+        """Returns a bcrypt hash of password at the configured cost."""
+
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        """True if password matches pw_hash."""
+
+        return self._run(_check, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """True if pw_hash was made at a lower cost than the configured one. Never downgrades: a stronger hash
+            (say from a host calibrated higher) is left as it is."""
+
+        rounds = hash_rounds(pw_hash)
+        return rounds is None or rounds < self.rounds
+
+    def after_fork(self):
+        """Forgets a pool inherited from the parent process (it is the parent's to shut down)."""
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+
+    def shutdown(self):
+        pool = getattr(self, '_pool', None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+hasher = PasswordHasher()
+
+
+def configure_passwords(app):
+    """Configures the shared hasher from app config:
+        BCRYPT_LOG_ROUNDS (cost; default 12) or, when it isn't set, BCRYPT_TARGET_MS (calibrate the cost to this
+        latency; gunicorn.conf.py does this once in the master and passes the result to every worker as
+        BCRYPT_LOG_ROUNDS, so all workers agree), PASSWORD_HASH_WORKERS (pool size; 0 = inline, the default when TESTING), PASSWORD_HASH_QUEUE (max queued +
+        running hashes) and PASSWORD_HASH_TIMEOUT (seconds)."""
+
+    testing = app.config.get('TESTING', False)
+    if app.config.get('BCRYPT_LOG_ROUNDS'):
+        rounds = int(app.config['BCRYPT_LOG_ROUNDS'])
+    elif app.config.get('BCRYPT_TARGET_MS'):
+        rounds = calibrate_rounds(float(app.config['BCRYPT_TARGET_MS']))
+    else:
+        rounds = 4 if testing else DEFAULT_ROUNDS
+
+    hasher.configure(rounds=rounds,
+                     workers=int(app.config.get('PASSWORD_HASH_WORKERS', 0 if testing else 2)),
+                     max_queue=int(app.config.get('PASSWORD_HASH_QUEUE', 4)),
+                     timeout=float(app.config.get('PASSWORD_HASH_TIMEOUT', 5.0)))
@@ -0,0 +1,114 @@
+"""Read-replica routing.
+
+    When REPLICA_DATABASE_URI is set, it becomes the 'replica' bind and RoutingSession sends plain SELECTs there
+    for views marked with @replica_reads, along with text() queries declared as reads with .columns(...).
+    Everything else goes to the primary: writes, SELECT ... FOR UPDATE, other text() statements, every statement
+    after the request has written anything, and all requests from a user who wrote within the last
+    REPLICA_READ_YOUR_WRITES_SECONDS (tracked in their session cookie, so it holds across workers). That window
+    should comfortably exceed the replica's usual lag.
+
+    Code outside a request (CLI jobs, scripts) can opt in with `with replica_session(db): ...`. Writes that only
+    fill in rows every replica view already reads as empty can go in `with bookkeeping_writes(db): ...`, which
+    leaves the user's read-your-writes window closed."""
+
+import os
+import time
+from contextlib import contextmanager
+
+from flask import has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.selectable import TextualSelect
+
+REPLICA_BIND = 'replica'
+LAST_WRITE_KEY = 'last_write_at'
+DEFAULT_READ_YOUR_WRITES_SECONDS = 10
+
+
+def is_plain_select(clause):
+    # text(...).columns(...) is how a raw SQL query declares itself a read; a bare text() may write
+    if isinstance(clause, TextualSelect):
+        return True
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that can route reads to the replica bind (see module docstring)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('use_replica') and not self.info.get('wrote'):
+            if self._flushing or not is_plain_select(clause):
+                self.info['wrote'] = True
+            elif REPLICA_BIND in self._db.engines:
+                return self._db.engines[REPLICA_BIND]
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_reads(view):
+    """Marks a view whose GET requests may read from the replica."""
+
+    view.replica_reads = True
+    return view
+
+
+@contextmanager
+def replica_session(db):
+    """Routes the session's plain SELECTs to the replica for the duration of the block."""
+
+    db.session.info['use_replica'] = True
+    try:
+        yield db.session
+    finally:
+        db.session.info.pop('use_replica', None)
+
+
+@contextmanager
+def bookkeeping_writes(db):
+    """Commits in the block don't count as the user's writes (LAST_WRITE_KEY isn't set). Only for rows that read
+        the same whether or not the replica has them yet, like MonthlyBudget.ensure_for_month's zero budgets."""
+
+    db.session.info['bookkeeping'] = True
+    try:
+        yield db.session
+    finally:
+        db.session.info.pop('bookkeeping', None)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_statement_written(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements write without a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_last_write(db_session):
+    if db_session.info.get('wrote') and not db_session.info.get('bookkeeping') and has_request_context():
+        session[LAST_WRITE_KEY] = time.time()
+
+
+def configure_replica(app):
+    """Adds the 'replica' bind from REPLICA_DATABASE_URI (env or config). Call before db.init_app()."""
+
+    uri = app.config.get('REPLICA_DATABASE_URI') or os.environ.get('REPLICA_DATABASE_URI')
+    if uri:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = uri
+    app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS)
+
+
+def init_replica_routing(app, db):
+    """Decides per request whether reads may use the replica. Register before any before_request hook that queries."""
+
+    @app.before_request
+    def choose_read_bind():
+        view = app.view_functions.get(request.endpoint)
+        recently_wrote = time.time() - session.get(LAST_WRITE_KEY, 0) < app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+
+        db.session.info['use_replica'] = (getattr(view, 'replica_reads', False)
+                                          and request.method in ('GET', 'HEAD')
+                                          and not recently_wrote)
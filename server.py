@@ -1,5 +1,9 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+
 from app import create_app
 from models import connect_db
 
 app = create_app('finwize_db')
-connect_db(app)
\ No newline at end of file
+connect_db(app, create_tables=not app.config['PRODUCTION'])
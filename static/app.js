@@ -1,26 +1,183 @@
 document.addEventListener('DOMContentLoaded', function() {
     var transactionModal = document.getElementById('transactionModal');
-    transactionModal.addEventListener('show.bs.modal', function (event) {
-        var button = event.relatedTarget;
-        var categoryId = button.getAttribute('data-category-id');
-        var subcategoryId = button.getAttribute('data-subcategory-id');
-
-        var categoryInput = document.getElementById('categoryInput');
-        var subcategoryInput = document.getElementById('subcategoryInput');
-
-        // Set selected options
-        for (var i = 0; i < categoryInput.options.length; i++) {
-            if (categoryInput.options[i].value === categoryId) {
-                categoryInput.options[i].selected = true;
-                break;
+    if (transactionModal) {
+        transactionModal.addEventListener('show.bs.modal', function (event) {
+            var button = event.relatedTarget;
+            var categoryId = button.getAttribute('data-category-id');
+            var subcategoryId = button.getAttribute('data-subcategory-id');
+
+            var categoryInput = document.getElementById('categoryInput');
+            var subcategoryInput = document.getElementById('subcategoryInput');
+
+            // Set selected options
+            for (var i = 0; i < categoryInput.options.length; i++) {
+                if (categoryInput.options[i].value === categoryId) {
+                    categoryInput.options[i].selected = true;
+                    break;
+                }
+            }
+
+            for (var i = 0; i < subcategoryInput.options.length; i++) {
+                if (subcategoryInput.options[i].value === subcategoryId) {
+                    subcategoryInput.options[i].selected = true;
+                    break;
+                }
+            }
+        });
+    }
+
+    // Transactions ledger: load the next page from /api/transactions when "Load more" scrolls into view
+    var loadMore = document.getElementById('load-more');
+    if (loadMore && 'IntersectionObserver' in window) {
+        var transactionsBody = document.getElementById('transactions-body');
+        var loading = false;
+
+        function addCell(row, text) {
+            var cell = document.createElement('td');
+            cell.textContent = text;
+            row.appendChild(cell);
+            return cell;
+        }
+
+        function loadNextPage() {
+            var cursor = loadMore.getAttribute('data-next-cursor');
+            if (loading || !cursor) {
+                return;
+            }
+            loading = true;
+
+            var url = new URL(loadMore.getAttribute('data-api-url'), window.location.origin);
+            url.searchParams.set('cursor', cursor);
+
+            fetch(url, {credentials: 'same-origin'})
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    data.transactions.forEach(function(tran) {
+                        var row = document.createElement('tr');
+                        addCell(row, tran.tran_date);
+                        addCell(row, tran.description);
+                        addCell(row, tran.category_name);
+                        addCell(row, tran.subcategory_name);
+                        addCell(row, '$' + tran.amount);
+
+                        var edit = document.createElement('a');
+                        edit.href = tran.edit_url;
+                        edit.className = 'btn btn-primary btn-sm';
+                        edit.textContent = 'Edit';
+                        addCell(row, '').appendChild(edit);
+
+                        transactionsBody.appendChild(row);
+                    });
+
+                    if (data.next_cursor) {
+                        loadMore.setAttribute('data-next-cursor', data.next_cursor);
+                    } else {
+                        loadMore.remove();
+                        observer.disconnect();
+                    }
+                })
+                .finally(function() { loading = false; });
+        }
+
+        var observer = new IntersectionObserver(function(entries) {
+            if (entries[0].isIntersecting) {
+                loadNextPage();
+            }
+        });
+        observer.observe(loadMore);
+        loadMore.addEventListener('click', function(event) {
+            event.preventDefault();
+            loadNextPage();
+        });
+    }
+
+    // Dashboard budgets: batch edited amounts to /api/budgets and patch the changed totals in place
+    var dashboard = document.getElementById('dashboard');
+    if (dashboard && window.fetch) {
+        var pendingEdits = {};
+        var flushTimer = null;
+
+        function setText(element, value) {
+            if (element) {
+                element.textContent = value;
             }
         }
 
-        for (var i = 0; i < subcategoryInput.options.length; i++) {
-            if (subcategoryInput.options[i].value === subcategoryId) {
-                subcategoryInput.options[i].selected = true;
-                break;
+        function queueEdit(form) {
+            var edit = {
+                user_subcategory_id: form.elements['user_subcategory_id'].value,
+                month: form.elements['month'].value,
+                year: form.elements['year'].value,
+                budgeted_amount: form.elements['budgeted_amount'].value || '0'
+            };
+            pendingEdits[edit.user_subcategory_id + ':' + edit.month + ':' + edit.year] = edit;
+        }
+
+        function flushEdits() {
+            clearTimeout(flushTimer);
+            var edits = Object.keys(pendingEdits).map(function(key) { return pendingEdits[key]; });
+            pendingEdits = {};
+            if (!edits.length) {
+                return;
             }
+
+            fetch(dashboard.getAttribute('data-budgets-url'), {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({edits: edits})
+            })
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error('Budget update failed');
+                    }
+                    return response.json();
+                })
+                .then(function(totals) {
+                    totals.subcategories.forEach(function(u_sub) {
+                        setText(dashboard.querySelector('[data-subcategory-total-budgeted="' + u_sub.id + '"]'), u_sub.total_budgeted);
+                    });
+                    totals.categories.forEach(function(u_cat) {
+                        setText(dashboard.querySelector('[data-category-total-budgeted="' + u_cat.id + '"]'), u_cat.total_budgeted);
+                    });
+                    totals.months.forEach(function(month) {
+                        setText(document.getElementById('month-total-budgeted'), month.total_budgeted);
+                        setText(document.getElementById('month-total-actual'), month.total_actual);
+                        setText(document.getElementById('month-difference'), month.difference);
+                    });
+                })
+                .catch(function() {
+                    // Fall back to the full page so the dashboard shows what was saved
+                    window.location.reload();
+                });
         }
-    });
-});
\ No newline at end of file
+
+        // Fill the month's unset budgets from the previous month, then reload to show them
+        var rollover = document.getElementById('rollover-budget');
+        if (rollover) {
+            rollover.addEventListener('click', function() {
+                rollover.disabled = true;
+                fetch(dashboard.getAttribute('data-rollover-url'), {
+                    method: 'POST',
+                    credentials: 'same-origin',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({month: rollover.getAttribute('data-month'), year: rollover.getAttribute('data-year')})
+                })
+                    .finally(function() { window.location.reload(); });
+            });
+        }
+
+        dashboard.querySelectorAll('form.budget-form').forEach(function(form) {
+            form.addEventListener('submit', function(event) {
+                event.preventDefault();
+                queueEdit(form);
+                flushEdits();
+            });
+            form.elements['budgeted_amount'].addEventListener('change', function() {
+                queueEdit(form);
+                clearTimeout(flushTimer);
+                flushTimer = setTimeout(flushEdits, 500);
+            });
+        });
+    }
+});
@@ -0,0 +1,108 @@
+"""Request-scoped loader for a user's accounts, categories and subcategories.
+
+    Routes, forms and templates all need the same three lists; get_taxonomy() loads them once per request (three
+    queries) and keeps them on flask.g, with id lookups so nothing downstream has to re-query or nest-scan. Across
+    requests the lists come from the versioned taxonomy cache (see cache.py), so most requests run no queries at all."""
+
+import hashlib
+
+from flask import g
+
+from cache import MISSING, taxonomy_cache, cache_get, cache_set, data_version, snapshot, rehydrate
+from models import Account, UserCategory, UserSubcategory
+
+
+class UserTaxonomy:
+    """A user's accounts, categories and subcategories, with id-to-object lookups."""
+
+    def __init__(self, user_id, accounts, categories, subcategories):
+        self.user_id = user_id
+        self.accounts = accounts
+        self.categories = categories
+        self.subcategories = subcategories
+
+        self.accounts_by_id = {account.id: account for account in accounts}
+        self.categories_by_id = {u_cat.id: u_cat for u_cat in categories}
+        self.subcategories_by_id = {u_sub.id: u_sub for u_sub in subcategories}
+
+        self.subcategories_by_category = {u_cat.id: [] for u_cat in categories}
+        for u_sub in subcategories:
+            self.subcategories_by_category.setdefault(u_sub.user_category_id, []).append(u_sub)
+
+    @classmethod
+    def load(cls, user_id):
+        """Fetches the taxonomy from the database, ordered by id."""
+
+        return cls(user_id,
+                   Account.query.filter_by(user_id=user_id).order_by(Account.id).all(),
+                   UserCategory.query.filter_by(user_id=user_id).order_by(UserCategory.id).all(),
+                   UserSubcategory.query.filter_by(user_id=user_id).order_by(UserSubcategory.id).all())
+
+    @classmethod
+    def load_cached(cls, user_id):
+        """Builds the taxonomy from the cache for the user's current data version, loading and caching it on a miss.
+            The objects are detached copies, private to the caller."""
+
+        key = (user_id, data_version(user_id))
+        rows = cache_get(taxonomy_cache, key)
+        if rows is MISSING:
+            taxonomy = cls.load(user_id)
+            cache_set(taxonomy_cache, key, (snapshot(taxonomy.accounts), snapshot(taxonomy.categories), snapshot(taxonomy.subcategories)))
+            return taxonomy
+
+        accounts, categories, subcategories = rows
+        return cls(user_id, rehydrate(Account, accounts), rehydrate(UserCategory, categories), rehydrate(UserSubcategory, subcategories))
+
+    @property
+    def active_categories(self):
+        return [u_cat for u_cat in self.categories if u_cat.active]
+
+    @property
+    def active_subcategories(self):
+        return [u_sub for u_sub in self.subcategories if u_sub.active]
+
+    def fingerprint(self):
+        """Short digest of the categories/subcategories' ids, names, parents and active flags."""
+
+        parts = [(u_cat.id, u_cat.name, u_cat.active) for u_cat in self.categories]
+        parts += [(u_sub.id, u_sub.user_category_id, u_sub.name, u_sub.active) for u_sub in self.subcategories]
+        return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+    def account_choices(self):
+        return [(account.id, account.account_name) for account in self.accounts]
+
+    def category_choices(self, active_only=True):
+        categories = self.active_categories if active_only else self.categories
+        return [(u_cat.id, u_cat.name) for u_cat in categories]
+
+    def subcategory_choices(self, active_only=True):
+        subcategories = self.active_subcategories if active_only else self.subcategories
+        return [(u_sub.id, u_sub.name) for u_sub in subcategories]
+
+    def set_transaction_choices(self, form, active_only=True):
+        """Fills a TransactionForm's account/category/subcategory choices."""
+
+        form.account.choices = self.account_choices()
+        form.category.choices = self.category_choices(active_only)
+        form.subcategory.choices = self.subcategory_choices(active_only)
+
+    def subcategory_in_category(self, user_subcategory_id, user_category_id):
+        """True if the subcategory exists for this user and belongs to the category."""
+
+        u_sub = self.subcategories_by_id.get(user_subcategory_id)
+        return u_sub is not None and u_sub.user_category_id == user_category_id
+
+
+def get_taxonomy(user_id):
+    """Returns this request's UserTaxonomy for the user, loading it on first use."""
+
+    taxonomies = g.setdefault('_taxonomies', {})
+    if user_id not in taxonomies:
+        taxonomies[user_id] = UserTaxonomy.load_cached(user_id)
+    return taxonomies[user_id]
+
+def reset_taxonomy(user_id):
+    """Drops the request's copy after a write, so the next get_taxonomy() reloads it. (The commit itself has already
+        moved the cross-request cache to a new version.)"""
+
+    g.setdefault('_taxonomies', {}).pop(user_id, None)
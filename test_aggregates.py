@@ -0,0 +1,176 @@
+from unittest import TestCase, main
+from datetime import date
+from decimal import Decimal
+from app import create_app, CURR_USER_KEY
+from models import db, User, Category, Subcategory, Transaction, UserCategory, UserSubcategory, MonthlyBudget
+from aggregates import get_month_summary, get_trends
+
+
+class AggregatesTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='aggregates@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            category = Category(name='Home', active=True)
+            db.session.add(category)
+            db.session.commit()
+
+            rent = Subcategory(category_id=category.id, name='Rent', active=True)
+            repairs = Subcategory(category_id=category.id, name='Repairs', active=True)
+            db.session.add_all([rent, repairs])
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, category_id=category.id, name='Home')
+            db.session.add(user_category)
+            db.session.commit()
+
+            user_rent = UserSubcategory(user_id=user.id, subcategory_id=rent.id, user_category_id=user_category.id, name='Rent')
+            user_repairs = UserSubcategory(user_id=user.id, subcategory_id=repairs.id, user_category_id=user_category.id, name='Repairs')
+            db.session.add_all([user_rent, user_repairs])
+            db.session.commit()
+
+            db.session.add_all([
+                MonthlyBudget(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_rent.id,
+                              month=3, year=2024, budgeted_amount=1200, spent_amount=0),
+                MonthlyBudget(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_repairs.id,
+                              month=3, year=2024, budgeted_amount=100, spent_amount=0)
+            ])
+            db.session.commit()
+
+            db.session.add_all([
+                Transaction(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_rent.id,
+                            amount=1150, description='March rent', tran_date=date(2024, 3, 1)),
+                Transaction(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_repairs.id,
+                            amount=40, description='Faucet', tran_date=date(2024, 3, 31)),
+                Transaction(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_repairs.id,
+                            amount=75, description='April repair', tran_date=date(2024, 4, 1))
+            ])
+            db.session.commit()
+
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_month_summary_matches_model_helpers(self):
+        with self.app.app_context():
+            user_categories = UserCategory.query.filter_by(user_id=self.user_id).all()
+            user_subcategories = UserSubcategory.query.filter_by(user_id=self.user_id).all()
+
+            summary = get_month_summary(self.user_id, 3, 2024, user_categories, user_subcategories)
+
+            self.assertEqual(summary['total_budgeted'], Decimal('1300.00'))
+            self.assertEqual(summary['total_actual'], Decimal('1190.00'))
+            self.assertEqual(summary['difference'], Decimal('110.00'))
+
+            category = summary['categories'][0]
+            u_cat = user_categories[0]
+            self.assertEqual(category['total_budgeted'], u_cat.get_total_budgeted(3, 2024))
+            self.assertEqual(category['total_actual'], u_cat.get_total_actual(3, 2024))
+
+            subcategories = {u_sub.id: u_sub for u_sub in user_subcategories}
+            for subcategory in category['subcategories']:
+                u_sub = subcategories[subcategory['id']]
+                self.assertEqual(subcategory['total_budgeted'], u_sub.get_total_budgeted(3, 2024))
+                self.assertEqual(subcategory['total_actual'], u_sub.get_total_actual(3, 2024))
+                self.assertIsNotNone(subcategory['budget_id'])
+
+    def test_month_summary_empty_month(self):
+        with self.app.app_context():
+            user_categories = UserCategory.query.filter_by(user_id=self.user_id).all()
+            user_subcategories = UserSubcategory.query.filter_by(user_id=self.user_id).all()
+
+            summary = get_month_summary(self.user_id, 1, 2023, user_categories, user_subcategories)
+
+            self.assertEqual(summary['total_budgeted'], 0)
+            self.assertEqual(summary['total_actual'], 0)
+            self.assertIsNone(summary['categories'][0]['subcategories'][0]['budget_id'])
+
+    def test_trends_running_totals_and_deltas(self):
+        with self.app.app_context():
+            user_categories = UserCategory.query.filter_by(user_id=self.user_id).all()
+            user_subcategories = UserSubcategory.query.filter_by(user_id=self.user_id).all()
+
+            trends = get_trends(self.user_id, 4, 2024, 3, user_categories, user_subcategories)
+
+            self.assertEqual(trends['months'], ['2024-02', '2024-03', '2024-04'])
+            self.assertEqual(trends['totals']['budgeted'], [0, Decimal('1300.00'), 0])
+            self.assertEqual(trends['totals']['actual'], [0, Decimal('1190.00'), Decimal('75.00')])
+            self.assertEqual(trends['totals']['running_actual'], [0, Decimal('1190.00'), Decimal('1265.00')])
+            self.assertEqual(trends['totals']['actual_delta'], [None, Decimal('1190.00'), Decimal('-1115.00')])
+
+            category = trends['categories'][0]
+            self.assertEqual(category['actual'], trends['totals']['actual'])
+            self.assertEqual({u_sub['name']: u_sub['actual'] for u_sub in category['subcategories']},
+                             {'Rent': [0, Decimal('1150.00'), 0], 'Repairs': [0, Decimal('40.00'), Decimal('75.00')]})
+
+    def test_monthly_data_conditional_get(self):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+        response = client.get('/api/get-monthly-data?month=3&year=2024')
+        etag = response.headers['ETag']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(u_sub['subcategory_name'], u_sub['total_budgeted']) for u_sub in response.json[0]['subcategories']],
+                         [('Rent', '1200.00'), ('Repairs', '100.00')])
+
+        response = client.get('/api/get-monthly-data?month=3&year=2024', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        # A new transaction moves the spent rollup, so the ETag changes
+        with self.app.app_context():
+            budget = MonthlyBudget.query.filter_by(user_id=self.user_id, month=3, year=2024).first()
+            db.session.add(Transaction(user_id=self.user_id, user_category_id=budget.user_category_id,
+                                       user_subcategory_id=budget.user_subcategory_id, amount=5,
+                                       description='Late fee', tran_date=date(2024, 3, 15)))
+            db.session.commit()
+
+        response = client.get('/api/get-monthly-data?month=3&year=2024', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_batch_budget_edits_return_changed_totals(self):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+        with self.app.app_context():
+            subs = {u_sub.name: u_sub.id for u_sub in UserSubcategory.query.filter_by(user_id=self.user_id)}
+            category_id = UserCategory.query.filter_by(user_id=self.user_id).one().id
+
+        response = client.post('/api/budgets', json={'edits': [
+            {'user_subcategory_id': subs['Rent'], 'month': 3, 'year': 2024, 'budgeted_amount': '1250'},
+            {'user_subcategory_id': subs['Rent'], 'month': 3, 'year': 2024, 'budgeted_amount': '1300'},
+            # Unchanged, and a month without budget rows: neither is reported
+            {'user_subcategory_id': subs['Repairs'], 'month': 3, 'year': 2024, 'budgeted_amount': 100},
+            {'user_subcategory_id': subs['Repairs'], 'month': 5, 'year': 2024, 'budgeted_amount': 50}
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {
+            'subcategories': [{'id': subs['Rent'], 'month': 3, 'year': 2024, 'total_budgeted': '1300.00'}],
+            'categories': [{'id': category_id, 'month': 3, 'year': 2024, 'total_budgeted': '1400.00'}],
+            'months': [{'month': 3, 'year': 2024, 'total_budgeted': '1400.00', 'total_actual': '1190.00',
+                        'difference': '210.00'}]
+        })
+
+        with self.app.app_context():
+            self.assertEqual(MonthlyBudget.query.filter_by(user_subcategory_id=subs['Rent']).one().budgeted_amount,
+                             Decimal('1300.00'))
+
+        response = client.post('/api/budgets', json={'edits': [{'user_subcategory_id': subs['Rent'], 'month': 13,
+                                                                 'year': 2024, 'budgeted_amount': 1}]})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+from unittest import TestCase, main
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from analytics import SpendingHistory, forecast_month, moving_average, overrun_probability, to_money
+
+
+class AnalyticsTestCase(TestCase):
+    def setUp(self):
+        # Subcategory 5: $10 on Feb 1 and $20 on Mar 1; subcategory 7: $5 on Mar 2; uncategorized $7 on Mar 9
+        self.history = SpendingHistory(date(2024, 2, 1), date(2024, 3, 10),
+                                       cents=[1000, 2000, 500, 700], days=[0, 29, 30, 37], subcategory_ids_per_row=[5, 5, 7, -1])
+
+    def test_daily_matrix(self):
+        daily = self.history.daily_matrix()
+
+        self.assertEqual(daily.shape, (3, 39))
+        self.assertEqual(list(self.history.subcategory_ids), [-1, 5, 7])
+        self.assertEqual(daily[1, 0], 1000)
+        self.assertEqual(daily.sum(), 4200)
+
+    def test_moving_average(self):
+        np.testing.assert_allclose(moving_average([1, 2, 3, 4], 2), [1, 1.5, 2.5, 3.5])
+        np.testing.assert_allclose(moving_average([[2, 4], [6, 8]], 5), [[2, 3], [6, 7]])
+
+    def test_overrun_probability(self):
+        probabilities = overrun_probability(np.array([500., 100., 0.]), np.array([100., 1000., 0.]),
+                                            np.array([10., 10., 10.]), np.array([0., 0., 5.]), 10)
+
+        self.assertEqual(probabilities, [1.0, 0.0, None])
+
+    def test_forecast_month(self):
+        forecast = forecast_month(self.history, date(2024, 3, 1), date(2024, 3, 10), {5: 5000, 7: 100})
+        by_id = {row['id']: row for row in forecast['subcategories']}
+
+        self.assertEqual(forecast['days_elapsed'], 10)
+        self.assertEqual(by_id[5]['spent'], 2000)
+        self.assertEqual(by_id[5]['burn_rate'], 200)
+        self.assertGreater(by_id[5]['projected'], 2000)
+        self.assertEqual(by_id[7]['overrun_probability'], 1.0)
+        self.assertIsNone(by_id[None]['overrun_probability'])
+        self.assertEqual(len(forecast['daily']['dates']), 30)
+        self.assertEqual(forecast['totals']['spent'], 3200)
+
+    def test_to_money(self):
+        self.assertEqual(to_money(123456.4), Decimal('1234.56'))
+
+if __name__ == '__main__':
+    main()
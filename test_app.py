@@ -30,5 +30,11 @@ class AppTestCase(TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertIn(b'<li class="nav-item"><a class="nav-link text-light" href="/user/1/profile">Profile</a></li>', response.data)
 
+
+class ProductionProfileTestCase(TestCase):
+    def test_production_flag(self):
+        self.assertTrue(create_app('finwize_db_test', production=True).config['PRODUCTION'])
+        self.assertFalse(create_app('finwize_db_test', production=False).config['PRODUCTION'])
+
 if __name__ == '__main__':
     main()
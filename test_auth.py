@@ -1,7 +1,9 @@
 
 from unittest import TestCase, main
 from app import create_app
-from models import db, User
+from models import db, User, Category, Subcategory, UserCategory, UserSubcategory
+from passwords import hasher, hash_rounds
+from cache import get_category_template, template_cache
 
 
 class UserAuthTestCase(TestCase):
@@ -42,5 +44,46 @@ class UserAuthTestCase(TestCase):
 
             self.assertFalse(auth_user)
 
+    def test_authenticate_rehashes_outdated_cost(self):
+        with self.app.app_context():
+            hasher.rounds = 5
+            auth_user = User.authenticate('authtest@email.com', 'password')
+
+            self.assertEqual(hash_rounds(auth_user.password), 5)
+            self.assertTrue(User.authenticate('authtest@email.com', 'password'))
+
+    def test_signup_provisions_template(self):
+        with self.app.app_context():
+            food = Category(name='Food', active=True)
+            home = Category(name='Home', active=True)
+            db.session.add_all([food, home])
+            db.session.commit()
+            db.session.add_all([Subcategory(category_id=food.id, name='Groceries', active=True),
+                                Subcategory(category_id=home.id, name='Rent', active=True)])
+            db.session.commit()
+
+            template = get_category_template()
+            self.assertIs(get_category_template(), template)
+            self.assertEqual(template_cache.stats()['hits'], 1)
+
+            user = User.signup(email='provisioned@email.com', password='password', template=template)
+
+            user_categories = {u_cat.id: u_cat.name for u_cat in UserCategory.query.filter_by(user_id=user.id)}
+            self.assertEqual(sorted(user_categories.values()), ['Food', 'Home'])
+            self.assertEqual({u_sub.name: user_categories[u_sub.user_category_id] for u_sub in UserSubcategory.query.filter_by(user_id=user.id)},
+                             {'Groceries': 'Food', 'Rent': 'Home'})
+
+    def test_template_follows_preset_reloads(self):
+        with self.app.app_context():
+            db.session.add(Category(name='Food', active=True))
+            db.session.commit()
+            self.assertEqual([name for _, name in get_category_template()[0]], ['Food'])
+
+            # A write any process makes (as seed.py does) moves the database stamp the cache is keyed on
+            db.session.execute(db.update(Category).values(name='Groceries'))
+            db.session.commit()
+
+            self.assertEqual([name for _, name in get_category_template()[0]], ['Groceries'])
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
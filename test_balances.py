@@ -0,0 +1,71 @@
+from unittest import TestCase, main
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from app import create_app, CURR_USER_KEY
+from models import db, User, Account, AccountBalanceSnapshot
+
+
+class BalanceHistoryTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='balances@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            checking = Account(user_id=user.id, account_name='Checking', balance=100)
+            savings = Account(user_id=user.id, account_name='Savings', balance=1000)
+            db.session.add_all([checking, savings])
+            db.session.commit()
+
+            # Backdate the opening balances, then change one of them today
+            AccountBalanceSnapshot.query.update({'recorded_at': datetime(2024, 1, 10, tzinfo=timezone.utc)})
+            db.session.commit()
+
+            checking.account_name = 'Everyday Checking'
+            db.session.commit()
+            checking.balance = 250
+            db.session.commit()
+
+            self.user_id = user.id
+            self.checking_id = checking.id
+
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_snapshots_only_on_balance_changes(self):
+        with self.app.app_context():
+            snapshots = AccountBalanceSnapshot.query.filter_by(account_id=self.checking_id).order_by(AccountBalanceSnapshot.id).all()
+
+            self.assertEqual([snapshot.balance for snapshot in snapshots], [Decimal('100.00'), Decimal('250.00')])
+            self.assertEqual(AccountBalanceSnapshot.latest_update(self.user_id), snapshots[-1].recorded_at)
+
+    def test_net_worth_as_of(self):
+        response = self.client.get('/api/net-worth?as_of=2024-02-01')
+        self.assertEqual(response.json['net_worth'], '1100.00')
+
+        response = self.client.get('/api/net-worth?as_of=2024-01-09')
+        self.assertEqual(response.json['net_worth'], '0.00')
+        self.assertEqual([account['balance'] for account in response.json['accounts']], [None, None])
+
+        response = self.client.get('/api/net-worth')
+        self.assertEqual(response.json['net_worth'], '1250.00')
+
+    def test_net_worth_series(self):
+        with self.app.app_context():
+            points = AccountBalanceSnapshot.net_worth_series(self.user_id, date(2023, 12, 1), date(2024, 2, 1))
+
+            self.assertEqual(points, [(date(2023, 12, 1), Decimal('0')), (date(2024, 1, 1), Decimal('0')),
+                                      (date(2024, 2, 1), Decimal('1100.00'))])
+
+if __name__ == '__main__':
+    main()
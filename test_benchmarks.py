@@ -0,0 +1,56 @@
+from unittest import TestCase, main
+from datetime import date
+from benchmarks.run_benchmarks import percentile
+from benchmarks.synthetic import month_starts
+from benchmarks.startup import parse_importtime
+from benchmarks.loadtest import VirtualUser, make_routes, month_back, parse_mix
+
+
+class BenchmarkHelpersTestCase(TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 95), 95)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_month_starts(self):
+        self.assertEqual(list(month_starts(date(2023, 11, 20), date(2024, 2, 1))),
+                         [date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)])
+
+    def test_parse_importtime(self):
+        stderr = '\n'.join(['import time: self [us] | cumulative | imported package',
+                             'import time:       120 |        120 |     dotenv.parser',
+                             'import time:       300 |        420 |   dotenv',
+                             'import time:      1000 |       1420 | app'])
+
+        self.assertEqual(parse_importtime(stderr), {'dotenv.parser': 120, 'dotenv': 420, 'app': 1420})
+
+    def test_month_back(self):
+        self.assertEqual(month_back(date(2024, 3, 15), 0), (3, 2024))
+        self.assertEqual(month_back(date(2024, 3, 15), 3), (12, 2023))
+        self.assertEqual(month_back(date(2024, 3, 15), 15), (12, 2022))
+
+    def test_parse_mix(self):
+        routes = make_routes(date(2024, 7, 15))
+
+        self.assertEqual(parse_mix('homepage=3, monthly_data=1', routes), {'homepage': 3, 'monthly_data': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('admin=1', routes)
+
+    def test_scrape_dashboard(self):
+        user = VirtualUser('http://localhost', 'bench0@example.com', 'password', timeout=1)
+        user.scrape_dashboard('''
+            <input id="csrf_token" name="csrf_token" type="hidden" value="abc.123">
+            <form class="budget-form" method="post" action="/user/7/budgeted_amount"></form>
+            <button data-category-id="3" data-subcategory-id="11">Add</button>
+            <select class="form-control" id="account" name="account"><option value="5">Checking</option><option value="6">Savings</option></select>
+            <select id="categoryInput" name="category"><option value="3">Food</option></select>''')
+
+        self.assertEqual(user.csrf_token, 'abc.123')
+        self.assertEqual(user.budget_action, '/user/7/budgeted_amount')
+        self.assertEqual(user.category_pairs, [(3, 11)])
+        self.assertEqual(user.account_ids, [5, 6])
+
+if __name__ == '__main__':
+    main()
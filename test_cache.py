@@ -0,0 +1,82 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+from app import create_app
+from models import db, User, Account
+from cache import LRUCache, MISSING, get_cached_user, taxonomy_cache, render_cache_metrics
+from taxonomy import UserTaxonomy
+
+
+class LRUCacheTestCase(TestCase):
+    def test_hits_misses_and_lru_eviction(self):
+        cache = LRUCache('test', max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        # 'b' was the least recently used entry
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'evictions': 1, 'expirations': 0,
+                                         'size': 2, 'max_entries': 2})
+
+    def test_ttl_expiry(self):
+        cache = LRUCache('test', max_entries=2, ttl=60)
+        with patch('cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with patch('cache.time.monotonic', return_value=161):
+            self.assertIs(cache.get('a'), MISSING)
+
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class VersionedCacheTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='cache@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            db.session.add(Account(user_id=user.id, account_name='Checking', balance=0))
+            db.session.commit()
+
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_user_row_cached_without_password(self):
+        with self.app.test_request_context('/'):
+            user = get_cached_user(self.user_id)
+            with patch.object(User, 'query') as query:
+                cached = get_cached_user(self.user_id)
+                query.get.assert_not_called()
+
+            self.assertIsNot(cached, user)
+            self.assertEqual(cached.email, 'cache@test.com')
+            self.assertNotIn('password', cached.__dict__)
+
+    def test_account_write_invalidates_taxonomy(self):
+        with self.app.test_request_context('/'):
+            taxonomy = UserTaxonomy.load_cached(self.user_id)
+            self.assertEqual([account.account_name for account in taxonomy.accounts], ['Checking'])
+            self.assertEqual([account.account_name for account in UserTaxonomy.load_cached(self.user_id).accounts], ['Checking'])
+            self.assertEqual(taxonomy_cache.stats()['hits'], 1)
+
+            db.session.add(Account(user_id=self.user_id, account_name='Savings', balance=0))
+            db.session.commit()
+
+            taxonomy = UserTaxonomy.load_cached(self.user_id)
+            self.assertEqual([account.account_name for account in taxonomy.accounts], ['Checking', 'Savings'])
+            self.assertIn('finwize_cache_hits_total{cache="taxonomy"} 1', render_cache_metrics())
+
+if __name__ == '__main__':
+    main()
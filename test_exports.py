@@ -0,0 +1,80 @@
+from unittest import TestCase, main
+import json
+from datetime import date
+from app import create_app, CURR_USER_KEY
+from models import db, User, Account, Category, Subcategory, Transaction, UserCategory, UserSubcategory
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='exports@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            account = Account(user_id=user.id, account_name='Checking', balance=0)
+            category = Category(name='Food', active=True)
+            db.session.add_all([account, category])
+            db.session.commit()
+
+            subcategory = Subcategory(category_id=category.id, name='Groceries', active=True)
+            db.session.add(subcategory)
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, category_id=category.id, name='Food')
+            db.session.add(user_category)
+            db.session.commit()
+
+            user_subcategory = UserSubcategory(user_id=user.id, subcategory_id=subcategory.id, user_category_id=user_category.id, name='Groceries')
+            db.session.add(user_subcategory)
+            db.session.commit()
+
+            for day in range(1, 4):
+                db.session.add(Transaction(user_id=user.id, account_id=account.id, user_category_id=user_category.id,
+                                           user_subcategory_id=user_subcategory.id, amount=day * 10,
+                                           description=f'Market, trip {day}', tran_date=date(2024, 2, day)))
+            db.session.commit()
+
+            self.user_id = user.id
+
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_transactions_csv_export(self):
+        response = self.client.get(f'/user/{self.user_id}/transactions/export')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'text/csv')
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], 'id,tran_date,description,amount,account,category,subcategory')
+        self.assertEqual(len(lines), 4)
+        self.assertIn('"Market, trip 1",10.00,Checking,Food,Groceries', lines[1])
+
+    def test_budgets_ndjson_export(self):
+        response = self.client.get(f'/user/{self.user_id}/budgets/export?format=ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(rows, [{'year': 2024, 'month': 2, 'category': 'Food', 'subcategory': 'Groceries',
+                                 'budgeted_amount': '0.00', 'spent_amount': '60.00'}])
+
+    def test_export_rejects_other_users_and_formats(self):
+        response = self.client.get(f'/user/{self.user_id + 1}/transactions/export')
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.get(f'/user/{self.user_id}/transactions/export?format=xlsx')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+from unittest import TestCase, main
+from datetime import date
+from flask import g
+from decimal import Decimal
+from app import create_app
+from models import db, User, Transaction, UserCategory, UserSubcategory, MonthlyBudget
+from cache import fragment_cache
+from fragments import is_closed_month, render_category_blocks
+from taxonomy import get_taxonomy
+
+
+class ClosedMonthTestCase(TestCase):
+    def test_is_closed_month(self):
+        self.assertTrue(is_closed_month(2, 2024, today=date(2024, 3, 1)))
+        self.assertFalse(is_closed_month(3, 2024, today=date(2024, 3, 31)))
+        self.assertFalse(is_closed_month(1, 2025, today=date(2024, 3, 31)))
+
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='fragments@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, name='Home')
+            db.session.add(user_category)
+            db.session.commit()
+
+            user_subcategory = UserSubcategory(user_id=user.id, user_category_id=user_category.id, name='Rent')
+            db.session.add(user_subcategory)
+            db.session.commit()
+
+            db.session.add(MonthlyBudget(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_subcategory.id,
+                                         month=3, year=2024, budgeted_amount=1200, spent_amount=0))
+            db.session.commit()
+
+            self.user_id = user.id
+            self.user_category_id = user_category.id
+            self.user_subcategory_id = user_subcategory.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_blocks_cached_until_month_changes(self):
+        with self.app.test_request_context('/'):
+            g.user = User.query.get(self.user_id)
+
+            blocks, total_budgeted, total_actual = render_category_blocks(self.user_id, 3, 2024, get_taxonomy(self.user_id))
+            self.assertIn('Home', blocks[0])
+            self.assertEqual((total_budgeted, total_actual), (Decimal('1200.00'), Decimal('0.00')))
+
+            self.assertEqual(render_category_blocks(self.user_id, 3, 2024, get_taxonomy(self.user_id))[0], blocks)
+            self.assertEqual(fragment_cache.stats()['hits'], 1)
+
+            db.session.add(Transaction(user_id=self.user_id, user_category_id=self.user_category_id,
+                                       user_subcategory_id=self.user_subcategory_id, amount=1150,
+                                       description='March rent', tran_date=date(2024, 3, 1)))
+            db.session.commit()
+
+            blocks, total_budgeted, total_actual = render_category_blocks(self.user_id, 3, 2024, get_taxonomy(self.user_id))
+            self.assertEqual(total_actual, Decimal('1150.00'))
+            self.assertIn('1150.00', blocks[0])
+            self.assertEqual(fragment_cache.stats()['misses'], 2)
+
+if __name__ == '__main__':
+    main()
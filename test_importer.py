@@ -0,0 +1,158 @@
+from unittest import TestCase, main
+from io import BytesIO, StringIO
+from datetime import date
+from decimal import Decimal
+from werkzeug.datastructures import FileStorage
+from app import create_app
+from models import db, User, Account, Category, Subcategory, Transaction, UserCategory, UserSubcategory, MonthlyBudget
+import importer
+from importer import ImportRowError, fingerprint, iter_csv_rows, iter_ofx_rows, import_statement, _parse_amount
+from taxonomy import get_taxonomy
+
+STATEMENT_CSV = """Date,Description,Amount,Category,Subcategory
+01/05/2024,Coffee,4.50,Food,Groceries
+01/05/2024,Coffee,4.50,Food,Groceries
+2024-01-06,Market,"1,020.25",,Groceries
+not a date,Broken,3.00,Food,Groceries
+2024-01-07,Mystery,8.00,Food,Unknown
+"""
+
+STATEMENT_OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240201120000<TRNAMT>-12.50<FITID>A1<NAME>Corner Store</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240203<TRNAMT>2.00<FITID>A2<MEMO>Refund</MEMO></STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def upload(content, filename):
+    return FileStorage(stream=BytesIO(content.encode('utf-8')), filename=filename)
+
+
+class StatementParsingTestCase(TestCase):
+    def test_csv_rows(self):
+        rows = list(iter_csv_rows(StringIO(STATEMENT_CSV, newline='')))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0], (2, {'tran_date': '01/05/2024', 'description': 'Coffee', 'amount': '4.50',
+                                       'category': 'Food', 'subcategory': 'Groceries'}))
+
+    def test_ofx_rows(self):
+        rows = list(iter_ofx_rows(StringIO(STATEMENT_OFX)))
+
+        self.assertEqual([number for number, _ in rows], [1, 2])
+        self.assertEqual(rows[0][1]['TRNAMT'], '-12.50')
+        self.assertEqual(rows[1][1]['MEMO'], 'Refund')
+
+    def test_amounts(self):
+        self.assertEqual(_parse_amount(' $1,020.25 '), Decimal('1020.25'))
+        self.assertEqual(_parse_amount('(4.50)'), Decimal('-4.50'))
+        for value in ('NaN', 'sNaN', '-Infinity', 'abc'):
+            with self.assertRaises(ImportRowError):
+                _parse_amount(value)
+
+
+class ImportTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='importer@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            account = Account(user_id=user.id, account_name='Checking', balance=0)
+            category = Category(name='Food', active=True)
+            db.session.add_all([account, category])
+            db.session.commit()
+
+            subcategory = Subcategory(category_id=category.id, name='Groceries', active=True)
+            db.session.add(subcategory)
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, category_id=category.id, name='Food')
+            db.session.add(user_category)
+            db.session.commit()
+
+            user_subcategory = UserSubcategory(user_id=user.id, subcategory_id=subcategory.id, user_category_id=user_category.id, name='Groceries')
+            db.session.add(user_subcategory)
+            db.session.commit()
+
+            self.user_id = user.id
+            self.account_id = account.id
+            self.user_subcategory_id = user_subcategory.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_csv_import_reports_errors_and_skips_duplicates(self):
+        with self.app.app_context():
+            report = import_statement(get_taxonomy(self.user_id), upload(STATEMENT_CSV, 'statement.csv'), default_account_id=self.account_id)
+
+            self.assertEqual(report['rows'], 5)
+            self.assertEqual(report['inserted'], 3)
+            self.assertEqual(report['error_count'], 2)
+            self.assertEqual([error['row'] for error in report['errors']], [5, 6])
+
+            # Importing the same statement again only finds duplicates
+            report = import_statement(get_taxonomy(self.user_id), upload(STATEMENT_CSV, 'statement.csv'), default_account_id=self.account_id)
+
+            self.assertEqual(report['inserted'], 0)
+            self.assertEqual(report['duplicates'], 3)
+            self.assertEqual(Transaction.query.filter_by(user_id=self.user_id).count(), 3)
+
+            january = MonthlyBudget.query.filter_by(user_id=self.user_id, month=1, year=2024).one()
+            self.assertEqual(january.spent_amount, Decimal('1029.25'))
+            self.assertEqual(MonthlyBudget.find_spent_drift(self.user_id), [])
+
+    def test_ofx_import_uses_defaults(self):
+        with self.app.app_context():
+            report = import_statement(get_taxonomy(self.user_id), upload(STATEMENT_OFX, 'statement.ofx'),
+                                      default_account_id=self.account_id,
+                                      default_subcategory_id=self.user_subcategory_id)
+
+            self.assertEqual(report['inserted'], 2)
+            transactions = Transaction.query.filter_by(user_id=self.user_id).order_by(Transaction.tran_date).all()
+            self.assertEqual([tran.amount for tran in transactions], [Decimal('12.50'), Decimal('-2.00')])
+            self.assertEqual(transactions[0].tran_date, date(2024, 2, 1))
+            self.assertEqual(transactions[0].account_id, self.account_id)
+
+    def test_csv_import_skips_non_finite_amounts(self):
+        statement = """Date,Description,Amount,Category,Subcategory
+2024-03-01,Coffee  Shop,4.50,Food,Groceries
+2024-03-01,coffee shop,4.50,Food,Groceries
+2024-03-02,Broken,NaN,Food,Groceries
+2024-03-03,Broken,sNaN,Food,Groceries
+"""
+        with self.app.app_context():
+            report = import_statement(get_taxonomy(self.user_id), upload(statement, 'statement.csv'), default_account_id=self.account_id)
+
+            # The two coffees are counted as repeats of one row, like their fingerprints, so both are kept
+            self.assertEqual(report['inserted'], 2)
+            self.assertEqual([error['row'] for error in report['errors']], [4, 5])
+
+    def test_repeated_rows_are_numbered_across_batches(self):
+        statement = "Date,Description,Amount,Category,Subcategory\n" + "2024-04-01,Coffee,4.50,Food,Groceries\n" * 3
+        record = {'tran_date': date(2024, 4, 1), 'amount': Decimal('4.50'), 'description': 'Coffee'}
+
+        batch_size, importer.BATCH_SIZE = importer.BATCH_SIZE, 2
+        try:
+            with self.app.app_context():
+                report = import_statement(get_taxonomy(self.user_id), upload(statement, 'statement.csv'), default_account_id=self.account_id)
+                self.assertEqual(report['inserted'], 3)
+
+                # Postgres finishes the fingerprints the same way fingerprint() does
+                stored = {tran.fingerprint for tran in Transaction.query.filter_by(user_id=self.user_id)}
+                self.assertEqual(stored, {fingerprint(self.user_id, self.account_id, record, n) for n in (1, 2, 3)})
+
+                report = import_statement(get_taxonomy(self.user_id), upload(statement, 'statement.csv'), default_account_id=self.account_id)
+                self.assertEqual((report['inserted'], report['duplicates']), (0, 3))
+        finally:
+            importer.BATCH_SIZE = batch_size
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+from unittest import TestCase, main
+from datetime import date
+from sqlalchemy.dialects import postgresql
+from app import create_app
+from models import db, month_bounds, User, Account, AccountBalanceSnapshot, Category, Subcategory, Transaction, UserCategory, UserSubcategory, MonthlyBudget
+from aggregates import budget_rows_query
+from ledger import search_conditions
+
+
+def explain(query):
+    """Returns Postgres' plan for an ORM query as a single string.
+        Sequential scans are disabled for the session so the tiny test tables behave like large ones."""
+    compiled = query.statement.compile(dialect=postgresql.dialect())
+    connection = db.session.connection()
+    connection.exec_driver_sql('SET enable_seqscan = off')
+    rows = connection.exec_driver_sql(f'EXPLAIN {compiled}', compiled.params).all()
+    return '\n'.join(row[0] for row in rows)
+
+
+class IndexUsageTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='indexes@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            category = Category(name='Food', active=True)
+            db.session.add(category)
+            db.session.commit()
+
+            subcategory = Subcategory(category_id=category.id, name='Groceries', active=True)
+            db.session.add(subcategory)
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, category_id=category.id, name='Food')
+            db.session.add(user_category)
+            db.session.commit()
+
+            user_subcategory = UserSubcategory(user_id=user.id, subcategory_id=subcategory.id, user_category_id=user_category.id, name='Groceries')
+            db.session.add(user_subcategory)
+            db.session.commit()
+
+            for month in range(1, 13):
+                db.session.add(MonthlyBudget(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_subcategory.id,
+                                             month=month, year=2024, budgeted_amount=300, spent_amount=0))
+            db.session.commit()
+
+            for month in range(1, 13):
+                db.session.add(Transaction(user_id=user.id, user_category_id=user_category.id, user_subcategory_id=user_subcategory.id,
+                                           amount=25, description='Groceries', tran_date=date(2024, month, 15)))
+            db.session.commit()
+
+            self.user_id = user.id
+            self.user_subcategory_id = user_subcategory.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.rollback()
+            db.drop_all()
+
+    def test_user_month_actual_is_an_index_range_scan(self):
+        with self.app.app_context():
+            # A few years of history and fresh statistics, so the plan reflects a real user rather than 12 rows
+            db.session.execute(db.text("""
+                INSERT INTO transactions (user_id, user_category_id, user_subcategory_id, amount, description, tran_date, created_at)
+                SELECT user_id, user_category_id, user_subcategory_id, 25, 'Groceries', DATE '2021-01-01' + n % 1460, CURRENT_DATE
+                FROM transactions, generate_series(1, 5000) AS n
+                WHERE id = (SELECT min(id) FROM transactions)"""))
+            db.session.execute(db.text('ANALYZE transactions'))
+
+            start, end = month_bounds(3, 2024)
+            query = db.session.query(db.func.sum(Transaction.amount)).\
+                filter(Transaction.user_id == self.user_id,
+                       Transaction.tran_date >= start,
+                       Transaction.tran_date < end)
+
+            plan = explain(query)
+
+            # Any user-leading index will do, as long as the month range is an index condition rather than a filter
+            index_conditions = [line for line in plan.splitlines() if 'Index Cond' in line]
+            self.assertTrue(any('user_id' in line and 'tran_date' in line for line in index_conditions), plan)
+
+    def test_subcategory_actual_uses_subcategory_tran_date_index(self):
+        with self.app.app_context():
+            u_sub = db.session.get(UserSubcategory, self.user_subcategory_id)
+            start, end = month_bounds(3, 2024)
+            query = db.session.query(db.func.sum(Transaction.amount)).\
+                filter(Transaction.user_subcategory_id == u_sub.id,
+                       Transaction.tran_date >= start,
+                       Transaction.tran_date < end)
+
+            plan = explain(query)
+
+            self.assertIn('ix_transactions_user_subcategory_tran_date', plan)
+
+    def test_budget_rows_use_user_year_month_unique_index(self):
+        with self.app.app_context():
+            plan = explain(budget_rows_query(self.user_id, 3, 2024))
+
+            self.assertIn('uq_monthlybudget_user_subcategory_month', plan)
+
+    def test_latest_balance_update_uses_user_recorded_index(self):
+        with self.app.app_context():
+            query = db.session.query(db.func.max(AccountBalanceSnapshot.recorded_at)).\
+                filter(AccountBalanceSnapshot.user_id == self.user_id)
+
+            plan = explain(query)
+
+            self.assertIn('ix_balancesnapshots_user_recorded', plan)
+
+    def test_search_uses_user_gin_indexes(self):
+        with self.app.app_context():
+            match, _ = search_conditions('grocery')
+            query = db.session.query(Transaction.id).filter(Transaction.user_id == self.user_id, match)
+
+            plan = explain(query)
+
+            self.assertIn('ix_transactions_user_search', plan)
+            self.assertIn('ix_transactions_user_description_trgm', plan)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+from unittest import TestCase, main
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app import create_app, CURR_USER_KEY
+from models import db, User, Account
+from instrumentation import QueryStats, RequestMetrics, assert_max_queries, count_queries
+
+
+class RequestMetricsTestCase(TestCase):
+    def test_render(self):
+        metrics = RequestMetrics()
+        stats = QueryStats()
+        for rows in (1, 3, 0):
+            stats.record(0.002, rows)
+        metrics.observe('homepage', 0.01, stats)
+
+        text = metrics.render()
+
+        self.assertIn('finwize_db_queries_total{endpoint="homepage"} 3', text)
+        self.assertIn('finwize_db_rows_total{endpoint="homepage"} 4', text)
+        self.assertIn('finwize_db_queries_per_request_bucket{endpoint="homepage",le="2"} 0', text)
+        self.assertIn('finwize_db_queries_per_request_bucket{endpoint="homepage",le="5"} 1', text)
+
+
+class QueryTimerTestCase(TestCase):
+    def test_failed_statement_leaves_no_timer(self):
+        engine = create_engine('sqlite://')
+        with engine.connect() as conn, count_queries() as stats:
+            with self.assertRaises(OperationalError):
+                conn.execute(text('SELECT * FROM missing_table'))
+            conn.execute(text('SELECT 1'))
+
+            self.assertNotIn('query_started', conn.info)
+        self.assertEqual(stats.queries, 1)
+
+
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='instrumentation@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            db.session.add(Account(user_id=user.id, account_name='Checking', balance=100))
+            db.session.commit()
+
+            self.user_id = user.id
+
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/')
+
+        timings = response.headers.getlist('Server-Timing')
+        self.assertTrue(timings[0].startswith('db;dur='))
+        self.assertIn('queries', timings[0])
+        self.assertTrue(timings[1].startswith('app;dur='))
+
+    def test_homepage_query_budget(self):
+        # First request fills the user/taxonomy caches
+        self.client.get('/')
+
+        # Warm: month completeness check, month summary, latest account date
+        with assert_max_queries(self, 3):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/')
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.mimetype, 'text/plain')
+        self.assertIn('finwize_http_requests_total{endpoint="homepage"}', response.get_data(as_text=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+from unittest import TestCase, main
+from datetime import date, timedelta
+from decimal import Decimal
+from werkzeug.datastructures import MultiDict
+from app import create_app, CURR_USER_KEY
+from models import db, User, Account, Category, Subcategory, Transaction, UserCategory, UserSubcategory
+from ledger import LedgerRow, parse_ledger_filters, get_transactions_page, decode_cursor, search_transactions, transaction_to_json
+
+
+class LedgerTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='ledger@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            checking = Account(user_id=user.id, account_name='Checking', balance=0)
+            credit = Account(user_id=user.id, account_name='Credit Card', balance=0)
+            category = Category(name='Food', active=True)
+            db.session.add_all([checking, credit, category])
+            db.session.commit()
+
+            subcategory = Subcategory(category_id=category.id, name='Groceries', active=True)
+            db.session.add(subcategory)
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, category_id=category.id, name='Food')
+            db.session.add(user_category)
+            db.session.commit()
+
+            user_subcategory = UserSubcategory(user_id=user.id, subcategory_id=subcategory.id, user_category_id=user_category.id, name='Groceries')
+            db.session.add(user_subcategory)
+            db.session.commit()
+
+            # 25 transactions, two per day, so pages have to break ties on id
+            for i in range(25):
+                db.session.add(Transaction(user_id=user.id,
+                                           account_id=checking.id if i % 2 else credit.id,
+                                           user_category_id=user_category.id,
+                                           user_subcategory_id=user_subcategory.id,
+                                           amount=10 + i,
+                                           description=f'Purchase {i}',
+                                           tran_date=date(2024, 1, 1) + timedelta(days=i // 2)))
+            db.session.commit()
+
+            self.user_id = user.id
+            self.checking_id = checking.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def add_merchant_transactions(self):
+        purchase = Transaction.query.filter_by(user_id=self.user_id).first()
+        for description in ('STARBUCKS STORE 1234', 'Starbucks coffee', 'Whole Foods Market'):
+            db.session.add(Transaction(user_id=self.user_id, account_id=self.checking_id,
+                                       user_category_id=purchase.user_category_id,
+                                       user_subcategory_id=purchase.user_subcategory_id,
+                                       amount=5, description=description, tran_date=date(2024, 2, 1)))
+        db.session.commit()
+
+    def test_pages_cover_ledger_once_in_order(self):
+        with self.app.app_context():
+            filters = parse_ledger_filters(MultiDict())
+            seen = []
+            cursor = None
+
+            while True:
+                page, cursor = get_transactions_page(self.user_id, filters, cursor=cursor, limit=10)
+                seen.extend(page)
+                if not cursor:
+                    break
+
+            self.assertEqual(len(seen), 25)
+            self.assertEqual(len({tran.id for tran in seen}), 25)
+            keys = [(tran.tran_date, tran.id) for tran in seen]
+            self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_filters(self):
+        with self.app.app_context():
+            filters = parse_ledger_filters(MultiDict({'start': '2024-01-03',
+                                                      'end': '2024-01-05',
+                                                      'account_id': str(self.checking_id),
+                                                      'min_amount': '15',
+                                                      'max_amount': 'not-a-number'}))
+
+            page, cursor = get_transactions_page(self.user_id, filters)
+
+            self.assertIsNone(filters['max_amount'])
+            self.assertIsNone(cursor)
+            self.assertTrue(page)
+            for tran in page:
+                self.assertTrue(date(2024, 1, 3) <= tran.tran_date <= date(2024, 1, 5))
+                self.assertEqual(tran.account_id, self.checking_id)
+                self.assertGreaterEqual(tran.amount, Decimal('15'))
+
+    def test_search_ranks_and_pages(self):
+        with self.app.app_context():
+            self.add_merchant_transactions()
+            filters = parse_ledger_filters(MultiDict())
+            seen = []
+            cursor = None
+
+            while True:
+                page, cursor = search_transactions(self.user_id, 'starbucks', filters, cursor=cursor, limit=1)
+                seen.extend(page)
+                if not cursor:
+                    break
+
+            self.assertEqual(sorted(tran.description for tran in seen), ['STARBUCKS STORE 1234', 'Starbucks coffee'])
+            scores = [tran.score for tran in seen]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_search_fuzzy_and_substring(self):
+        with self.app.app_context():
+            self.add_merchant_transactions()
+            filters = parse_ledger_filters(MultiDict())
+
+            typo, _ = search_transactions(self.user_id, 'starbuks', filters)
+            substring, _ = search_transactions(self.user_id, 'foods mark', filters)
+            filtered, _ = search_transactions(self.user_id, 'starbucks', parse_ledger_filters(MultiDict({'end': '2024-01-31'})))
+
+            self.assertEqual(len(typo), 2)
+            self.assertEqual([tran.description for tran in substring], ['Whole Foods Market'])
+            self.assertEqual(filtered, [])
+
+            with self.assertRaises(ValueError):
+                search_transactions(self.user_id, ' s ', filters)
+
+    def test_search_typo_matches_through_pg_trgm(self):
+        with self.app.app_context():
+            self.add_merchant_transactions()
+            self.assertEqual(db.session.execute(db.text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")).scalar(), 1)
+
+            # Neither the full-text nor the substring branch matches the typo, so only the trigram branch can
+            exact = Transaction.query.filter(Transaction.user_id == self.user_id,
+                                             db.or_(Transaction.search_vector.op('@@')(db.func.websearch_to_tsquery('english', 'starbuks')),
+                                                    Transaction.description.ilike('%starbuks%')))
+            self.assertEqual(exact.count(), 0)
+
+            results, _ = search_transactions(self.user_id, 'starbuks', parse_ledger_filters(MultiDict()))
+
+            self.assertEqual(sorted(tran.description for tran in results), ['STARBUCKS STORE 1234', 'Starbucks coffee'])
+            self.assertTrue(all(tran.score > 0 for tran in results))
+
+    def test_page_links_carry_only_ledger_filters(self):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+        response = client.get(f'/user/{self.user_id}/transactions?user_id=2&_anchor=zz&start=2024-01-01')
+
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn('value="2024-01-01"', html)
+        self.assertNotIn('user_id=2', html)
+        self.assertNotIn('#zz', html)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor('garbage')
+
+
+class LedgerRowTestCase(TestCase):
+    def test_row_is_slotted_and_serializes(self):
+        row = LedgerRow(7, date(2024, 1, 2), 'Coffee', Decimal('4.50'), None, None, 1, 'Food', 2, 'Dining Out')
+
+        self.assertFalse(hasattr(row, '__dict__'))
+        with self.assertRaises(AttributeError):
+            row.extra = True
+        self.assertEqual(transaction_to_json(row), {
+            'id': 7, 'tran_date': '2024-01-02', 'description': 'Coffee', 'account_id': None, 'account_name': None,
+            'category_id': 1, 'category_name': 'Food', 'subcategory_id': 2, 'subcategory_name': 'Dining Out',
+            'amount': Decimal('4.50')})
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from unittest import TestCase, main
 from datetime import date
+from sqlalchemy.exc import IntegrityError
 from app import create_app
 from models import db, User, Account, Category, Subcategory, Transaction, UserCategory, UserSubcategory, MonthlyBudget
 
@@ -36,6 +37,11 @@ class ModelTestCase(TestCase):
             db.session.add(self.user_subcategory)
             db.session.commit()
 
+            # The instances above are detached and expired once the context closes
+            self.user_id = self.user.id
+            self.user_category_id = self.user_category.id
+            self.user_subcategory_id = self.user_subcategory.id
+
     def tearDown(self):
         with self.app.app_context():
             db.drop_all()
@@ -101,6 +107,134 @@ class ModelTestCase(TestCase):
 
             self.assertEqual(len(MonthlyBudget.query.all()), 1)
 
+    def test_monthly_budget_ensure_for_month(self):
+        with self.app.app_context():
+            user = db.session.merge(self.user)
+
+            self.assertEqual(MonthlyBudget.ensure_for_month(user.id, 5, 2024), 1)
+            self.assertEqual(MonthlyBudget.ensure_for_month(user.id, 5, 2024), 0)
+
+            monthly_budget = MonthlyBudget.query.filter_by(user_id=user.id, month=5, year=2024).one()
+            self.assertEqual(monthly_budget.budgeted_amount, 0)
+            self.assertEqual(monthly_budget.user_category_id, self.user_category_id)
+
+    def test_monthly_budget_unique_per_month(self):
+        with self.app.app_context():
+            user = db.session.merge(self.user)
+            MonthlyBudget.ensure_for_month(user.id, 5, 2024)
+
+            duplicate = MonthlyBudget(
+                user_id=user.id,
+                user_category_id=self.user_category_id,
+                user_subcategory_id=self.user_subcategory_id,
+                month=5,
+                year=2024,
+                budgeted_amount=0,
+                spent_amount=0)
+            db.session.add(duplicate)
+
+            with self.assertRaises(IntegrityError):
+                db.session.commit()
+
+    def test_transaction_rollups(self):
+        with self.app.app_context():
+            user = db.session.merge(self.user)
+            user_category = db.session.merge(self.user_category)
+            user_subcategory = db.session.merge(self.user_subcategory)
+
+            transaction = Transaction(
+                user_id=user.id,
+                user_category_id=user_category.id,
+                user_subcategory_id=user_subcategory.id,
+                amount=100,
+                description='Groceries',
+                tran_date=date(2024, 5, 10))
+            db.session.add(transaction)
+            db.session.commit()
+
+            may = MonthlyBudget.query.filter_by(user_id=user.id, month=5, year=2024).one()
+            self.assertEqual(may.spent_amount, 100)
+
+            # Moving the transaction to another month moves its amount with it, even from an expired instance
+            db.session.expire(transaction)
+            transaction.tran_date = date(2024, 6, 1)
+            transaction.amount = 80
+            db.session.commit()
+            db.session.expire_all()
+
+            june = MonthlyBudget.query.filter_by(user_id=user.id, month=6, year=2024).one()
+            self.assertEqual(may.spent_amount, 0)
+            self.assertEqual(june.spent_amount, 80)
+
+            db.session.delete(transaction)
+            db.session.commit()
+            db.session.expire_all()
+
+            self.assertEqual(june.spent_amount, 0)
+            self.assertEqual(MonthlyBudget.find_spent_drift(user.id), [])
+
+    def test_rebuild_spent_fixes_drift(self):
+        with self.app.app_context():
+            user = db.session.merge(self.user)
+            user_category = db.session.merge(self.user_category)
+            user_subcategory = db.session.merge(self.user_subcategory)
+
+            db.session.add(Transaction(
+                user_id=user.id,
+                user_category_id=user_category.id,
+                user_subcategory_id=user_subcategory.id,
+                amount=45,
+                description='Groceries',
+                tran_date=date(2024, 5, 10)))
+            db.session.commit()
+
+            MonthlyBudget.query.filter_by(user_id=user.id, month=5, year=2024).update({'spent_amount': 999})
+            db.session.commit()
+
+            drift = MonthlyBudget.find_spent_drift(user.id)
+            self.assertEqual(len(drift), 1)
+            self.assertEqual(drift[0]['recorded'], 999)
+            self.assertEqual(drift[0]['actual'], 45)
+
+            MonthlyBudget.rebuild_spent(user.id)
+
+            self.assertEqual(MonthlyBudget.find_spent_drift(user.id), [])
+            self.assertEqual(MonthlyBudget.query.filter_by(user_id=user.id, month=5, year=2024).one().spent_amount, 45)
+
+    def test_roll_over_fills_unset_budgets(self):
+        with self.app.app_context():
+            user = db.session.merge(self.user)
+            for month, amount in ((3, 300), (4, 500)):
+                db.session.add(MonthlyBudget(user_id=user.id, user_category_id=self.user_category_id,
+                                             user_subcategory_id=self.user_subcategory_id,
+                                             month=month, year=2024, budgeted_amount=amount, spent_amount=0))
+            db.session.commit()
+            MonthlyBudget.ensure_for_month(user.id, 5, 2024)
+
+            # Copies April into May (an existing zero budget) and June (no row yet), once
+            self.assertEqual(MonthlyBudget.roll_over(date(2024, 5, 1), date(2024, 6, 1)), 2)
+            self.assertEqual(MonthlyBudget.roll_over(date(2024, 5, 1), date(2024, 6, 1)), 0)
+
+            amounts = dict(db.session.query(MonthlyBudget.month, MonthlyBudget.budgeted_amount).filter_by(user_id=user.id))
+            self.assertEqual(amounts, {3: 300, 4: 500, 5: 500, 6: 500})
+
+            # The average of March through June
+            self.assertEqual(MonthlyBudget.roll_over(date(2024, 7, 1), average_months=4, user_id=user.id), 1)
+            self.assertEqual(MonthlyBudget.query.filter_by(user_id=user.id, month=7).one().budgeted_amount, 450)
+
+    def test_rollover_command(self):
+        with self.app.app_context():
+            user = db.session.merge(self.user)
+            db.session.add(MonthlyBudget(user_id=user.id, user_category_id=self.user_category_id,
+                                         user_subcategory_id=self.user_subcategory_id,
+                                         month=1, year=2024, budgeted_amount=250, spent_amount=0))
+            db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=['budgets', 'rollover', '--month', '2024-02', '--through', '2024-04'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Filled 3 budget(s).', result.output)
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+from unittest import TestCase, main
+from passwords import PasswordHasher, PasswordServiceBusy, calibrate_rounds, hash_rounds
+
+
+class PasswordHasherTestCase(TestCase):
+    def test_inline_hash_and_check(self):
+        hasher = PasswordHasher(rounds=4, workers=0)
+        pw_hash = hasher.hash('password')
+
+        self.assertEqual(hash_rounds(pw_hash), 4)
+        self.assertTrue(hasher.check(pw_hash, 'password'))
+        self.assertFalse(hasher.check(pw_hash, 'wrongpassword'))
+
+    def test_needs_rehash(self):
+        old_hash = PasswordHasher(rounds=4, workers=0).hash('password')
+
+        self.assertFalse(PasswordHasher(rounds=4, workers=0).needs_rehash(old_hash))
+        self.assertTrue(PasswordHasher(rounds=5, workers=0).needs_rehash(old_hash))
+        # A stronger hash is never rehashed down to a lower configured cost
+        self.assertFalse(PasswordHasher(rounds=4, workers=0).needs_rehash(PasswordHasher(rounds=5, workers=0).hash('password')))
+        self.assertTrue(PasswordHasher(rounds=4, workers=0).needs_rehash('not a bcrypt hash'))
+
+    def test_process_pool(self):
+        hasher = PasswordHasher(rounds=4, workers=1)
+        try:
+            self.assertTrue(hasher.check(hasher.hash('password'), 'password'))
+        finally:
+            hasher.shutdown()
+
+    def test_busy_when_queue_full(self):
+        hasher = PasswordHasher(rounds=4, workers=1, max_queue=1)
+        hasher._slots.acquire()
+        try:
+            with self.assertRaises(PasswordServiceBusy):
+                hasher.hash('password')
+        finally:
+            hasher._slots.release()
+            hasher.shutdown()
+
+    def test_after_fork_starts_a_fresh_pool(self):
+        hasher = PasswordHasher(rounds=4, workers=1)
+        try:
+            hasher.hash('password')
+            inherited = hasher._pool
+
+            hasher.after_fork()
+
+            self.assertIsNone(hasher._pool)
+            self.assertTrue(hasher.check(hasher.hash('password'), 'password'))
+            self.assertIsNot(hasher._pool, inherited)
+        finally:
+            hasher.shutdown()
+            inherited.shutdown()
+
+    def test_calibrate_rounds(self):
+        self.assertEqual(calibrate_rounds(0, minimum=4, maximum=6), 4)
+        self.assertEqual(calibrate_rounds(60_000, minimum=4, maximum=6), 6)
+
+if __name__ == '__main__':
+    main()
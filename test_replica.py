@@ -0,0 +1,98 @@
+# Needs a second local database: createdb finwize_db_test_replica
+import os
+import time
+from unittest import TestCase, main
+from datetime import date
+from app import create_app, CURR_USER_KEY
+from models import db, User, Account, Transaction, UserCategory, UserSubcategory, MonthlyBudget
+from replicas import LAST_WRITE_KEY, REPLICA_BIND, replica_session
+
+
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        # The replica bind is read while the app is built, so it has to be in place first
+        os.environ['REPLICA_DATABASE_URI'] = 'postgresql:///finwize_db_test_replica'
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            # No real replication here: the same user exists in both databases, with a different transaction in each
+            for engine, where in ((db.engines[None], 'primary'), (db.engines[REPLICA_BIND], 'replica')):
+                db.metadata.create_all(bind=engine)
+                with engine.begin() as conn:
+                    user_id = conn.execute(db.insert(User).values(email='replica@test.com', password='password',
+                                                                  created_at=date(2024, 1, 1)).returning(User.id)).scalar()
+                    account_id = conn.execute(db.insert(Account).values(user_id=user_id, account_name='Checking', balance=0,
+                                                                        created_at=date(2024, 1, 1)).returning(Account.id)).scalar()
+                    category_id = conn.execute(db.insert(UserCategory).values(user_id=user_id, name='Food',
+                                                                              created_at=date(2024, 1, 1)).returning(UserCategory.id)).scalar()
+                    subcategory_id = conn.execute(db.insert(UserSubcategory).values(user_id=user_id, user_category_id=category_id, name='Groceries',
+                                                                                    created_at=date(2024, 1, 1)).returning(UserSubcategory.id)).scalar()
+                    conn.execute(db.insert(Transaction).values(user_id=user_id, account_id=account_id, amount=10,
+                                                               user_category_id=category_id, user_subcategory_id=subcategory_id,
+                                                               description=f'From the {where}',
+                                                               tran_date=date(2024, 1, 2), created_at=date(2024, 1, 2)))
+                    conn.execute(db.insert(MonthlyBudget).values(user_id=user_id, user_category_id=category_id, user_subcategory_id=subcategory_id,
+                                                                 month=1, year=2024, budgeted_amount=100 if where == 'primary' else 200,
+                                                                 spent_amount=10, created_at=date(2024, 1, 1)))
+            self.user_id = user_id
+
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user_id
+
+    def tearDown(self):
+        os.environ.pop('REPLICA_DATABASE_URI', None)
+        with self.app.app_context():
+            db.metadata.drop_all(bind=db.engines[REPLICA_BIND])
+            db.drop_all()
+
+    def descriptions(self):
+        response = self.client.get('/api/transactions')
+        return [tran['description'] for tran in response.json['transactions']]
+
+    def test_read_only_route_uses_replica(self):
+        self.assertEqual(self.descriptions(), ['From the replica'])
+
+    def test_raw_sql_analytics_use_replica(self):
+        response = self.client.get('/api/trends?months=1&end=2024-01')
+
+        self.assertEqual(response.json['totals']['budgeted'], ['200.00'])
+        with self.client.session_transaction() as sess:
+            self.assertNotIn(LAST_WRITE_KEY, sess)
+
+    def test_recent_write_reads_primary(self):
+        with self.client.session_transaction() as sess:
+            sess[LAST_WRITE_KEY] = time.time()
+
+        self.assertEqual(self.descriptions(), ['From the primary'])
+
+        with self.client.session_transaction() as sess:
+            sess[LAST_WRITE_KEY] = time.time() - self.app.config['REPLICA_READ_YOUR_WRITES_SECONDS'] - 1
+
+        self.assertEqual(self.descriptions(), ['From the replica'])
+
+    def test_homepage_creates_month_on_primary_without_leaving_replica(self):
+        response = self.client.get('/?month=5&year=2024')
+
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(MonthlyBudget.query.filter_by(user_id=self.user_id, month=5, year=2024).count(), 1)
+        with self.client.session_transaction() as sess:
+            self.assertNotIn(LAST_WRITE_KEY, sess)
+        self.assertEqual(self.descriptions(), ['From the replica'])
+
+    def test_session_sticks_to_primary_after_write(self):
+        with self.app.test_request_context('/'):
+            with replica_session(db):
+                self.assertEqual(Transaction.query.one().description, 'From the replica')
+
+                db.session.add(Account(user_id=self.user_id, account_name='Savings', balance=0))
+                db.session.flush()
+
+                self.assertEqual(Transaction.query.one().description, 'From the primary')
+                self.assertEqual(Account.query.count(), 2)
+                db.session.rollback()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+from unittest import TestCase, main
+from app import create_app
+from models import db, User, Account, Category, Subcategory, UserCategory, UserSubcategory
+from forms import TransactionForm
+from taxonomy import get_taxonomy, reset_taxonomy
+
+
+class TaxonomyTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app('finwize_db_test', testing=True)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///finwize_db_test'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+
+            user = User(email='taxonomy@test.com', password='password')
+            db.session.add(user)
+            db.session.commit()
+
+            account = Account(user_id=user.id, account_name='Checking', balance=0)
+            category = Category(name='Home', active=True)
+            db.session.add_all([account, category])
+            db.session.commit()
+
+            subcategory = Subcategory(category_id=category.id, name='Rent', active=True)
+            db.session.add(subcategory)
+            db.session.commit()
+
+            user_category = UserCategory(user_id=user.id, category_id=category.id, name='Home')
+            db.session.add(user_category)
+            db.session.commit()
+
+            rent = UserSubcategory(user_id=user.id, subcategory_id=subcategory.id, user_category_id=user_category.id, name='Rent')
+            retired = UserSubcategory(user_id=user.id, user_category_id=user_category.id, name='Old', active=False)
+            db.session.add_all([rent, retired])
+            db.session.commit()
+
+            self.user_id = user.id
+            self.user_category_id = user_category.id
+            self.rent_id = rent.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_loaded_once_per_request(self):
+        with self.app.test_request_context('/'):
+            taxonomy = get_taxonomy(self.user_id)
+
+            self.assertIs(get_taxonomy(self.user_id), taxonomy)
+
+            reset_taxonomy(self.user_id)
+            self.assertIsNot(get_taxonomy(self.user_id), taxonomy)
+
+    def test_lookups_and_choices(self):
+        with self.app.test_request_context('/'):
+            taxonomy = get_taxonomy(self.user_id)
+
+            self.assertEqual([u_sub.name for u_sub in taxonomy.subcategories_by_category[self.user_category_id]], ['Rent', 'Old'])
+            self.assertTrue(taxonomy.subcategory_in_category(self.rent_id, self.user_category_id))
+            self.assertFalse(taxonomy.subcategory_in_category(self.rent_id, self.user_category_id + 1))
+
+            form = TransactionForm(meta={'csrf': False})
+            taxonomy.set_transaction_choices(form)
+            self.assertEqual(form.subcategory.choices, [(self.rent_id, 'Rent')])
+            self.assertEqual(form.account.choices[0][1], 'Checking')
+
+if __name__ == '__main__':
+    main()